@@ -18,6 +18,36 @@ app.conf.beat_schedule = {
         'schedule': crontab(hour=0, minute=0),  # Execute daily at midnight
         'args': (),
     },
+    'check_crypto_review_reset': {
+        'task': 'crypto_reviews.tasks.initialize_on_startup_check_update_crypto_review',
+        'schedule': crontab(minute=15),  # Execute every hour, catches a missed midnight reset
+        'args': (),
+    },
+    'flush_crypto_review_votes': {
+        'task': 'crypto_reviews.tasks.flush_vote_buffer',
+        'schedule': 10.0,  # Execute every 10 seconds
+        'args': (),
+    },
+    'ingest_price_ticks': {
+        'task': 'prices.tasks.ingest_price_ticks',
+        'schedule': 60.0,  # Execute every minute
+        'args': (),
+    },
+    'aggregate_price_candles': {
+        'task': 'prices.tasks.aggregate_price_candles',
+        'schedule': 60.0,  # Execute every minute
+        'args': (),
+    },
+    'recompute_portfolio_valuations': {
+        'task': 'user.tasks.recompute_portfolio_valuations',
+        'schedule': 5 * 60.0,  # Execute every 5 minutes
+        'args': (),
+    },
+    'send_queued_emails': {
+        'task': 'core.tasks.send_queued_emails',
+        'schedule': 60.0,  # Execute every minute
+        'args': (),
+    },
 }
 
 
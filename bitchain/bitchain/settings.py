@@ -53,6 +53,7 @@ INSTALLED_APPS = [
     'core',
     'user',
     'crypto_reviews',  
+    'prices',
     
 ]
 
@@ -121,6 +122,31 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# Hashes made with other parameters than the first hasher are upgraded on the next successful login.
+# PASSWORD_HASHER=argon2 makes Argon2 the preferred hasher, it needs the argon2-cffi package.
+
+PASSWORD_HASHERS = [
+    'user.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if os.environ.get('PASSWORD_HASHER') == 'argon2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(2))
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 600000))
+
+AUTHENTICATION_BACKENDS = ['user.backends.PooledModelBackend']
+
+# password checks of logins run in a bounded pool, requests beyond workers + MAX_QUEUE get 429
+PASSWORD_HASHING_EXECUTOR = {
+    'kind': os.environ.get('PASSWORD_HASHING_EXECUTOR', 'thread'),  # 'thread' or 'process'
+    'workers': None,  # one per CPU by default
+    'max_queue': 64,
+    'timeout': 5.0,  # (in seconds) a check not finished in time responds with 503
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -152,6 +178,12 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # the DRF defaults, with cached token authentication in front of them
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'user.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
 }
 
 # CORS settings - allow all origins
@@ -159,20 +191,101 @@ CORS_ALLOW_ALL_ORIGINS = True # change this on production!!!
 
 # default user avatar path
 DEFAULT_AVATAR_PATH = 'uploads/user/default.jpg'
+# (in pixels) square WebP and JPEG thumbnails generated from every uploaded profile image
+USER_IMAGE_VARIANT_SIZES = (32, 64, 256)
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
 
-CELERY_BROKER_URL = 'redis://redis:6379/0'
-CELERY_RESULT_BACKEND = 'redis://redis:6379/0'
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://redis:6379/0')
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://redis:6379/0')
 CELERY_BEAT_SCHEDULE_FILENAME = str(Path(__file__).resolve().parent / 'celerybeat-schedule')
+# without a configured broker (tests, local runs) queued tasks run in the calling process
+CELERY_TASK_ALWAYS_EAGER = 'CELERY_BROKER_URL' not in os.environ
+
+# shared redis used for caching and vote buffering (local in-memory stand-ins when not set)
+REDIS_CACHE_URL = os.environ.get('REDIS_CACHE_URL')
+
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# crypto review vote buffering
+if REDIS_CACHE_URL:
+    CRYPTO_REVIEW_VOTE_STORE = {
+        'BACKEND': 'crypto_reviews.votes.RedisVoteStore',
+        'OPTIONS': {'location': REDIS_CACHE_URL},
+    }
+else:
+    CRYPTO_REVIEW_VOTE_STORE = {
+        'BACKEND': 'crypto_reviews.votes.LocalVoteStore',
+        'OPTIONS': {},
+    }
+CRYPTO_REVIEW_VOTE_FLUSH_BATCH_SIZE = 500  # symbols per UPDATE statement
+CRYPTO_REVIEW_RESET_BATCH_SIZE = 1000  # rows locked at a time by the daily reset
+CRYPTO_REVIEW_RESET_BATCH_PAUSE = 0.05  # (in seconds) pause between reset batches
+CRYPTO_REVIEW_BATCH_MAX_SYMBOLS = 200  # symbols accepted by one batch request
+CRYPTO_REVIEW_HISTORY_MAX_DAYS = 365  # days of history returned by one request
+CRYPTO_REVIEW_CACHE_TIMEOUT = 5 * 60  # (in seconds) entries are invalidated on change, the timeout bounds staleness
+
+# user data caching
+USER_FAVORITES_CACHE_TIMEOUT = 24 * 60 * 60  # (in seconds) entries are versioned, updates make them stale at once
+USER_FUND_WALLET_CACHE_TIMEOUT = 24 * 60 * 60  # (in seconds) the wallet of a user never changes
+USER_PORTFOLIO_CACHE_TIMEOUT = 5 * 60  # (in seconds) deleted on every change, bounds staleness from racing reads
+USER_TOKEN_CACHE_TIMEOUT = 60  # (in seconds) deleted on logout and user changes, bounds staleness of bulk updates
+
+# wallet overviews revalued per batch by the portfolio recompute task
+PORTFOLIO_RECOMPUTE_BATCH_SIZE = 500
+
+# bulk user provisioning
+USER_BULK_CREATE_CHUNK_SIZE = 1000  # users inserted per transaction
+USER_BULK_HASH_WORKERS = None  # password hashing processes, one per CPU by default
+USER_BULK_CREATE_API_LIMIT = 5000  # rows of one upload, imported by a worker, larger files go through the command
+USER_BULK_CREATE_JOB_TIMEOUT = 24 * 60 * 60  # (in seconds) how long the status and report of an upload are kept
+
+# fund transaction list pagination
+FUND_TRANSACTION_PAGE_SIZE = 50
+FUND_TRANSACTION_MAX_PAGE_SIZE = 500
+
+# maximum number of transactions accepted by one bulk request
+FUND_TRANSACTION_BULK_LIMIT = 5000
+
+# rows fetched per round trip by the streaming transaction export
+FUND_TRANSACTION_EXPORT_CHUNK_SIZE = 2000
+
+# price feed
+PRICE_SOURCE = {
+    'BACKEND': 'prices.sources.FilePriceSource',
+    'OPTIONS': {'path': os.environ.get('PRICE_FEED_FILE', str(BASE_DIR / 'prices.csv'))},
+}
+PRICE_INGEST_BATCH_SIZE = 5000  # ticks per INSERT statement
+PRICE_CACHE_TIMEOUT = 5 * 60  # (in seconds) shared cache entries are invalidated on ingestion
+PRICE_LOCAL_CACHE_TTL = 5  # (in seconds) how long a process trusts its local copy of a price
+TRANSACTION_PRICE_TOLERANCE = '0.05'  # allowed relative difference of a transaction price from the latest price
+
+# price candles
+CANDLE_AGGREGATION_BATCH_SIZE = 50000  # ticks grouped at a time
+CANDLE_CACHE_PAGE_SIZE = 500  # periods per cached page of candles
+CANDLE_CACHE_TIMEOUT = 24 * 60 * 60  # (in seconds) pages of ended periods only change by late ticks, which delete them
+CANDLE_MAX_RANGE = 1000  # periods returned by one request
 
 FRONTED_URL = 'http://localhost:3000'
 BACKEND_URL = 'http://localhost:8000'
 
 # email settings
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.environ.get('EMAIL_FILE_PATH', str(BASE_DIR / 'sent_emails'))  # used by the filebased backend
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_USE_TLS = True
 EMAIL_PORT = 587
@@ -180,5 +293,16 @@ EMAIL_HOST_USER = os.environ.get('EMAIL_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_PASS')
 DEAFULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# email templates compiled at startup, with their plaintext variants
+EMAIL_TEMPLATES = [
+    'core/user_reset_password_email.html',
+]
+
+# email outbox, sent by the send_queued_emails task
+EMAIL_OUTBOX_BATCH_SIZE = 50  # messages sent over one SMTP connection
+EMAIL_MAX_ATTEMPTS = 5  # a message is marked failed after this many failed attempts
+EMAIL_RETRY_BACKOFF = 60  # (in seconds) delay of the first retry, doubled after every failed attempt
+EMAIL_OUTBOX_KEEP_DAYS = 7  # sent messages are deleted after this many days
+
 # password reset settings
 DJANGO_REST_MULTITOKENAUTH_RESET_TOKEN_EXPIRY_TIME = 0.5 # (in hours) 30 minutes
\ No newline at end of file
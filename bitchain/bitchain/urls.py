@@ -29,6 +29,7 @@ urlpatterns = [
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'),
     path('api/user/', include('user.urls')),
     path('api/crypto-reviews/', include('crypto_reviews.urls')),
+    path('api/prices/', include('prices.urls')),
 ]
 
 if settings.DEBUG:
@@ -1,8 +1,10 @@
 from django.contrib import admin
+from django.db import transaction
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext as _
 from core.models import (
     FavoriteUserCryptocurrency,
+    OutgoingEmail,
     UserFundTransaction, 
     # UserFeatureTransaction,
     # UserStackingTransaction,
@@ -14,7 +16,8 @@ from core.models import (
     UserWalletOverview,
     # UserWalletCryptocurrency,
     )
-from crypto_reviews.models import CryptoReview
+from crypto_reviews.models import CryptoReview, CryptoReviewDaily, CryptoReviewReset
+from prices.models import CandleWatermark, CryptoPrice, PriceCandle, PriceTick
 
 
 class UserAdmin(BaseUserAdmin):
@@ -36,6 +39,13 @@ class UserAdmin(BaseUserAdmin):
     )
     readonly_fields = ('last_login',)
 
+    def save_model(self, request, obj, form, change):
+        """Save the user, a user added in the admin gets its wallets like with UserManager.create_user"""
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if not change:
+                User.objects.create_wallets(obj)
+
     def date_of_birth_format(self, obj):
         return obj.date_of_birth.strftime("%Y-%m-%d")
     date_of_birth_format.short_description = 'Date of birth'
@@ -50,7 +60,14 @@ class FavoriteUserCryptocurrencyAdmin(admin.ModelAdmin):
 
 admin.site.register(User, UserAdmin)
 admin.site.register(FavoriteUserCryptocurrency, FavoriteUserCryptocurrencyAdmin)
+admin.site.register(OutgoingEmail)
 admin.site.register(CryptoReview)
+admin.site.register(CryptoReviewReset)
+admin.site.register(CryptoReviewDaily)
+admin.site.register(CryptoPrice)
+admin.site.register(PriceTick)
+admin.site.register(PriceCandle)
+admin.site.register(CandleWatermark)
 admin.site.register(UserFundTransaction) 
 # admin.site.register(UserFeatureTransaction)
 # admin.site.register(UserStackingTransaction)
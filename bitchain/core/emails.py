@@ -0,0 +1,90 @@
+"""
+Rendering of email templates.
+
+Each email template is compiled once per process, the ones listed in
+EMAIL_TEMPLATES at startup, together with its plaintext variant: the sibling
+.txt template when there is one, otherwise a template derived from the HTML
+source, so the text is not recomputed from every rendered message. Messages
+are rendered straight from the compiled templates, and a batch of messages
+shares its contexts, so a mailing renders without template lookups.
+"""
+import re
+import threading
+
+from django.conf import settings
+from django.template import Context, TemplateDoesNotExist, engines
+from django.utils.html import strip_tags
+
+HIDDEN_ELEMENT_RE = re.compile(r'<(head|style|script)\b.*?</\1\s*>', re.S | re.I)
+LINK_RE = re.compile(r'<a\b[^>]*?\bhref="([^"]*)"[^>]*>(.*?)</a\s*>', re.S | re.I)
+LINE_BREAK_RE = re.compile(r'<br\s*/?>|</(p|div|h[1-6]|li|tr)\s*>', re.I)
+
+
+def html_to_text_source(source):
+    """
+    Return the source of a plaintext template made from the source of an HTML template:
+    invisible elements are dropped, links are kept as 'label: url' and whitespace is collapsed.
+    """
+    source = HIDDEN_ELEMENT_RE.sub('', source)
+    source = LINK_RE.sub(lambda match: f'{" ".join(strip_tags(match[2]).split())}: {match[1]}', source)
+    source = LINE_BREAK_RE.sub('\n', source)
+    lines = [' '.join(line.split()) for line in strip_tags(source).splitlines()]
+    # at most one blank line between paragraphs
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip() + '\n'
+
+
+class EmailTemplate:
+    """Compiled HTML and plaintext variants of an email template."""
+
+    def __init__(self, name):
+        engine = engines['django']
+        self.name = name
+        self.html = engine.get_template(name).template
+        try:
+            self.text = engine.get_template(re.sub(r'\.html?$', '', name) + '.txt').template
+        except TemplateDoesNotExist:
+            self.text = engine.from_string(html_to_text_source(self.html.source)).template
+
+    def render(self, context):
+        """Return (html, text) of one message."""
+        return self.html.render(Context(context)), self.text.render(Context(context, autoescape=False))
+
+    def render_batch(self, contexts):
+        """Return [(html, text)] of many messages, rendered with one pair of reused contexts."""
+        html_context, text_context = Context(), Context(autoescape=False)
+        messages = []
+        for context in contexts:
+            with html_context.push(context), text_context.push(context):
+                messages.append((self.html.render(html_context), self.text.render(text_context)))
+        return messages
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_email_template(name):
+    """Return the compiled email template, compiling it on first use."""
+    template = _templates.get(name)
+    if template is None:
+        with _templates_lock:
+            template = _templates.get(name)
+            if template is None:
+                template = _templates[name] = EmailTemplate(name)
+    return template
+
+
+def warm_email_templates():
+    """Compile the templates of EMAIL_TEMPLATES, a missing template fails at startup instead of on send."""
+    for name in settings.EMAIL_TEMPLATES:
+        get_email_template(name)
+
+
+def render_email(name, context):
+    """Return (html, text) of an email rendered from the template."""
+    return get_email_template(name).render(context)
+
+
+def render_email_batch(name, contexts):
+    """Return [(html, text)] of the emails rendered from the template, one per context."""
+    return get_email_template(name).render_batch(contexts)
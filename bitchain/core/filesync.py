@@ -0,0 +1,112 @@
+"""
+Incremental copy of directory trees, used to sync media and static files into
+the shared volume when a container starts.
+
+A file is copied only when the destination is missing or differs in size or
+modification time, or with checksum=True, in content. Changed files are copied
+by a thread pool, written to a temporary name and renamed into place, so a
+reader never sees a partial file. With link=True files are hard-linked
+instead, which costs no copying when both trees are on the same filesystem.
+Files that exist only in the destination, like uploads, are left alone.
+"""
+import hashlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def is_unchanged(source, destination, source_stat, link=False, checksum=False):
+    """Return whether the destination already holds the source file."""
+    try:
+        destination_stat = os.stat(destination)
+    except FileNotFoundError:
+        return False
+    if link and os.path.samestat(source_stat, destination_stat):
+        return True
+    if source_stat.st_size != destination_stat.st_size:
+        return False
+    if checksum:
+        if file_digest(source) != file_digest(destination):
+            return False
+        # same content, the time is aligned so the next run takes the fast path
+        os.utime(destination, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+        return True
+    # whole seconds, some filesystems do not keep finer times
+    return int(source_stat.st_mtime) == int(destination_stat.st_mtime)
+
+
+def place_file(source, destination, link=False):
+    """Hard-link or copy the file into place. Returns 'linked' or 'copied'."""
+    temporary = f'{destination}.sync-{os.getpid()}-{threading.get_ident()}'
+    try:
+        if link:
+            try:
+                os.link(source, temporary)
+                os.replace(temporary, destination)
+                return 'linked'
+            except OSError:
+                # another filesystem or no hard link support, copy instead
+                pass
+        shutil.copy2(source, temporary)
+        os.replace(temporary, destination)
+        return 'copied'
+    finally:
+        if os.path.lexists(temporary):
+            os.remove(temporary)
+
+
+def sync_tree(source, destination, workers=None, link=False, checksum=False):
+    """
+    Bring the destination up to date with the source tree. Returns a stats dict
+    with the number of files checked, copied, linked and unchanged, the bytes
+    written and the duration.
+    """
+    if not os.path.isdir(source):
+        raise FileNotFoundError(f'Source directory does not exist: {source}')
+    started = time.monotonic()
+    stats = {'files': 0, 'copied': 0, 'linked': 0, 'unchanged': 0, 'bytes': 0}
+
+    candidates = []
+    for directory, _, files in os.walk(source):
+        target_directory = os.path.join(destination, os.path.relpath(directory, source))
+        os.makedirs(target_directory, exist_ok=True)
+        for name in files:
+            source_path, destination_path = os.path.join(directory, name), os.path.join(target_directory, name)
+            source_stat = os.stat(source_path)
+            stats['files'] += 1
+            candidates.append((source_path, destination_path, source_stat))
+
+    def sync_file(item):
+        source_path, destination_path, source_stat = item
+        if is_unchanged(source_path, destination_path, source_stat, link, checksum):
+            return 'unchanged', 0
+        result = place_file(source_path, destination_path, link)
+        return result, source_stat.st_size if result == 'copied' else 0
+
+    # comparing and copying both wait on the disk, the pool overlaps them across files
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4)) as executor:
+        for result, written in executor.map(sync_file, candidates):
+            stats[result] += 1
+            stats['bytes'] += written
+
+    stats['seconds'] = round(time.monotonic() - started, 3)
+    return stats
+
+
+def format_stats(stats):
+    return (
+        f"{stats['files']} files checked, {stats['copied']} copied, {stats['linked']} linked, "
+        f"{stats['unchanged']} unchanged, {stats['bytes']} bytes written in {stats['seconds']}s"
+    )
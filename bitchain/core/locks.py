@@ -0,0 +1,35 @@
+"""
+Locks kept in the shared cache, for work that must not run on two workers at once.
+"""
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+LOCK_POLL = 0.1  # (in seconds)
+
+
+@contextmanager
+def cache_lock(key, timeout, wait=False):
+    """
+    Hold the lock while the block runs, yields whether it was taken. A taken lock
+    expires after timeout seconds if its holder dies. With wait=True a held lock is
+    waited for, up to timeout seconds.
+
+    The lock stores a token of its holder and is released only while it still holds
+    that token, so a holder that outlived the timeout does not release the lock the
+    next holder took in the meantime.
+    """
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + timeout
+    while not cache.add(key, token, timeout):
+        if not wait or time.monotonic() >= deadline:
+            yield False
+            return
+        time.sleep(LOCK_POLL)
+    try:
+        yield True
+    finally:
+        if cache.get(key) == token:
+            cache.delete(key)
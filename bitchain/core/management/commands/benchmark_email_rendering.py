@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from core.emails import get_email_template
+
+
+class Command(BaseCommand):
+    help = 'Measure rendered emails per second, per message with the template loader and with the compiled templates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=5000, help='Messages rendered per run.')
+        parser.add_argument('--template', default=settings.EMAIL_TEMPLATES[0], help='Email template to render.')
+
+    def handle(self, *args, **options):
+        name, count = options['template'], options['messages']
+        contexts = [
+            {
+                'username': f'user{number}',
+                'email': f'user{number}@example.com',
+                'reset_password_url': f'{settings.FRONTED_URL}/account/reset-password/{number:032x}',
+            }
+            for number in range(count)
+        ]
+        template = get_email_template(name)
+        self.stdout.write(f'Template {name}, {count} messages per run')
+
+        def loader():
+            for context in contexts:
+                html = render_to_string(name, context)
+                strip_tags(html)
+
+        def compiled():
+            for context in contexts:
+                template.render(context)
+
+        def batch():
+            template.render_batch(contexts)
+
+        for label, run in (('render_to_string + strip_tags', loader), ('compiled', compiled), ('compiled batch', batch)):
+            started = time.monotonic()
+            run()
+            seconds = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'{label}: {count / seconds:.0f} messages/s, {seconds * 1000000 / count:.0f} us per message'
+            ))
@@ -1,10 +1,18 @@
 import os
-import shutil
 from django.core.management.base import BaseCommand
 from django.conf import settings
 
+from core.filesync import format_stats, sync_tree
+
 class Command(BaseCommand):
-    help = 'Copy media files to another directory in docker container'
+    help = 'Copy media files to another directory in docker container, only new and changed files are copied'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Files copied in parallel.')
+        parser.add_argument('--link', action='store_true',
+                            help='Hard-link files instead of copying them, when both directories share a filesystem.')
+        parser.add_argument('--checksum', action='store_true',
+                            help='Compare file contents instead of modification times.')
 
     def handle(self, *args, **options):
         # Get the absolute path of the source and destination directories
@@ -12,13 +20,11 @@ class Command(BaseCommand):
         destination_dir = os.path.abspath(os.path.join(settings.MEDIA_ROOT, ))
         
         try:
-            # Create the destination directory if it doesn't exist
-            os.makedirs(destination_dir, exist_ok=True)
-
-            # Copy the entire source directory with its contents to the destination directory
-            shutil.copytree(source_dir, destination_dir, dirs_exist_ok=True)
+            # Copy the files that are missing or changed in the destination directory
+            stats = sync_tree(source_dir, destination_dir, workers=options['workers'],
+                              link=options['link'], checksum=options['checksum'])
 
-            self.stdout.write(self.style.SUCCESS('Media files copied successfully'))
+            self.stdout.write(self.style.SUCCESS(f'Media files copied successfully - {format_stats(stats)}'))
 
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error copying media files: {str(e)}'))
@@ -1,23 +1,21 @@
 """
 Models for the core app of the project, mostly for user related data
 """
+import hashlib
 import os
 import uuid
 from django.contrib.contenttypes.fields import GenericRelation
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import (
     AbstractBaseUser, BaseUserManager, PermissionsMixin
 )
-from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from django_rest_passwordreset.signals import reset_password_token_created
-from django.core.mail import EmailMultiAlternatives
 
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 from django.conf import settings
+from django.utils import timezone
 
 
 class UserManager(BaseUserManager):
@@ -47,9 +45,16 @@ class UserManager(BaseUserManager):
         user = self.model(email=self.normalize_email(email), full_name=full_name, nick_name=nick_name,
                           date_of_birth=date_of_birth, pesel=pesel, **extra_fields)
         user.set_password(password)  # encrypts password
-        user.save(using=self._db)  # standard procedure for saving objects in django project
+        with transaction.atomic(using=self._db):
+            user.save(using=self._db)  # standard procedure for saving objects in django project
+            self.create_wallets(user)
         return user
 
+    def create_wallets(self, user):
+        """Creates the wallet overview and the fund wallet of a new user, later saves of the user do not touch them"""
+        overview = UserWalletOverview.objects.using(self._db).create(user=user)
+        UserFundWallet.objects.using(self._db).create(fund_wallet=overview)
+
     def create_superuser(self, email, password, full_name, nick_name, date_of_birth, pesel, **extra_fields):
         """Creates and saves a new superuser"""
         user = self.create_user(email, password, full_name, nick_name, date_of_birth, pesel, **extra_fields)
@@ -59,11 +64,17 @@ class UserManager(BaseUserManager):
         return user
 
 
+def user_upload_dir(user_id):
+    """Directory of a user's files, two levels of hash prefix subdirectories keep every directory small"""
+    digest = hashlib.sha256(str(user_id).encode()).hexdigest()
+    return os.path.join('uploads', 'user', digest[:2], digest[2:4])
+
+
 def get_upload_path(instance, filename):
     ext = os.path.splitext(filename)[1]
     filename = f'{instance.id}{ext}'
 
-    return os.path.join('uploads', 'user',  filename)
+    return os.path.join(user_upload_dir(instance.id), filename)
 
 
 class User(AbstractBaseUser, PermissionsMixin):
@@ -77,6 +88,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     pesel = models.CharField(max_length=11)
     image = models.ImageField(null=True, upload_to=get_upload_path, blank=True, default=os.path.join('uploads', 'user',
                                                                                                       'default.jpg'))
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # {format: {size: storage name}}
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
 
@@ -101,7 +113,9 @@ class User(AbstractBaseUser, PermissionsMixin):
         :param kwargs:
         :return:
         """
-        
+        from core.emails import render_email
+        from core.outbox import queue_email
+
         reset_password_url = f"{settings.FRONTED_URL}/account/reset-password/{reset_password_token.key}"
         
         # send an e-mail to the user
@@ -112,21 +126,46 @@ class User(AbstractBaseUser, PermissionsMixin):
         }
 
         # render email text
-        email_html_message = render_to_string('core/user_reset_password_email.html', context)
-        email_plaintext_message = strip_tags(email_html_message)
+        email_html_message, email_plaintext_message = render_email('core/user_reset_password_email.html', context)
 
-        msg = EmailMultiAlternatives(
+        # the message is sent by a worker, the request does not wait for SMTP
+        queue_email(
             # title:
-            "BitChain Password Reset - {reset_password_token.user.nick_name}",
+            f"BitChain Password Reset - {reset_password_token.user.nick_name}",
             # message:
             email_plaintext_message,
-            # from:
-            settings.DEFAULT_FROM_EMAIL,
             # to:
-            [reset_password_token.user.email]
+            [reset_password_token.user.email],
+            html_body=email_html_message,
         )
-        msg.attach_alternative(email_html_message, "text/html")
-        msg.send()
+
+
+class OutgoingEmail(models.Model):
+    """Email waiting in the outbox, sent in batches by the send_queued_emails task"""
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    send_after = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'send_after'], name='outgoing_email_due'),
+        ]
+
+    def __str__(self):
+        return f'{self.status} email - {self.subject} - {", ".join(self.to)}'
 
 
 class FavoriteUserCryptocurrency(models.Model):
@@ -143,8 +182,16 @@ class FavoriteUserCryptocurrency(models.Model):
 
 
 class UserWalletOverview(models.Model):
+    """
+    Portfolio summary of a user: total USD value, 24h change and per-symbol breakdown
+    of the fund wallet. Updated on every balance change and recomputed periodically from prices.
+    """
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    
+    total_value_usd = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+    change_24h_usd = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+    breakdown = models.JSONField(default=dict, blank=True)
+    valued_at = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
         return f"wallet overview - {self.user.email}"
     
@@ -166,17 +213,6 @@ class UserTransactionBase(models.Model):
     class Meta:
         abstract = True
 
-@receiver(post_save, sender=User)
-def create_user_wallets(sender, instance, created, **kwargs):
-    if created:
-        UserWalletOverview.objects.create(user=instance)
-        UserFundWallet.objects.create(fund_wallet=UserWalletOverview.objects.get(user=instance))
-
-@receiver(post_save, sender=User)
-def save_user_wallets(sender, instance, **kwargs):
-    instance.userwalletoverview.save()
-    UserFundWallet.objects.get(fund_wallet=UserWalletOverview.objects.get(user=instance)).save()
-
 class UserFundWallet(UserBaseWallet):
     fund_wallet = models.OneToOneField(UserWalletOverview, null=True, blank=True, on_delete=models.CASCADE)
     wallet_type = models.CharField(max_length=10, default='fund', editable=False)
@@ -187,6 +223,11 @@ class UserFundWallet(UserBaseWallet):
     
 class UserFundTransaction(UserTransactionBase):
     fund_wallet = models.ForeignKey(UserFundWallet, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fund_wallet', 'transaction_date'], name='fund_transaction_wallet_date'),
+        ]
     
     def __str__(self):
         return f"fund transaction - {self.transaction_id} - {self.fund_wallet.fund_wallet.user.email}"
@@ -197,6 +238,9 @@ class UserFundWalletCryptocurrency(models.Model):
     cryptocurrency_symbol = models.CharField(max_length=10)
     cryptocurrency_amount = models.DecimalField(max_digits=16, decimal_places=10, default=0.00)
 
+    class Meta:
+        unique_together = ('wallet_fund_id', 'cryptocurrency_symbol')
+
 # class UserFeatureWallet(UserBaseWallet):
 #     feature_wallet = models.OneToOneField(UserWalletOverview, null=True, blank=True, on_delete=models.CASCADE)
 #     wallet_type = models.CharField(max_length=10, default='feature', editable=False)
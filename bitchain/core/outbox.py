@@ -0,0 +1,130 @@
+"""
+Outbox of emails sent by Celery workers.
+
+Requests only insert the message into the OutgoingEmail table; once the
+transaction commits a worker sends the pending messages in batches, each batch
+over a single SMTP connection. Messages that could not be sent are retried
+with exponential backoff until EMAIL_MAX_ATTEMPTS attempts have failed;
+messages that cannot be built, like ones with invalid headers, fail at once.
+"""
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import OutgoingEmail
+
+EMAIL_RETRY_MAX_DELAY = 6 * 60 * 60  # (in seconds)
+
+
+def queue_email(subject, body, to, html_body='', from_email=None):
+    """Store the email in the outbox and have it sent after the current transaction commits."""
+    from core.tasks import send_queued_emails
+
+    email = OutgoingEmail.objects.create(
+        # a header cannot span lines, e.g. a nick name with a newline in the subject
+        subject=' '.join(subject.splitlines()),
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+    )
+    transaction.on_commit(send_queued_emails.delay)
+    return email
+
+
+def retry_delay(attempts):
+    """Return the delay before the next attempt after the given number of failed attempts."""
+    return timedelta(seconds=min(settings.EMAIL_RETRY_BACKOFF * 2 ** (attempts - 1), EMAIL_RETRY_MAX_DELAY))
+
+
+def build_message(email, connection):
+    message = EmailMultiAlternatives(email.subject, email.body, email.from_email, email.to, connection=connection)
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def record_failure(email, error, now, retry=True):
+    email.attempts += 1
+    email.last_error = f'{type(error).__name__}: {error}'
+    if not retry or email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+        email.status = OutgoingEmail.FAILED
+    else:
+        email.send_after = now + retry_delay(email.attempts)
+
+
+def send_email_batch(batch_size=None):
+    """
+    Send up to EMAIL_OUTBOX_BATCH_SIZE due emails over one connection. The rows are
+    locked while they are sent, concurrent workers skip them and take the next ones.
+    Returns a metrics dict.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    metrics = {'sent': 0, 'retried': 0, 'failed': 0}
+
+    with transaction.atomic():
+        now = timezone.now()
+        emails = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutgoingEmail.PENDING, send_after__lte=now)
+            .order_by('send_after')[:batch_size]
+        )
+        if not emails:
+            return metrics
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except (smtplib.SMTPException, OSError) as error:
+            for email in emails:
+                record_failure(email, error, now)
+        else:
+            try:
+                for email in emails:
+                    try:
+                        message = build_message(email, connection)
+                        message.message()
+                    except Exception as error:
+                        # e.g. BadHeaderError, the message will never be valid
+                        record_failure(email, error, now, retry=False)
+                        continue
+                    try:
+                        message.send()
+                    except Exception as error:
+                        # one message must not roll back the batch, the sent ones would be sent again
+                        record_failure(email, error, now)
+                    else:
+                        email.status, email.sent_at = OutgoingEmail.SENT, now
+            finally:
+                connection.close()
+
+        OutgoingEmail.objects.bulk_update(emails, ['status', 'attempts', 'last_error', 'send_after', 'sent_at'])
+
+    for email in emails:
+        if email.status == OutgoingEmail.SENT:
+            metrics['sent'] += 1
+        elif email.status == OutgoingEmail.FAILED:
+            metrics['failed'] += 1
+        else:
+            metrics['retried'] += 1
+    return metrics
+
+
+def send_pending_emails(batch_size=None):
+    """Send batches until no email is due, then delete sent emails older than EMAIL_OUTBOX_KEEP_DAYS."""
+    totals = {'sent': 0, 'retried': 0, 'failed': 0}
+    while True:
+        metrics = send_email_batch(batch_size)
+        if not any(metrics.values()):
+            break
+        for name, count in metrics.items():
+            totals[name] += count
+
+    OutgoingEmail.objects.filter(
+        status=OutgoingEmail.SENT, sent_at__lt=timezone.now() - timedelta(days=settings.EMAIL_OUTBOX_KEEP_DAYS),
+    ).delete()
+    return totals
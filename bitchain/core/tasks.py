@@ -0,0 +1,19 @@
+from celery import shared_task
+from django.db.utils import ProgrammingError as django_db_ProgrammingError
+
+from .outbox import send_pending_emails
+
+
+@shared_task
+def send_queued_emails():
+    """
+    Sends the due emails of the outbox in batches, one SMTP connection per batch. This task is queued whenever
+    an email is added to the outbox and executed every minute to retry failed attempts.
+    """
+    try:
+        metrics = send_pending_emails()
+        if any(metrics.values()):
+            print(f"Queued emails processed - {metrics}")
+        return metrics
+    except django_db_ProgrammingError:
+        print("Database not ready yet. Skipping send_queued_emails task.")
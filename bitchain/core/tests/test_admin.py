@@ -7,6 +7,8 @@ from django.test import (
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core.models import UserFundWallet
+
 
 class AdminSiteTests(TestCase):
     """Test admin site"""
@@ -56,4 +58,21 @@ class AdminSiteTests(TestCase):
         url = reverse('admin:core_user_add')
         res = self.client.get(url)
 
-        self.assertEqual(res.status_code, 200)
\ No newline at end of file
+        self.assertEqual(res.status_code, 200)
+
+    def test_add_user_creates_wallets(self):
+        """Test that a user added in the admin gets its wallets"""
+        url = reverse('admin:core_user_add')
+        res = self.client.post(url, {
+            'email': 'added@example.com',
+            'full_name': 'Added User',
+            'nick_name': 'Added',
+            'date_of_birth': '1992-01-01',
+            'pesel': '90010100002',
+            'password1': 'Testing-pass-123',
+            'password2': 'Testing-pass-123',
+        })
+
+        self.assertEqual(res.status_code, 302)
+        user = get_user_model().objects.get(email='added@example.com')
+        self.assertTrue(UserFundWallet.objects.filter(fund_wallet__user=user).exists())
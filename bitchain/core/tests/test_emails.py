@@ -0,0 +1,80 @@
+"""
+Tests for the email template rendering.
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase
+
+from core.emails import get_email_template, html_to_text_source, render_email, render_email_batch
+
+
+RESET_TEMPLATE = 'core/user_reset_password_email.html'
+
+
+def reset_context(number=0):
+    return {
+        'username': f'user{number}',
+        'email': f'user{number}@example.com',
+        'reset_password_url': f'http://localhost:3000/account/reset-password/key{number}',
+    }
+
+
+class EmailRenderingTests(SimpleTestCase):
+    """Test rendering emails from compiled templates"""
+
+    def test_html_matches_template_loader(self):
+        """Test that the HTML variant is the same as rendered by the template loader"""
+        context = reset_context()
+
+        html, _ = render_email(RESET_TEMPLATE, context)
+
+        self.assertEqual(html, render_to_string(RESET_TEMPLATE, context))
+
+    def test_text_variant(self):
+        """Test that the plaintext variant has the text and link of the message without markup and styles"""
+        _, text = render_email(RESET_TEMPLATE, reset_context())
+
+        self.assertIn('Hi user0', text)
+        self.assertIn('Reset Password: http://localhost:3000/account/reset-password/key0', text)
+        self.assertNotIn('<', text)
+        self.assertNotIn('font-family', text)
+        self.assertNotIn('\n\n\n', text)
+
+    def test_text_variant_not_escaped(self):
+        """Test that values are HTML escaped only in the HTML variant"""
+        context = dict(reset_context(), username='Tom & Jerry')
+
+        html, text = render_email(RESET_TEMPLATE, context)
+
+        self.assertIn('Hi Tom &amp; Jerry', html)
+        self.assertIn('Hi Tom & Jerry', text)
+
+    def test_batch_matches_single_renders(self):
+        """Test that a batch renders every message like single renders, without leaking values between them"""
+        contexts = [reset_context(number) for number in range(3)]
+
+        messages = render_email_batch(RESET_TEMPLATE, contexts)
+
+        self.assertEqual(messages, [render_email(RESET_TEMPLATE, context) for context in contexts])
+        self.assertIn('Hi user2', messages[2][1])
+
+    def test_template_compiled_once(self):
+        """Test that the compiled template is reused"""
+        self.assertIs(get_email_template(RESET_TEMPLATE), get_email_template(RESET_TEMPLATE))
+
+    def test_html_to_text_source(self):
+        """Test that the text source keeps template variables, links and paragraphs"""
+        source = '<html><head><style>p { color: red; }</style></head><body>' \
+                 '<p>Hi {{ name }}</p>\n\n\n\n<a href="{{ url }}"><b>Open</b></a></body></html>'
+
+        self.assertEqual(html_to_text_source(source), 'Hi {{ name }}\n\nOpen: {{ url }}\n')
+
+    def test_benchmark_command(self):
+        """Test that the benchmark reports the throughput of every rendering mode"""
+        out = StringIO()
+
+        call_command('benchmark_email_rendering', messages=10, stdout=out)
+
+        self.assertEqual(out.getvalue().count('messages/s'), 3)
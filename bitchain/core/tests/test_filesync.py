@@ -0,0 +1,118 @@
+"""
+Tests for the incremental directory sync of the move_media and move_static commands.
+"""
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from core.filesync import sync_tree
+
+
+class SyncTreeTests(SimpleTestCase):
+    """Test syncing directory trees"""
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.destination = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.destination, ignore_errors=True)
+        self.write('a.txt', b'first')
+        self.write(os.path.join('nested', 'deeper', 'b.txt'), b'second file')
+
+    def write(self, name, data, root=None):
+        path = os.path.join(root or self.source, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+        return path
+
+    def read(self, name):
+        with open(os.path.join(self.destination, name), 'rb') as file:
+            return file.read()
+
+    def test_first_sync_copies_everything(self):
+        """Test that a first sync copies all files with their directories"""
+        stats = sync_tree(self.source, self.destination)
+
+        self.assertEqual(stats['files'], 2)
+        self.assertEqual(stats['copied'], 2)
+        self.assertEqual(stats['bytes'], len(b'first') + len(b'second file'))
+        self.assertEqual(self.read(os.path.join('nested', 'deeper', 'b.txt')), b'second file')
+
+    def test_second_sync_copies_nothing(self):
+        """Test that unchanged files are not copied again"""
+        sync_tree(self.source, self.destination)
+
+        stats = sync_tree(self.source, self.destination)
+
+        self.assertEqual(stats['copied'], 0)
+        self.assertEqual(stats['unchanged'], 2)
+        self.assertEqual(stats['bytes'], 0)
+
+    def test_changed_file_copied(self):
+        """Test that only a changed file is copied"""
+        sync_tree(self.source, self.destination)
+        path = self.write('a.txt', b'changed content')
+        os.utime(path, (0, 0))
+
+        stats = sync_tree(self.source, self.destination)
+
+        self.assertEqual(stats['copied'], 1)
+        self.assertEqual(self.read('a.txt'), b'changed content')
+
+    def test_destination_only_files_kept(self):
+        """Test that files existing only in the destination, like uploads, are kept"""
+        self.write('upload.jpg', b'upload', root=self.destination)
+
+        sync_tree(self.source, self.destination)
+
+        self.assertEqual(self.read('upload.jpg'), b'upload')
+
+    def test_link(self):
+        """Test that files are hard-linked instead of copied with link"""
+        stats = sync_tree(self.source, self.destination, link=True)
+
+        self.assertEqual(stats['linked'], 2)
+        self.assertEqual(stats['bytes'], 0)
+        self.assertTrue(os.path.samefile(os.path.join(self.source, 'a.txt'), os.path.join(self.destination, 'a.txt')))
+        self.assertEqual(sync_tree(self.source, self.destination, link=True)['unchanged'], 2)
+
+    def test_checksum(self):
+        """Test that with checksum a file with the same content but another time is not copied"""
+        sync_tree(self.source, self.destination)
+        os.utime(os.path.join(self.source, 'a.txt'), (0, 0))
+
+        stats = sync_tree(self.source, self.destination, checksum=True)
+
+        self.assertEqual(stats['copied'], 0)
+        self.assertEqual(stats['unchanged'], 2)
+        self.assertEqual(os.stat(os.path.join(self.destination, 'a.txt')).st_mtime, 0)
+
+    def test_checksum_same_size_changed_content(self):
+        """Test that with checksum a file of the same size but other content is copied"""
+        sync_tree(self.source, self.destination)
+        self.write('a.txt', b'fir5t')
+
+        stats = sync_tree(self.source, self.destination, checksum=True)
+
+        self.assertEqual(stats['copied'], 1)
+        self.assertEqual(self.read('a.txt'), b'fir5t')
+
+    def test_move_media_command(self):
+        """Test that move_media syncs the media directory and reports the counts"""
+        base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_dir, ignore_errors=True)
+        self.write(os.path.join('uploads', 'user', 'default.jpg'), b'avatar', root=os.path.join(base_dir, 'media'))
+        out = StringIO()
+
+        with override_settings(BASE_DIR=base_dir, MEDIA_ROOT=self.destination):
+            call_command('move_media', stdout=out)
+            call_command('move_media', stdout=out)
+
+        self.assertEqual(self.read(os.path.join('uploads', 'user', 'default.jpg')), b'avatar')
+        self.assertIn('1 files checked, 1 copied', out.getvalue())
+        self.assertIn('1 files checked, 0 copied, 0 linked, 1 unchanged', out.getvalue())
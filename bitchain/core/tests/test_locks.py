@@ -0,0 +1,35 @@
+"""
+Tests for the cache locks.
+"""
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from core.locks import cache_lock
+
+LOCK_KEY = 'tests:lock'
+
+
+class CacheLockTests(SimpleTestCase):
+    """Test taking and releasing cache locks"""
+
+    def setUp(self):
+        cache.delete(LOCK_KEY)
+
+    def test_held_lock_not_taken(self):
+        """Test that a lock is taken once at a time and released when the block ends"""
+        with cache_lock(LOCK_KEY, 60) as locked:
+            self.assertTrue(locked)
+            with cache_lock(LOCK_KEY, 60) as again:
+                self.assertFalse(again)
+            self.assertIsNotNone(cache.get(LOCK_KEY))
+
+        self.assertIsNone(cache.get(LOCK_KEY))
+
+    def test_expired_holder_keeps_next_lock(self):
+        """Test that a holder whose lock expired does not release the lock taken by the next one"""
+        with cache_lock(LOCK_KEY, 60) as locked:
+            self.assertTrue(locked)
+            # the lock expired and another worker took it
+            cache.set(LOCK_KEY, 'next holder', 60)
+
+        self.assertEqual(cache.get(LOCK_KEY), 'next holder')
@@ -3,7 +3,7 @@ import os
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.conf import settings
-from core.models import FavoriteUserCryptocurrency
+from core.models import FavoriteUserCryptocurrency, UserFundWallet, UserWalletOverview
 
 USER_EXAMPLE = {
     'email': 'test@example.com',
@@ -131,6 +131,19 @@ class UserModelTestCase(TestCase):
         self.assertTrue(user.is_superuser)
         self.assertTrue(user.is_staff)
 
+    def test_create_user_creates_wallets(self):
+        """Test that wallets are created with the user and later saves do not touch them"""
+        # savepoint, user, overview, base wallet, fund wallet, release
+        with self.assertNumQueries(6):
+            user = get_user_model().objects.create_user(**USER_EXAMPLE)
+
+        overview = UserWalletOverview.objects.get(user=user)
+        self.assertTrue(UserFundWallet.objects.filter(fund_wallet=overview).exists())
+
+        user.full_name = 'New Name'
+        with self.assertNumQueries(1):
+            user.save()
+
 
 class DefaultImageTestCase(TestCase):
     def test_default_image_exists(self):
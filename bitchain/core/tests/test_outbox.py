@@ -0,0 +1,165 @@
+"""
+Tests for the email outbox.
+"""
+import smtplib
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import outbox
+from core.models import OutgoingEmail
+from core.outbox import queue_email, send_pending_emails
+
+
+PASSWORD_RESET_URL = reverse('user:password_reset:reset-password-request')
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+class PasswordResetEmailTests(TestCase):
+    """Test that password reset emails go through the outbox"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass123',
+            full_name='Test User',
+            nick_name='Test',
+            date_of_birth='1990-01-01',
+            pesel='90010100000',
+        )
+
+    def test_reset_email_queued_and_sent_after_commit(self):
+        """Test that the reset request stores the email and it is sent once the transaction commits"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            res = self.client.post(PASSWORD_RESET_URL, {'email': self.user.email})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.to, [self.user.email])
+        self.assertEqual(email.subject, 'BitChain Password Reset - Test')
+        self.assertIn('/account/reset-password/', email.html_body)
+        self.assertEqual(len(mail.outbox), 0)
+
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.SENT)
+
+
+class OutboxSendingTests(TestCase):
+    """Test sending the emails of the outbox"""
+
+    def queue(self, count):
+        with self.captureOnCommitCallbacks():
+            for number in range(count):
+                queue_email(f'Subject {number}', 'Body', [f'user{number}@example.com'])
+
+    def test_one_connection_per_batch(self):
+        """Test that a batch of emails is sent over a single connection"""
+        self.queue(5)
+
+        with patch.object(outbox, 'get_connection', wraps=outbox.get_connection) as get_connection:
+            metrics = send_pending_emails(batch_size=2)
+
+        self.assertEqual(metrics, {'sent': 5, 'retried': 0, 'failed': 0})
+        self.assertEqual(get_connection.call_count, 3)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(OutgoingEmail.objects.exclude(status=OutgoingEmail.SENT).exists())
+
+    @override_settings(EMAIL_RETRY_BACKOFF=60, EMAIL_MAX_ATTEMPTS=2)
+    def test_failed_email_retried_with_backoff(self):
+        """Test that an email that could not be sent is retried later and marked failed after the last attempt"""
+        self.queue(1)
+        error = smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=error):
+            metrics = send_pending_emails()
+
+        self.assertEqual(metrics, {'sent': 0, 'retried': 1, 'failed': 0})
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('SMTPServerDisconnected', email.last_error)
+        self.assertGreater(email.send_after, timezone.now() + timedelta(seconds=50))
+
+        OutgoingEmail.objects.update(send_after=timezone.now())
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=error):
+            metrics = send_pending_emails()
+
+        self.assertEqual(metrics, {'sent': 0, 'retried': 0, 'failed': 1})
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.FAILED)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_retry_delay_doubles(self):
+        """Test that the retry delay doubles with every attempt"""
+        with self.settings(EMAIL_RETRY_BACKOFF=30):
+            delays = [outbox.retry_delay(attempts).total_seconds() for attempts in (1, 2, 3)]
+
+        self.assertEqual(delays, [30, 60, 120])
+
+    @override_settings(EMAIL_OUTBOX_KEEP_DAYS=7)
+    def test_old_sent_emails_deleted(self):
+        """Test that sent emails older than the retention period are deleted"""
+        self.queue(2)
+        send_pending_emails()
+        OutgoingEmail.objects.filter(subject='Subject 0').update(sent_at=timezone.now() - timedelta(days=8))
+
+        send_pending_emails()
+
+        self.assertEqual(list(OutgoingEmail.objects.values_list('subject', flat=True)), ['Subject 1'])
+
+    def test_invalid_email_fails_without_stopping_batch(self):
+        """Test that an email with an invalid header is marked failed and the others are still sent"""
+        self.queue(2)
+        OutgoingEmail.objects.filter(subject='Subject 0').update(subject='Broken\nSubject')
+
+        metrics = send_pending_emails()
+
+        self.assertEqual(metrics, {'sent': 1, 'retried': 0, 'failed': 1})
+        broken = OutgoingEmail.objects.get(subject='Broken\nSubject')
+        self.assertEqual(broken.status, OutgoingEmail.FAILED)
+        self.assertEqual(broken.attempts, 1)
+        self.assertIn('BadHeaderError', broken.last_error)
+        self.assertEqual([message.subject for message in mail.outbox], ['Subject 1'])
+
+    def test_unexpected_send_error_retried(self):
+        """Test that any error while sending one email only has that email retried"""
+        self.queue(2)
+        send_messages = EmailBackend.send_messages
+
+        def fail_first(connection, messages):
+            if messages[0].subject == 'Subject 0':
+                raise ValueError('Unexpected')
+            return send_messages(connection, messages)
+
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', autospec=True, side_effect=fail_first):
+            metrics = send_pending_emails()
+
+        self.assertEqual(metrics, {'sent': 1, 'retried': 1, 'failed': 0})
+        self.assertEqual(OutgoingEmail.objects.get(subject='Subject 1').status, OutgoingEmail.SENT)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_newlines_removed_from_subject(self):
+        """Test that queued subjects are kept on one line"""
+        with self.captureOnCommitCallbacks():
+            email = queue_email('BitChain Password Reset - Bad\r\nBcc: x@example.com', 'Body', ['user@example.com'])
+
+        self.assertEqual(email.subject, 'BitChain Password Reset - Bad Bcc: x@example.com')
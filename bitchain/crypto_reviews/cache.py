@@ -0,0 +1,106 @@
+"""
+Read-through cache of serialized CryptoReview rows, keyed by symbol.
+
+Cached data reflects the database only; buffered votes are merged on read
+(see votes.with_pending_votes). Entries are stored under a versioned key per
+symbol, like the favorites of users. Whenever the stored counts change, i.e.
+when votes are flushed and when counts are reset, the symbols get a new version
+instead of having their entries deleted, so a reader that loaded the row before
+the change can never store the old counts under the current key. Versions are
+taken from the current time in nanoseconds and never repeat.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import CryptoReview
+from .serializers import CryptoReviewSerializer
+
+SYMBOL_MAX_LENGTH = CryptoReview._meta.get_field('symbol').max_length
+
+
+def _version_key(symbol):
+    return f'crypto_reviews:review-version:{symbol}'
+
+
+def review_cache_key(symbol, version):
+    return f'crypto_reviews:review:{symbol}:{version}'
+
+
+def check_symbol(symbol):
+    if len(symbol) > SYMBOL_MAX_LENGTH:
+        raise ValueError(f"Symbol too long. Maximum length is {SYMBOL_MAX_LENGTH}.")
+
+
+def get_review_data(symbol):
+    """
+    Return serialized CryptoReview data for the symbol, creating the review
+    if it does not exist yet. Served from cache when possible.
+    """
+    check_symbol(symbol)
+    key = review_cache_key(symbol, cache.get_or_set(_version_key(symbol), time.time_ns, None))
+    data = cache.get(key)
+    if data is None:
+        crypto_review, created = CryptoReview.objects.get_or_create(symbol=symbol)
+        data = dict(CryptoReviewSerializer(crypto_review).data)
+        cache.set(key, data, settings.CRYPTO_REVIEW_CACHE_TIMEOUT)
+    return data
+
+
+def get_reviews_data(symbols):
+    """
+    Return serialized CryptoReview data for many symbols, in the given order.
+    Symbols missing from cache are read with one query and the ones missing
+    from the database are created with one bulk insert.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    for symbol in symbols:
+        check_symbol(symbol)
+
+    stored = cache.get_many([_version_key(symbol) for symbol in symbols])
+    versions = {symbol: stored.get(_version_key(symbol)) for symbol in symbols}
+    unversioned = [symbol for symbol, version in versions.items() if version is None]
+    if unversioned:
+        # a new version, entries of an evicted one are never read again
+        version = time.time_ns()
+        cache.set_many({_version_key(symbol): version for symbol in unversioned}, None)
+        versions.update(dict.fromkeys(unversioned, version))
+
+    keys = {symbol: review_cache_key(symbol, versions[symbol]) for symbol in symbols}
+    cached = cache.get_many(list(keys.values()))
+    found = {symbol: cached[key] for symbol, key in keys.items() if key in cached}
+
+    missing = [symbol for symbol in symbols if symbol not in found]
+    if missing:
+        fetched = {
+            item['symbol']: dict(item)
+            for item in CryptoReviewSerializer(CryptoReview.objects.filter(symbol__in=missing), many=True).data
+        }
+        cache.set_many(
+            {keys[symbol]: data for symbol, data in fetched.items()},
+            settings.CRYPTO_REVIEW_CACHE_TIMEOUT,
+        )
+        found.update(fetched)
+
+        new_symbols = [symbol for symbol in missing if symbol not in fetched]
+        if new_symbols:
+            CryptoReview.objects.bulk_create(
+                [CryptoReview(symbol=symbol) for symbol in new_symbols], ignore_conflicts=True
+            )
+            found.update({symbol: {'symbol': symbol, 'good': 0, 'bad': 0} for symbol in new_symbols})
+
+    return [found[symbol] for symbol in symbols]
+
+
+def invalidate_reviews(symbols):
+    """Make cached data of the given symbols stale."""
+    version = time.time_ns()
+    cache.set_many({_version_key(symbol): version for symbol in symbols}, None)
+
+
+def review_etag(data):
+    """Return a quoted ETag for serialized review data, including buffered votes."""
+    digest = hashlib.md5(f"{data['symbol']}:{data['good']}:{data['bad']}".encode()).hexdigest()
+    return f'"{digest}"'
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class CryptoReview(models.Model):
     """ 
@@ -7,8 +8,42 @@ class CryptoReview(models.Model):
     symbol = models.CharField(max_length=10, unique=True)
     good = models.IntegerField(default=0)
     bad = models.IntegerField(default=0)
-    last_reset_date = models.DateField(auto_now_add=True)
+    last_reset_date = models.DateField(default=timezone.localdate)
     
     def __str__(self):
         return self.symbol
-    
\ No newline at end of file
+
+
+class CryptoReviewReset(models.Model):
+    """
+    Progress of the daily reset of review counts, one row per day.
+    Lets an interrupted reset resume and a repeated one be skipped.
+    """
+    date = models.DateField(unique=True)
+    last_pk = models.BigIntegerField(default=0)
+    rows_reset = models.IntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"reset - {self.date}"
+
+
+class CryptoReviewDaily(models.Model):
+    """
+    Review counts of a cryptocurrency for a single day, written by the daily reset
+    before the counts are zeroed. Days without votes have no row.
+    """
+    symbol = models.CharField(max_length=10)
+    date = models.DateField()
+    good = models.IntegerField(default=0)
+    bad = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # the unique index also serves symbol + date range lookups
+            models.UniqueConstraint(fields=['symbol', 'date'], name='crypto_review_daily_symbol_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} - {self.date}"
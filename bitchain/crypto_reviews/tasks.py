@@ -1,37 +1,159 @@
+import time
+from datetime import timedelta
+
 from celery import shared_task
+from celery.signals import worker_ready
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
-from .models import CryptoReview
+
+from core.locks import cache_lock
+
+from .cache import invalidate_reviews
+from .models import CryptoReview, CryptoReviewDaily, CryptoReviewReset
+from .votes import flush_votes
 from django.db.utils import ProgrammingError as django_db_ProgrammingError
 
+RESET_CHECKED_TIMEOUT = 24 * 60 * 60  # (in seconds) the key contains the date anyway
+RESET_LOCK_TIMEOUT = 60 * 60  # (in seconds) released when the reset ends, expires if the worker dies
+
+
 @shared_task
-def reset_counts():
+def flush_vote_buffer():
     """
-     Resets 'good' and 'bad' counts for all CryptoReview objects. This task is executed every day at 00:00.
+    Writes votes buffered in the vote store to the database. This task is executed every 10 seconds.
     """
     try:
-        CryptoReview.objects.all().update(good=0, bad=0, last_reset_date=timezone.now().date())
-        print("CryptoReview counts reset")
+        flushed = flush_votes()
+        if flushed is None:
+            print("CryptoReview vote flush already running. Skipping flush_vote_buffer task.")
+        elif flushed:
+            print(f"CryptoReview votes flushed for {flushed} symbols")
     except django_db_ProgrammingError:
-        print("Database not ready yet. Skipping reset_counts task.")
+        print("Database not ready yet. Skipping flush_vote_buffer task.")
 
 @shared_task
-def initialize_on_startup_check_update_crypto_review():
+def reset_counts(batch_size=None, pause=None):
+    """
+     Resets 'good' and 'bad' counts for all CryptoReview objects. This task is executed every day at 00:00.
+
+     The table is processed in primary key batches of CRYPTO_REVIEW_RESET_BATCH_SIZE rows with a pause of
+     CRYPTO_REVIEW_RESET_BATCH_PAUSE seconds between them, so only one batch of rows is locked at a time.
+     Only rows with non-zero counts are updated, their counts are first stored as yesterday's CryptoReviewDaily
+     rows. Progress is stored in CryptoReviewReset, an interrupted reset
+     resumes where it stopped and a reset that already completed today is skipped.
     """
-    This task is executed when the Docker container starts. It checks whether the crypto review data needs to be updated,
-    and resets the rating counts for crypto reviews if required.
+    batch_size = batch_size or settings.CRYPTO_REVIEW_RESET_BATCH_SIZE
+    pause = settings.CRYPTO_REVIEW_RESET_BATCH_PAUSE if pause is None else pause
+    today = timezone.localdate()  # the reset runs at midnight Europe/Warsaw, not UTC
+    lock_key = f'crypto_reviews:reset:{today}'
+
+    with cache_lock(lock_key, RESET_LOCK_TIMEOUT) as locked:
+        if not locked:
+            print("CryptoReview counts reset already running. Skipping reset_counts task.")
+            return None
+        try:
+            # votes cast before midnight belong to the day being reset
+            flush_votes(wait=True)
+
+            reset, created = CryptoReviewReset.objects.get_or_create(date=today)
+            if reset.completed_at:
+                print("CryptoReview counts already reset today")
+                return None
 
-    The task retrieves the last update date from the database and compares it with the current date. If the dates do not match,
-    it performs the update by resetting the 'good' and 'bad' counts for all crypto reviews and updates the 'last_reset_date'.
-    If no update is needed, it prints a message indicating that no update is required.
+            snapshot_date = today - timedelta(days=1)
+            started = time.monotonic()
+            batches = 0
+            while True:
+                batch_pks = list(
+                    CryptoReview.objects.filter(pk__gt=reset.last_pk)
+                    .order_by('pk').values_list('pk', flat=True)[:batch_size]
+                )
+                if not batch_pks:
+                    break
 
+                with transaction.atomic():
+                    rows = list(
+                        CryptoReview.objects.select_for_update()
+                        .filter(pk__gt=reset.last_pk, pk__lte=batch_pks[-1])
+                        .exclude(good=0, bad=0)
+                        .values_list('pk', 'symbol', 'good', 'bad')
+                    )
+                    if rows:
+                        # keep the day's counts as history before zeroing them
+                        CryptoReviewDaily.objects.bulk_create(
+                            [CryptoReviewDaily(symbol=symbol, date=snapshot_date, good=good, bad=bad)
+                             for pk, symbol, good, bad in rows],
+                            ignore_conflicts=True,
+                        )
+                        CryptoReview.objects.filter(pk__in=[row[0] for row in rows]).update(
+                            good=0, bad=0, last_reset_date=today
+                        )
+                    reset.last_pk = batch_pks[-1]
+                    reset.rows_reset += len(rows)
+                    reset.save(update_fields=['last_pk', 'rows_reset'])
+
+                invalidate_reviews([row[1] for row in rows])
+                batches += 1
+                print(f"CryptoReview counts reset - batch {batches}, {reset.rows_reset} rows reset, last pk {reset.last_pk}")
+                if pause and len(batch_pks) == batch_size:
+                    time.sleep(pause)
+
+            reset.completed_at = timezone.now()
+            reset.save(update_fields=['completed_at'])
+            metrics = {
+                'date': str(today),
+                'rows_reset': reset.rows_reset,
+                'batches': batches,
+                'duration': round(time.monotonic() - started, 3),
+            }
+            print(f"CryptoReview counts reset - {metrics}")
+            return metrics
+        except django_db_ProgrammingError:
+            print("Database not ready yet. Skipping reset_counts task.")
+
+@shared_task
+def initialize_on_startup_check_update_crypto_review():
+    """
+    Checks whether the crypto review data needs to be updated, and resets the rating counts for crypto reviews if
+    required (e.g. when the midnight reset was missed). This task is queued when a celery worker starts and is
+    executed every hour, so a missed reset is caught on days no worker starts as well.
+
+    If today's reset has not completed and there are counts left from a previous day, it resets the counts with
+    reset_counts. Once today's reset is known to be done, or not needed, the day is marked as checked in the cache
+    and later runs skip the check. A reset that could not run, e.g. because another one is in progress, leaves the
+    day unchecked, the next run looks again.
     """
-    try: 
-        last_update_date = CryptoReview.objects.values_list('last_reset_date', flat=True).first()
-        if last_update_date != timezone.now().date() and last_update_date != None:
-            # Perform the update if needed
-            CryptoReview.objects.all().update(good=0, bad=0, last_reset_date=timezone.now().date())
-            print("Initialization task on Docker startup - Data updated\n")
+    today = timezone.localdate()  # same day as the midnight reset it checks
+    checked_key = f'crypto_reviews:reset-checked:{today}'
+    if cache.get(checked_key):
+        print("Crypto review reset check - Already checked today\n")
+        return None
+
+    try:
+        reset_done = CryptoReviewReset.objects.filter(date=today, completed_at__isnull=False).exists()
+        stale_counts = CryptoReview.objects.filter(last_reset_date__lt=today).exclude(good=0, bad=0).exists()
+        if reset_done or not stale_counts:
+            cache.set(checked_key, True, RESET_CHECKED_TIMEOUT)
+            print("Crypto review reset check - No update needed\n")
+            return None
+
+        metrics = reset_counts()
+        if metrics is None and not CryptoReviewReset.objects.filter(date=today, completed_at__isnull=False).exists():
+            print("Crypto review reset check - Reset not performed, checking again on the next run\n")
+            return None
+        cache.set(checked_key, True, RESET_CHECKED_TIMEOUT)
+        if metrics:
+            print(f"Crypto review reset check - Data updated - {metrics}\n")
         else:
-            print("Initialization task on Docker startup - No update needed\n")
+            print("Crypto review reset check - Reset completed by another run\n")
+        return metrics
     except django_db_ProgrammingError:
-        print("Database not ready yet. Skipping initialization task.")
\ No newline at end of file
+        print("Database not ready yet. Skipping initialization task.")
+
+
+@worker_ready.connect
+def check_update_crypto_review_on_worker_ready(sender, **kwargs):
+    """Queue the daily reset check off the web request path, whenever a worker boots."""
+    initialize_on_startup_check_update_crypto_review.delay()
@@ -0,0 +1,56 @@
+"""
+Tests for the multi-symbol crypto review endpoint.
+"""
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from crypto_reviews.models import CryptoReview
+from crypto_reviews.votes import get_vote_store, record_vote
+
+BATCH_URL = reverse('crypto_reviews:crypto-review-batch')
+
+
+class CryptoReviewBatchTests(TestCase):
+    """Test fetching reviews for many symbols"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        get_vote_store().clear()
+        self.addCleanup(get_vote_store().clear)
+
+    def test_batch_reads_and_creates_in_two_queries(self):
+        """Test that existing and new symbols cost one select and one insert"""
+        CryptoReview.objects.create(symbol='BTC', good=3, bad=1)
+        record_vote('ETH', 'good')
+
+        with self.assertNumQueries(2):
+            res = self.client.get(BATCH_URL, {'symbols': 'BTC,ETH,DOGE,BTC'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'symbol': 'BTC', 'good': 3, 'bad': 1},
+            {'symbol': 'ETH', 'good': 1, 'bad': 0},
+            {'symbol': 'DOGE', 'good': 0, 'bad': 0},
+        ])
+        self.assertEqual(CryptoReview.objects.count(), 3)
+
+    def test_batch_uses_cache(self):
+        """Test that a repeated batch is served without queries"""
+        self.client.get(BATCH_URL, {'symbols': 'BTC,ETH'})
+        self.client.get(BATCH_URL, {'symbols': 'BTC,ETH'})
+
+        with self.assertNumQueries(0):
+            res = self.client.get(BATCH_URL, {'symbols': 'BTC,ETH'})
+        self.assertEqual(len(res.data), 2)
+
+    @override_settings(CRYPTO_REVIEW_BATCH_MAX_SYMBOLS=2)
+    def test_invalid_batches_rejected(self):
+        """Test that missing, too many and too long symbols return 400"""
+        for params in ({}, {'symbols': 'A,B,C'}, {'symbols': 'BTC,VERYLONGSYMBOL'}):
+            res = self.client.get(BATCH_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,84 @@
+"""
+Tests for cached crypto review lookups.
+"""
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from crypto_reviews.models import CryptoReview
+from crypto_reviews.tasks import reset_counts
+from crypto_reviews.votes import flush_votes, get_vote_store, record_vote
+
+
+def review_url(symbol):
+    return reverse('crypto_reviews:crypto-review', args=[symbol])
+
+
+class CryptoReviewCacheTests(TestCase):
+    """Test the crypto review read-through cache"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        get_vote_store().clear()
+        self.addCleanup(get_vote_store().clear)
+
+    def test_get_creates_review_once(self):
+        """Test that a new symbol is created and then served from cache"""
+        res = self.client.get(review_url('BTC'))
+
+        self.assertEqual(res.data, {'symbol': 'BTC', 'good': 0, 'bad': 0})
+        self.assertTrue(CryptoReview.objects.filter(symbol='BTC').exists())
+
+        with self.assertNumQueries(0):
+            res = self.client.get(review_url('BTC'))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_if_none_match_returns_not_modified(self):
+        """Test that a matching ETag returns 304 until the review changes"""
+        etag = self.client.get(review_url('BTC'))['ETag']
+
+        res = self.client.get(review_url('BTC'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        record_vote('BTC', 'good')
+        res = self.client.get(review_url('BTC'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_flush_and_reset_invalidate_cache(self):
+        """Test that stored count changes are visible through the cache"""
+        self.client.get(review_url('BTC'))
+        record_vote('BTC', 'bad')
+        flush_votes()
+
+        res = self.client.get(review_url('BTC'))
+        self.assertEqual(res.data['bad'], 1)
+
+        reset_counts()
+
+        res = self.client.get(review_url('BTC'))
+        self.assertEqual(res.data['bad'], 0)
+
+    def test_flush_during_read_not_cached(self):
+        """Test that counts read before a concurrent flush are not served after it"""
+        self.client.get(review_url('BTC'))
+        cache.clear()
+        record_vote('BTC', 'good')
+        get_or_create = CryptoReview.objects.get_or_create
+
+        def read_then_flush(**kwargs):
+            result = get_or_create(**kwargs)
+            flush_votes()
+            return result
+
+        with patch.object(CryptoReview.objects, 'get_or_create', side_effect=read_then_flush):
+            self.client.get(review_url('BTC'))
+
+        res = self.client.get(review_url('BTC'))
+        self.assertEqual(res.data['good'], 1)
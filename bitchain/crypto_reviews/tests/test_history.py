@@ -0,0 +1,78 @@
+"""
+Tests for daily crypto review history.
+"""
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from crypto_reviews.models import CryptoReview, CryptoReviewDaily
+from crypto_reviews.tasks import reset_counts
+from crypto_reviews.votes import get_vote_store
+
+HISTORY_URL = reverse('crypto_reviews:crypto-review-history')
+
+
+class CryptoReviewHistoryTests(TestCase):
+    """Test storing and reading daily review counts"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        get_vote_store().clear()
+        self.yesterday = timezone.localdate() - timedelta(days=1)
+
+    def test_reset_stores_daily_counts(self):
+        """Test that the reset keeps yesterday's non-zero counts"""
+        CryptoReview.objects.create(symbol='BTC', good=5, bad=1)
+        CryptoReview.objects.create(symbol='ETH')
+
+        reset_counts(pause=0)
+
+        daily = CryptoReviewDaily.objects.get()
+        self.assertEqual(
+            (daily.symbol, daily.date, daily.good, daily.bad),
+            ('BTC', self.yesterday, 5, 1),
+        )
+
+    def test_history_for_many_symbols_in_one_query(self):
+        """Test that history is returned per symbol with missing days as zeros"""
+        CryptoReviewDaily.objects.create(symbol='BTC', date=self.yesterday, good=5, bad=1)
+        CryptoReviewDaily.objects.create(symbol='ETH', date=self.yesterday - timedelta(days=1), good=2)
+        CryptoReviewDaily.objects.create(symbol='BTC', date=self.yesterday - timedelta(days=5), good=9)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(HISTORY_URL, {'symbols': 'BTC,ETH', 'days': 3})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([day['good'] for day in res.data['BTC']], [0, 0, 5])
+        self.assertEqual([day['good'] for day in res.data['ETH']], [0, 2, 0])
+        self.assertEqual(res.data['BTC'][-1]['date'], self.yesterday.isoformat())
+
+    def test_days_follow_warsaw_midnight(self):
+        """Test that shortly after Warsaw midnight, before UTC midnight, the snapshot and history use Warsaw days"""
+        CryptoReview.objects.create(symbol='BTC', good=5, bad=1)
+        # 00:30 Warsaw on June 11 is still June 10 in UTC
+        with patch('django.utils.timezone.now',
+                   return_value=datetime(2024, 6, 11, 0, 30, tzinfo=ZoneInfo('Europe/Warsaw'))):
+            reset_counts(pause=0)
+            res = self.client.get(HISTORY_URL, {'symbols': 'BTC', 'days': 2})
+
+        self.assertEqual(CryptoReviewDaily.objects.get().date, date(2024, 6, 10))
+        self.assertEqual(
+            [(day['date'], day['good']) for day in res.data['BTC']],
+            [('2024-06-09', 0), ('2024-06-10', 5)],
+        )
+
+    def test_invalid_days_rejected(self):
+        """Test that a days value out of range returns 400"""
+        for days in ('0', 'abc', '100000'):
+            res = self.client.get(HISTORY_URL, {'symbols': 'BTC', 'days': days})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
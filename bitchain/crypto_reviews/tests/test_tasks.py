@@ -0,0 +1,150 @@
+"""
+Tests for crypto review celery tasks.
+"""
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from crypto_reviews.models import CryptoReview, CryptoReviewDaily, CryptoReviewReset
+from crypto_reviews.tasks import initialize_on_startup_check_update_crypto_review, reset_counts
+from crypto_reviews.votes import get_vote_store
+
+
+class StartupCheckTests(TestCase):
+    """Test the daily reset check queued on worker startup and run every hour"""
+
+    def setUp(self):
+        cache.clear()
+        get_vote_store().clear()
+
+    def test_stale_counts_reset_once_per_day(self):
+        """Test that stale counts are reset and the check is not repeated"""
+        yesterday = timezone.localdate() - timedelta(days=1)
+        CryptoReview.objects.create(symbol='BTC', good=4, bad=2)
+        CryptoReview.objects.update(last_reset_date=yesterday)
+
+        initialize_on_startup_check_update_crypto_review()
+
+        review = CryptoReview.objects.get(symbol='BTC')
+        self.assertEqual((review.good, review.bad), (0, 0))
+        self.assertEqual(review.last_reset_date, timezone.localdate())
+
+        CryptoReview.objects.update(good=7, last_reset_date=yesterday)
+        with self.assertNumQueries(0):
+            initialize_on_startup_check_update_crypto_review()
+        self.assertEqual(CryptoReview.objects.get(symbol='BTC').good, 7)
+
+    def test_running_reset_checked_again(self):
+        """Test that a check finding the reset locked by another run does not count as done"""
+        CryptoReview.objects.create(symbol='BTC', good=4)
+        CryptoReview.objects.update(last_reset_date=timezone.localdate() - timedelta(days=1))
+        reset_lock = f'crypto_reviews:reset:{timezone.localdate()}'
+        cache.add(reset_lock, 'other run', 60)
+
+        self.assertIsNone(initialize_on_startup_check_update_crypto_review())
+        self.assertEqual(CryptoReview.objects.get(symbol='BTC').good, 4)
+
+        cache.delete(reset_lock)
+        metrics = initialize_on_startup_check_update_crypto_review()
+
+        self.assertEqual(metrics['rows_reset'], 1)
+        self.assertEqual(CryptoReview.objects.get(symbol='BTC').good, 0)
+
+    def test_fresh_counts_kept(self):
+        """Test that counts reset today are not touched"""
+        CryptoReview.objects.create(symbol='BTC', good=4, last_reset_date=timezone.localdate())
+
+        initialize_on_startup_check_update_crypto_review()
+
+        self.assertEqual(CryptoReview.objects.get(symbol='BTC').good, 4)
+
+
+class ResetCountsTests(TestCase):
+    """Test the batched daily reset"""
+
+    def setUp(self):
+        cache.clear()
+        get_vote_store().clear()
+        self.yesterday = timezone.localdate() - timedelta(days=1)
+        for i, symbol in enumerate(['A', 'B', 'C', 'D', 'E']):
+            CryptoReview.objects.create(symbol=symbol, good=i, bad=i % 2)
+        CryptoReview.objects.update(last_reset_date=self.yesterday)
+
+    def test_reset_in_batches_touches_only_non_zero_rows(self):
+        """Test that counts are reset batch by batch and zero rows are skipped"""
+        metrics = reset_counts(batch_size=2, pause=0)
+
+        self.assertEqual(metrics['rows_reset'], 4)
+        self.assertEqual(metrics['batches'], 3)
+        self.assertFalse(CryptoReview.objects.exclude(good=0, bad=0).exists())
+        self.assertEqual(CryptoReview.objects.get(symbol='A').last_reset_date, self.yesterday)
+        self.assertEqual(CryptoReview.objects.get(symbol='E').last_reset_date, timezone.localdate())
+
+    def test_reset_is_idempotent(self):
+        """Test that a second reset on the same day does nothing"""
+        reset_counts(batch_size=2, pause=0)
+        CryptoReview.objects.filter(symbol='B').update(good=3)
+
+        self.assertIsNone(reset_counts(batch_size=2, pause=0))
+        self.assertEqual(CryptoReview.objects.get(symbol='B').good, 3)
+
+    def test_interrupted_reset_resumes(self):
+        """Test that a reset continues after the last processed primary key"""
+        last_pk = CryptoReview.objects.get(symbol='C').pk
+        CryptoReviewReset.objects.create(date=timezone.localdate(), last_pk=last_pk, rows_reset=2)
+
+        metrics = reset_counts(batch_size=10, pause=0)
+
+        self.assertEqual(metrics['rows_reset'], 4)
+        self.assertEqual(CryptoReview.objects.get(symbol='C').good, 2)
+        self.assertEqual(CryptoReview.objects.get(symbol='D').good, 0)
+        self.assertIsNotNone(CryptoReviewReset.objects.get().completed_at)
+
+
+def warsaw_time(*args):
+    """Patch the current time to a wall clock time in Europe/Warsaw"""
+    return patch('django.utils.timezone.now', return_value=datetime(*args, tzinfo=ZoneInfo('Europe/Warsaw')))
+
+
+class ResetDayTests(TestCase):
+    """Test that the reset days follow Europe/Warsaw midnight, not UTC"""
+
+    def setUp(self):
+        cache.clear()
+        get_vote_store().clear()
+        CryptoReview.objects.create(symbol='BTC', good=4, bad=1, last_reset_date=date(2024, 6, 9))
+
+    def test_restart_late_in_the_day_keeps_votes(self):
+        """Test that a worker restart after 00:00 UTC does not reset the votes of the current Warsaw day"""
+        # 00:00:30 Warsaw on June 10 is still June 9 in UTC
+        with warsaw_time(2024, 6, 10, 0, 0, 30):
+            reset_counts(pause=0)
+        review = CryptoReview.objects.get()
+        self.assertEqual(review.last_reset_date, date(2024, 6, 10))
+        self.assertEqual(CryptoReviewDaily.objects.get().date, date(2024, 6, 9))
+
+        CryptoReview.objects.update(good=7)
+        # 23:30 Warsaw is 21:30 UTC, then just after 00:00 UTC, both still June 10 in Warsaw
+        for moment in ((2024, 6, 10, 23, 30), (2024, 6, 10, 2, 5)):
+            cache.clear()
+            with warsaw_time(*moment):
+                initialize_on_startup_check_update_crypto_review()
+            self.assertEqual(CryptoReview.objects.get().good, 7)
+
+        # the next midnight reset is not skipped
+        with warsaw_time(2024, 6, 11, 0, 0, 30):
+            metrics = reset_counts(pause=0)
+        self.assertEqual(metrics['rows_reset'], 1)
+        self.assertEqual(CryptoReview.objects.get().good, 0)
+        self.assertEqual(CryptoReviewDaily.objects.get(date=date(2024, 6, 10)).good, 7)
+
+    def test_new_review_dated_by_warsaw_day(self):
+        """Test that a review created after Warsaw midnight but before UTC midnight gets the Warsaw date"""
+        with warsaw_time(2024, 6, 11, 0, 30):
+            review = CryptoReview.objects.create(symbol='ETH')
+
+        self.assertEqual(review.last_reset_date, date(2024, 6, 11))
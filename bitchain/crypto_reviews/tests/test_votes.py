@@ -0,0 +1,118 @@
+"""
+Tests for buffered crypto review votes.
+"""
+import threading
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from crypto_reviews.models import CryptoReview
+from crypto_reviews.votes import FLUSH_LOCK_KEY, flush_votes, get_vote_store, record_vote
+
+
+def review_url(symbol):
+    return reverse('crypto_reviews:crypto-review', args=[symbol])
+
+
+class CryptoReviewVoteTests(TestCase):
+    """Test voting on crypto reviews"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        get_vote_store().clear()
+        self.addCleanup(get_vote_store().clear)
+
+    def test_vote_is_buffered_until_flush(self):
+        """Test that a vote is returned immediately but written only on flush"""
+        res = self.client.patch(review_url('BTC'), {'action': 'good'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['good'], 1)
+        self.assertEqual(CryptoReview.objects.get(symbol='BTC').good, 0)
+
+        self.assertEqual(flush_votes(), 1)
+
+        review = CryptoReview.objects.get(symbol='BTC')
+        self.assertEqual((review.good, review.bad), (1, 0))
+
+    def test_get_merges_buffered_votes(self):
+        """Test that reads include votes that were not flushed yet"""
+        CryptoReview.objects.create(symbol='ETH', good=5, bad=2)
+        record_vote('ETH', 'good')
+        record_vote('ETH', 'bad')
+        record_vote('ETH', 'bad')
+
+        res = self.client.get(review_url('ETH'))
+
+        self.assertEqual(res.data, {'symbol': 'ETH', 'good': 6, 'bad': 4})
+
+    def test_flush_batches_many_symbols(self):
+        """Test that one flush applies counts for every symbol and is not repeated"""
+        for symbol in ('BTC', 'ETH', 'DOGE'):
+            CryptoReview.objects.create(symbol=symbol, good=1)
+        for _ in range(3):
+            record_vote('BTC', 'good')
+        record_vote('DOGE', 'bad')
+
+        with self.assertNumQueries(3):  # savepoint, UPDATE, release
+            flush_votes()
+        flush_votes()
+
+        counts = dict(CryptoReview.objects.values_list('symbol', 'good'))
+        self.assertEqual(counts, {'BTC': 4, 'ETH': 1, 'DOGE': 1})
+        self.assertEqual(CryptoReview.objects.get(symbol='DOGE').bad, 1)
+
+    def test_overlapping_flush_skipped(self):
+        """Test that a flush started while another one runs does not apply the same votes again"""
+        CryptoReview.objects.create(symbol='BTC')
+        record_vote('BTC', 'good')
+        get_vote_store().drain()  # a running flush drained the votes but did not commit them yet
+        cache.add(FLUSH_LOCK_KEY, True)
+
+        self.assertIsNone(flush_votes())
+        self.assertEqual(CryptoReview.objects.get(symbol='BTC').good, 0)
+
+        cache.delete(FLUSH_LOCK_KEY)
+        self.assertEqual(flush_votes(), 1)
+        self.assertEqual(flush_votes(), 0)
+        self.assertEqual(CryptoReview.objects.get(symbol='BTC').good, 1)
+
+    def test_flush_waits_for_running_flush(self):
+        """Test that a flush with wait runs once the other flush released the lock"""
+        CryptoReview.objects.create(symbol='BTC')
+        record_vote('BTC', 'bad')
+        cache.add(FLUSH_LOCK_KEY, True)
+        release = threading.Timer(0.2, cache.delete, args=[FLUSH_LOCK_KEY])
+        release.start()
+        self.addCleanup(release.cancel)
+
+        self.assertEqual(flush_votes(wait=True), 1)
+        self.assertEqual(CryptoReview.objects.get(symbol='BTC').bad, 1)
+
+    def test_slow_flush_keeps_next_flush_lock(self):
+        """Test that a flush that outlived its lock does not release the lock of the next flush"""
+        CryptoReview.objects.create(symbol='BTC')
+        record_vote('BTC', 'good')
+
+        def expire_lock(store):
+            # the lock timed out during the flush and another flush took it
+            cache.set(FLUSH_LOCK_KEY, 'next flush')
+            return 0
+
+        with patch('crypto_reviews.votes._flush_drained_votes', side_effect=expire_lock):
+            flush_votes()
+
+        self.assertEqual(cache.get(FLUSH_LOCK_KEY), 'next flush')
+        self.assertIsNone(flush_votes())
+
+    def test_missing_action_returns_error(self):
+        """Test that a vote without action is rejected"""
+        res = self.client.patch(review_url('BTC'), {})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -4,11 +4,13 @@ URL mapping for crypto_reviews app.
 from django.urls import path
 
 from django.urls import path
-from .views import CryptoReviewView
+from .views import CryptoReviewView, CryptoReviewBatchView, CryptoReviewHistoryView
 
 app_name = 'crypto_reviews'
 
 urlpatterns = [
     path('symbol/<str:symbol>/', CryptoReviewView.as_view(), name='crypto-review'),
+    path('symbols/', CryptoReviewBatchView.as_view(), name='crypto-review-batch'),
+    path('history/', CryptoReviewHistoryView.as_view(), name='crypto-review-history'),
 ]
 
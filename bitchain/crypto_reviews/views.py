@@ -1,43 +1,47 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import CryptoReview
-from .serializers import CryptoReviewSerializer
+from datetime import timedelta
 from django.utils import timezone
+from django.utils.http import parse_etags
 
-from drf_spectacular.utils import extend_schema
+from django.conf import settings
 
+from .cache import get_review_data, get_reviews_data, review_etag
+from .models import CryptoReviewDaily
+from .votes import VOTE_FIELDS, record_vote, with_pending_votes
 
-from rest_framework.views import APIView
-from rest_framework.response import Response
-from rest_framework import status
-from .models import CryptoReview
-from .serializers import CryptoReviewSerializer
-from django.utils import timezone
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 
-from drf_spectacular.utils import extend_schema
 
-def get_or_create_crypto_review(symbol):
-    try:
-        crypto_review = CryptoReview.objects.get(symbol=symbol)
-    except CryptoReview.DoesNotExist:
-        if len(symbol) > 10:
-            raise ValueError("Symbol too long. Maximum length is 10.")
-        crypto_review = CryptoReview.objects.create(symbol=symbol)
-        crypto_review.last_reset_date = timezone.now().date()
-        crypto_review.save()
-    return crypto_review
+def parse_symbols(request):
+    """
+    Read the comma separated 'symbols' query parameter.
+    Returns a list of symbols and an error response, one of which is None.
+    """
+    symbols = [symbol.strip() for symbol in request.query_params.get('symbols', '').split(',') if symbol.strip()]
+    if not symbols:
+        return None, Response({"error": "Symbols not provided"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(symbols) > settings.CRYPTO_REVIEW_BATCH_MAX_SYMBOLS:
+        return None, Response(
+            {"error": f"Too many symbols. Maximum is {settings.CRYPTO_REVIEW_BATCH_MAX_SYMBOLS}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return list(dict.fromkeys(symbols)), None
 
 
 class CryptoReviewView(APIView):
     @extend_schema(
-        description="Get or create a CryptoReview for the specified symbol.",
+        description="Get or create a CryptoReview for the specified symbol. "
+                    "Responds with 304 when the If-None-Match header matches the current ETag.",
         responses={200: {"example": {"symbol": "string", "good": 0, "bad": 0}}}
     )
     def get(self, request, symbol):
-        crypto_review = get_or_create_crypto_review(symbol)
-        serializer = CryptoReviewSerializer(crypto_review)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        data = with_pending_votes(get_review_data(symbol))
+        etag = review_etag(data)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(data, status=status.HTTP_200_OK, headers={'ETag': etag})
 
     @extend_schema(
         request={
@@ -52,17 +56,85 @@ class CryptoReviewView(APIView):
         description="If action is 'good' or 'bad', increment the count for the specified symbol."
     )
     def patch(self, request, symbol):
-        crypto_review = get_or_create_crypto_review(symbol)
+        data = get_review_data(symbol)
 
         action = request.data.get('action', None)
         if action:
-            if action == 'good':
-                crypto_review.good += 1
-            elif action == 'bad':
-                crypto_review.bad += 1
-
-            crypto_review.save()
-            serializer = CryptoReviewSerializer(crypto_review)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            if action in VOTE_FIELDS:
+                # votes are buffered and written to the database by the flush_vote_buffer task
+                record_vote(symbol, action)
+
+            data = with_pending_votes(data)
+            return Response(data, status=status.HTTP_200_OK, headers={'ETag': review_etag(data)})
         else:
             return Response({"error": "Action not provided"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class CryptoReviewBatchView(APIView):
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('symbols', str, description="Comma separated list of symbols, e.g. BTC,ETH,DOGE"),
+        ],
+        responses={
+            200: {"example": [{"symbol": "BTC", "good": 0, "bad": 0}, {"symbol": "ETH", "good": 0, "bad": 0}]},
+            400: {"example": {"error": "Symbols not provided"}},
+        },
+        description="Get or create CryptoReviews for many symbols at once."
+    )
+    def get(self, request):
+        symbols, error = parse_symbols(request)
+        if error:
+            return error
+
+        try:
+            data = get_reviews_data(symbols)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(with_pending_votes(data), status=status.HTTP_200_OK)
+
+
+class CryptoReviewHistoryView(APIView):
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('symbols', str, description="Comma separated list of symbols, e.g. BTC,ETH,DOGE"),
+            OpenApiParameter('days', int, description="Number of past days to return, 30 by default"),
+        ],
+        responses={
+            200: {"example": {"BTC": [{"date": "2024-01-01", "good": 12, "bad": 3},
+                                      {"date": "2024-01-02", "good": 0, "bad": 0}]}},
+            400: {"example": {"error": "Symbols not provided"}},
+        },
+        description="Get daily review counts of many symbols for the last N days (today excluded). "
+                    "Days without votes are returned with zero counts."
+    )
+    def get(self, request):
+        symbols, error = parse_symbols(request)
+        if error:
+            return error
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            days = 0
+        if not 0 < days <= settings.CRYPTO_REVIEW_HISTORY_MAX_DAYS:
+            return Response(
+                {"error": f"Days must be between 1 and {settings.CRYPTO_REVIEW_HISTORY_MAX_DAYS}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        end = timezone.localdate() - timedelta(days=1)  # days end at midnight Europe/Warsaw, like the reset
+        start = end - timedelta(days=days - 1)
+        stored = {
+            (symbol, date): (good, bad)
+            for symbol, date, good, bad in CryptoReviewDaily.objects.filter(
+                symbol__in=symbols, date__range=(start, end),
+            ).values_list('symbol', 'date', 'good', 'bad')
+        }
+
+        dates = [start + timedelta(days=offset) for offset in range(days)]
+        history = {}
+        for symbol in symbols:
+            history[symbol] = []
+            for date in dates:
+                good, bad = stored.get((symbol, date), (0, 0))
+                history[symbol].append({"date": date.isoformat(), "good": good, "bad": bad})
+        return Response(history, status=status.HTTP_200_OK)
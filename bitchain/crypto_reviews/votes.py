@@ -0,0 +1,209 @@
+"""
+Buffered vote counters for crypto reviews.
+
+Votes are accumulated per symbol in a shared store and flushed to the database
+periodically in batched F() expression updates, so a popular symbol costs one
+UPDATE per flush instead of one row lock per vote.
+"""
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils.module_loading import import_string
+
+from core.locks import cache_lock
+
+from .cache import invalidate_reviews
+from .models import CryptoReview
+
+VOTE_FIELDS = ('good', 'bad')
+FLUSH_LOCK_KEY = 'crypto_reviews:votes:flush-lock'
+FLUSH_LOCK_TIMEOUT = 5 * 60  # (in seconds) released when a flush ends, expires if the worker dies
+
+
+class LocalVoteStore:
+    """
+    In-process vote store. Used in tests and single process deployments,
+    votes are not shared between processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(int)
+        self._flushing = {}
+
+    def increment(self, symbol, field, amount=1):
+        with self._lock:
+            self._counts[(symbol, field)] += amount
+            return self._counts[(symbol, field)]
+
+    def pending(self, symbols):
+        """Return not yet flushed counts as {(symbol, field): count}."""
+        with self._lock:
+            return {
+                (symbol, field): self._counts.get((symbol, field), 0) + self._flushing.get((symbol, field), 0)
+                for symbol in symbols for field in VOTE_FIELDS
+            }
+
+    def drain(self):
+        """
+        Move buffered counts aside for flushing and return them. Counts of a
+        flush that was never committed are returned again.
+        """
+        with self._lock:
+            if not self._flushing:
+                self._flushing, self._counts = dict(self._counts), defaultdict(int)
+            return dict(self._flushing)
+
+    def commit(self):
+        """Forget the drained counts once they are stored in the database."""
+        with self._lock:
+            self._flushing = {}
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self._flushing = {}
+
+
+class RedisVoteStore:
+    """Vote store shared by all processes, kept in a redis hash."""
+
+    def __init__(self, location, key='crypto_reviews:votes'):
+        import redis
+
+        self._client = redis.Redis.from_url(location)
+        self._key = key
+        self._flushing_key = f'{key}:flushing'
+
+    @staticmethod
+    def _field(symbol, field):
+        return f'{symbol}:{field}'
+
+    def increment(self, symbol, field, amount=1):
+        return self._client.hincrby(self._key, self._field(symbol, field), amount)
+
+    def pending(self, symbols):
+        keys = [(symbol, field) for symbol in symbols for field in VOTE_FIELDS]
+        fields = [self._field(symbol, field) for symbol, field in keys]
+        if not fields:
+            return {}
+        pipe = self._client.pipeline(transaction=False)
+        pipe.hmget(self._key, fields)
+        pipe.hmget(self._flushing_key, fields)
+        buffered, flushing = pipe.execute()
+        return {
+            key: int(buffered[i] or 0) + int(flushing[i] or 0)
+            for i, key in enumerate(keys)
+        }
+
+    def drain(self):
+        import redis
+
+        if not self._client.exists(self._flushing_key):
+            try:
+                # RENAME is atomic, votes arriving from now on go to a new hash
+                self._client.rename(self._key, self._flushing_key)
+            except redis.ResponseError:
+                return {}  # nothing buffered
+        counts = {}
+        for raw_field, raw_count in self._client.hgetall(self._flushing_key).items():
+            symbol, field = raw_field.decode().rsplit(':', 1)
+            counts[(symbol, field)] = int(raw_count)
+        return counts
+
+    def commit(self):
+        self._client.delete(self._flushing_key)
+
+    def clear(self):
+        self._client.delete(self._key, self._flushing_key)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_vote_store():
+    """Return the vote store configured in settings.CRYPTO_REVIEW_VOTE_STORE."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = settings.CRYPTO_REVIEW_VOTE_STORE
+                _store = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _store
+
+
+def record_vote(symbol, action):
+    """Buffer a single 'good' or 'bad' vote for the symbol."""
+    if action not in VOTE_FIELDS:
+        raise ValueError(f"Unknown vote action: {action}")
+    get_vote_store().increment(symbol, action)
+
+
+def pending_votes(symbols):
+    """Return buffered votes as {symbol: {'good': n, 'bad': n}}."""
+    counts = get_vote_store().pending(symbols)
+    return {
+        symbol: {field: counts.get((symbol, field), 0) for field in VOTE_FIELDS}
+        for symbol in symbols
+    }
+
+
+def with_pending_votes(data):
+    """Add buffered votes to serialized CryptoReview data (a dict or a list of dicts)."""
+    items = data if isinstance(data, list) else [data]
+    pending = pending_votes([item['symbol'] for item in items])
+    for item in items:
+        for field in VOTE_FIELDS:
+            item[field] += pending[item['symbol']][field]
+    return data
+
+
+def flush_votes(wait=False):
+    """
+    Write buffered votes to the database. Each batch of symbols is applied with
+    a single UPDATE using F() expressions, so votes cast during a flush are
+    never overwritten. Returns the number of symbols updated.
+
+    Drained counts are handed out again until they are committed, so flushes are
+    serialized with a cache lock: two overlapping flushes would apply the same
+    counts twice. While another flush holds the lock this returns None at once,
+    or with wait=True, once the other flush ended.
+
+    The database update and the commit of the drained counts in the store are not
+    atomic together: a worker that dies between the two leaves the counts drained,
+    and the next flush applies them a second time.
+    """
+    with cache_lock(FLUSH_LOCK_KEY, FLUSH_LOCK_TIMEOUT, wait=wait) as locked:
+        if not locked:
+            return None
+        return _flush_drained_votes(get_vote_store())
+
+
+def _flush_drained_votes(store):
+    counts = store.drain()
+
+    deltas = defaultdict(lambda: dict.fromkeys(VOTE_FIELDS, 0))
+    for (symbol, field), count in counts.items():
+        if count:
+            deltas[symbol][field] += count
+
+    symbols = sorted(deltas)  # fixed order keeps row locks deadlock free
+    batch_size = settings.CRYPTO_REVIEW_VOTE_FLUSH_BATCH_SIZE
+    with transaction.atomic():
+        for start in range(0, len(symbols), batch_size):
+            batch = symbols[start:start + batch_size]
+            CryptoReview.objects.filter(symbol__in=batch).update(**{
+                field: F(field) + Case(
+                    *[When(symbol=symbol, then=Value(deltas[symbol][field])) for symbol in batch],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+                for field in VOTE_FIELDS
+            })
+    store.commit()
+    invalidate_reviews(symbols)
+    return len(symbols)
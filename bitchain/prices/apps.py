@@ -0,0 +1,6 @@
+# prices/apps.py
+from django.apps import AppConfig
+
+class PricesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'prices'
@@ -0,0 +1,110 @@
+"""
+Caching of the latest prices.
+
+Prices are looked up in three layers: a small process-local dict with a short
+TTL, so repeated lookups within a request or a worker cost no I/O at all, then
+the shared cache, then the CryptoPrice table. Ingestion invalidates the shared
+entries; the local entries of other processes expire after PRICE_LOCAL_CACHE_TTL.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import CryptoPrice
+
+NO_PRICE = (None, None)
+
+
+def price_cache_key(symbol):
+    return f'prices:latest:{symbol}'
+
+
+class LocalPriceCache:
+    """
+    Thread safe in-process map of symbol to ((price, price 24h ago), expiry time),
+    of at most max_entries symbols.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, symbols):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for symbol in symbols:
+                entry = self._entries.get(symbol)
+                if entry is not None and entry[1] > now:
+                    found[symbol] = entry[0]
+        return found
+
+    def set_many(self, prices, ttl):
+        now = time.monotonic()
+        expires = now + ttl
+        with self._lock:
+            for symbol, price in prices.items():
+                # reinserted at the end, the dict stays ordered by expiry time
+                self._entries.pop(symbol, None)
+                self._entries[symbol] = (price, expires)
+            # expired entries and the ones over the limit are dropped, oldest first
+            for symbol, (_, expiry) in list(self._entries.items()):
+                if expiry > now and len(self._entries) <= self.max_entries:
+                    break
+                del self._entries[symbol]
+
+    def delete_many(self, symbols):
+        with self._lock:
+            for symbol in symbols:
+                self._entries.pop(symbol, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_prices = LocalPriceCache()
+
+
+def get_latest_prices(symbols):
+    """
+    Return {symbol: (price_usd, price_usd_24h)} for the given symbols. Symbols
+    without a price map to (None, None), which is cached as well.
+    """
+    symbols = set(symbols)
+    prices = local_prices.get_many(symbols)
+    missing = symbols.difference(prices)
+    if not missing:
+        return prices
+
+    keys = {price_cache_key(symbol): symbol for symbol in missing}
+    shared = {keys[key]: price for key, price in cache.get_many(keys).items()}
+    missing.difference_update(shared)
+
+    if missing:
+        stored = {symbol: (price, price_24h) for symbol, price, price_24h in
+                  CryptoPrice.objects.filter(symbol__in=missing)
+                  .values_list('symbol', 'price_usd', 'price_usd_24h')}
+        loaded = {symbol: stored.get(symbol, NO_PRICE) for symbol in missing}
+        cache.set_many({price_cache_key(symbol): price for symbol, price in loaded.items()},
+                       settings.PRICE_CACHE_TIMEOUT)
+        shared.update(loaded)
+
+    local_prices.set_many(shared, settings.PRICE_LOCAL_CACHE_TTL)
+    prices.update(shared)
+    return prices
+
+
+def get_latest_price(symbol):
+    """Return the latest USD price of the symbol, None when it is unknown."""
+    return get_latest_prices([symbol])[symbol][0]
+
+
+def invalidate_prices(symbols):
+    """Remove cached prices of the given symbols."""
+    symbols = list(symbols)
+    cache.delete_many([price_cache_key(symbol) for symbol in symbols])
+    local_prices.delete_many(symbols)
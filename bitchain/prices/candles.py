@@ -0,0 +1,212 @@
+"""
+Aggregation of price ticks into OHLC candles.
+
+Ticks are read in primary key order after the watermark of each interval, so
+every run only processes ticks stored since the previous one, including late
+ticks of past periods. This relies on ticks being committed in primary key
+order, which holds because ingest_ticks runs under a cache lock; ticks inserted
+by other means while an ingest runs may be skipped. Each batch is grouped per symbol and period with NumPy
+sorts instead of Python loops, which keeps backfills of millions of ticks fast,
+and merged into the stored candles with one bulk upsert.
+
+Candles are served in cached pages of CANDLE_CACHE_PAGE_SIZE periods. A page
+whose periods have all ended no longer changes, except by late ticks, which
+invalidate it when they are aggregated.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CANDLE_INTERVALS, CandleWatermark, PriceCandle, PriceTick
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+CANDLE_FIELDS = ('open', 'high', 'low', 'close', 'tick_count', 'opened_at', 'closed_at')
+
+
+def period_number(moment, interval):
+    """Return the number of the interval's period containing the moment, counted from the epoch."""
+    return (moment - EPOCH) // timedelta(seconds=CANDLE_INTERVALS[interval])
+
+
+def period_start(number, interval):
+    return EPOCH + timedelta(seconds=number * CANDLE_INTERVALS[interval])
+
+
+def candle_page_key(symbol, interval, page):
+    return f'prices:candles:{symbol}:{interval}:{page}'
+
+
+def aggregate_ticks(ticks, interval):
+    """
+    Group (symbol, timestamp, price_usd) ticks into candles of the interval.
+    Returns {(symbol, period number): candle fields}.
+    """
+    symbols, timestamps, prices = zip(*ticks)
+    count = len(ticks)
+    microsecond = timedelta(microseconds=1)
+
+    times = np.fromiter(((t - EPOCH) // microsecond for t in timestamps), dtype=np.int64, count=count)
+    values = np.fromiter((float(price) for price in prices), dtype=np.float64, count=count)
+    _, codes = np.unique(np.array(symbols), return_inverse=True)
+    periods = times // (CANDLE_INTERVALS[interval] * 1_000_000)
+
+    # ticks sorted by symbol and period, within a period by time and by price
+    by_time = np.lexsort((times, periods, codes))
+    by_price = np.lexsort((values, periods, codes))
+
+    sorted_codes, sorted_periods = codes[by_time], periods[by_time]
+    group_start = np.empty(count, dtype=bool)
+    group_start[0] = True
+    group_start[1:] = (sorted_codes[1:] != sorted_codes[:-1]) | (sorted_periods[1:] != sorted_periods[:-1])
+    firsts = np.flatnonzero(group_start)
+    lasts = np.append(firsts[1:], count) - 1
+
+    candles = {}
+    # prices are picked by index, so candles keep the exact decimal values of the ticks
+    for first, last, open_index, close_index, low_index, high_index in zip(
+        firsts, lasts, by_time[firsts], by_time[lasts], by_price[firsts], by_price[lasts],
+    ):
+        candles[symbols[open_index], int(periods[open_index])] = {
+            'open': prices[open_index],
+            'high': prices[high_index],
+            'low': prices[low_index],
+            'close': prices[close_index],
+            'tick_count': int(last - first + 1),
+            'opened_at': timestamps[open_index],
+            'closed_at': timestamps[close_index],
+        }
+    return candles
+
+
+def merge_candles(stored, new):
+    """Return the candle covering the ticks of both candles of the same period."""
+    if stored is None:
+        return new
+    first = stored if stored['opened_at'] <= new['opened_at'] else new
+    last = new if new['closed_at'] >= stored['closed_at'] else stored
+    return {
+        'open': first['open'],
+        'high': max(stored['high'], new['high']),
+        'low': min(stored['low'], new['low']),
+        'close': last['close'],
+        'tick_count': stored['tick_count'] + new['tick_count'],
+        'opened_at': first['opened_at'],
+        'closed_at': last['closed_at'],
+    }
+
+
+def store_candles(interval, candles):
+    """
+    Merge the candles into the stored ones with one query for the existing candles
+    and one bulk upsert. Returns the cache page keys the candles belong to.
+    """
+    numbers = [number for _, number in candles]
+    stored = {
+        (row.pop('symbol'), period_number(row.pop('start'), interval)): row
+        for row in PriceCandle.objects.filter(
+            interval=interval,
+            symbol__in={symbol for symbol, _ in candles},
+            start__range=(period_start(min(numbers), interval), period_start(max(numbers), interval)),
+        ).values('symbol', 'start', *CANDLE_FIELDS)
+    }
+
+    PriceCandle.objects.bulk_create(
+        [PriceCandle(symbol=symbol, interval=interval, start=period_start(number, interval),
+                     **merge_candles(stored.get((symbol, number)), candle))
+         for (symbol, number), candle in candles.items()],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['symbol', 'interval', 'start'],
+        update_fields=CANDLE_FIELDS,
+    )
+    page_size = settings.CANDLE_CACHE_PAGE_SIZE
+    return {candle_page_key(symbol, interval, number // page_size) for symbol, number in candles}
+
+
+def aggregate_new_ticks(intervals=None, batch_size=None):
+    """
+    Aggregate ticks stored after the watermarks into candles of the intervals, in
+    batches of CANDLE_AGGREGATION_BATCH_SIZE ticks. The watermarks are locked while
+    a batch is processed, so concurrent runs never count a tick twice.
+    Returns the number of ticks processed.
+    """
+    intervals = list(intervals or CANDLE_INTERVALS)
+    batch_size = batch_size or settings.CANDLE_AGGREGATION_BATCH_SIZE
+    CandleWatermark.objects.bulk_create(
+        [CandleWatermark(interval=interval) for interval in intervals], ignore_conflicts=True,
+    )
+
+    processed = 0
+    while True:
+        with transaction.atomic():
+            watermarks = list(CandleWatermark.objects.select_for_update().filter(interval__in=intervals))
+            ticks = list(
+                PriceTick.objects.filter(pk__gt=min(watermark.last_tick_pk for watermark in watermarks))
+                .order_by('pk').values_list('pk', 'symbol', 'timestamp', 'price_usd')[:batch_size]
+            )
+            if not ticks:
+                break
+
+            stale_pages = set()
+            for watermark in watermarks:
+                pending = [tick[1:] for tick in ticks if tick[0] > watermark.last_tick_pk]
+                if pending:
+                    stale_pages |= store_candles(watermark.interval, aggregate_ticks(pending, watermark.interval))
+                watermark.last_tick_pk = ticks[-1][0]
+            CandleWatermark.objects.bulk_update(watermarks, ['last_tick_pk'])
+
+        cache.delete_many(list(stale_pages))
+        processed += len(ticks)
+    return processed
+
+
+def reset_candles(intervals=None):
+    """Delete the candles of the intervals and rewind their watermarks, to rebuild them from all ticks."""
+    intervals = list(intervals or CANDLE_INTERVALS)
+    with transaction.atomic():
+        PriceCandle.objects.filter(interval__in=intervals).delete()
+        CandleWatermark.objects.filter(interval__in=intervals).update(last_tick_pk=0)
+
+
+def get_candles(symbol, interval, start, end):
+    """
+    Return the candles of the symbol whose periods start between start and end, oldest first.
+    Pages of ended periods are taken from the cache, the others are read with one query.
+    """
+    first, last = period_number(start, interval), period_number(end, interval)
+    current = period_number(timezone.now(), interval)
+    page_size = settings.CANDLE_CACHE_PAGE_SIZE
+    pages = range(first // page_size, last // page_size + 1)
+
+    closed = {candle_page_key(symbol, interval, page): page for page in pages if (page + 1) * page_size <= current}
+    cached = {closed[key]: candles for key, candles in cache.get_many(closed).items()}
+
+    missing = [page for page in pages if page not in cached]
+    if missing:
+        loaded = {page: [] for page in missing}
+        rows = PriceCandle.objects.filter(
+            symbol=symbol,
+            interval=interval,
+            start__gte=period_start(missing[0] * page_size, interval),
+            start__lt=period_start((missing[-1] + 1) * page_size, interval),
+        ).order_by('start').values('start', 'open', 'high', 'low', 'close', 'tick_count')
+        for row in rows:
+            page = period_number(row['start'], interval) // page_size
+            if page in loaded:
+                loaded[page].append(row)
+
+        cache.set_many(
+            {candle_page_key(symbol, interval, page): candles
+             for page, candles in loaded.items() if candle_page_key(symbol, interval, page) in closed},
+            settings.CANDLE_CACHE_TIMEOUT,
+        )
+        cached.update(loaded)
+
+    return [
+        candle for page in pages for candle in cached[page]
+        if first <= period_number(candle['start'], interval) <= last
+    ]
@@ -0,0 +1,80 @@
+"""
+Ingestion of price ticks.
+"""
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+from django.utils import timezone
+
+from core.locks import cache_lock
+
+from .cache import invalidate_prices
+from .models import CryptoPrice, PriceTick
+
+INGEST_LOCK_KEY = 'prices:ingest-lock'
+INGEST_LOCK_TIMEOUT = 10 * 60  # (in seconds) released when an ingest ends, expires if the worker dies
+
+
+def latest_tick_times():
+    """Return {symbol: time of its newest stored tick}."""
+    return dict(PriceTick.objects.values('symbol').annotate(latest=Max('timestamp')).values_list('symbol', 'latest'))
+
+
+def ingest_ticks(ticks, batch_size=None, wait=True):
+    """
+    Store (symbol, timestamp, price_usd) ticks with one bulk INSERT per batch of
+    PRICE_INGEST_BATCH_SIZE ticks, skipping ticks already stored, then refresh the
+    latest prices of the symbols. Returns (ticks read, symbols).
+
+    Ingests are serialized with a cache lock, so ticks are committed in primary key
+    order, which the candle aggregation relies on. While another ingest holds the
+    lock this waits for it to end, or with wait=False returns None at once.
+    """
+    with cache_lock(INGEST_LOCK_KEY, INGEST_LOCK_TIMEOUT, wait=wait) as locked:
+        if not locked:
+            return None
+        return _store_ticks(ticks, batch_size or settings.PRICE_INGEST_BATCH_SIZE)
+
+
+def _store_ticks(ticks, batch_size):
+    ticks = iter(ticks)
+    symbols = set()
+    count = 0
+    while True:
+        batch = [PriceTick(symbol=symbol, timestamp=timestamp, price_usd=price)
+                 for symbol, timestamp, price in islice(ticks, batch_size)]
+        if not batch:
+            break
+        PriceTick.objects.bulk_create(batch, ignore_conflicts=True)
+        symbols.update(tick.symbol for tick in batch)
+        count += len(batch)
+
+    if symbols:
+        refresh_latest_prices(symbols)
+    return count, symbols
+
+
+def refresh_latest_prices(symbols):
+    """
+    Set the latest price and the price 24 hours ago of the symbols from the stored
+    ticks, with a single UPDATE, and invalidate their cached prices.
+    """
+    symbols = list(symbols)
+    ticks = PriceTick.objects.filter(symbol=OuterRef('symbol')).order_by('-timestamp')
+    day_ago = timezone.now() - timedelta(days=1)
+
+    with transaction.atomic():
+        # rows for new symbols, their prices are set by the update below
+        CryptoPrice.objects.bulk_create(
+            [CryptoPrice(symbol=symbol, price_usd=0) for symbol in symbols], ignore_conflicts=True,
+        )
+        CryptoPrice.objects.filter(symbol__in=symbols).update(
+            price_usd=Subquery(ticks.values('price_usd')[:1]),
+            price_usd_24h=Subquery(ticks.filter(timestamp__lte=day_ago).values('price_usd')[:1]),
+            updated_at=timezone.now(),
+        )
+
+    transaction.on_commit(lambda: invalidate_prices(symbols))
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+
+from prices.candles import aggregate_new_ticks, reset_candles
+from prices.models import CANDLE_INTERVALS
+
+
+class Command(BaseCommand):
+    help = 'Rebuild price candles from all stored price ticks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', action='append', choices=list(CANDLE_INTERVALS),
+                            help='Interval to rebuild, may be repeated. All intervals by default.')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Ticks grouped at a time, CANDLE_AGGREGATION_BATCH_SIZE by default.')
+
+    def handle(self, *args, **options):
+        intervals = options['interval'] or list(CANDLE_INTERVALS)
+        started = time.monotonic()
+
+        reset_candles(intervals)
+        processed = aggregate_new_ticks(intervals, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Candles {", ".join(intervals)} rebuilt from {processed} ticks in {time.monotonic() - started:.2f}s'
+        ))
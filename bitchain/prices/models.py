@@ -0,0 +1,85 @@
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+class CryptoPrice(models.Model):
+    """
+    Latest USD price of a cryptocurrency together with its price 24 hours earlier,
+    one row per symbol. Used to value wallets without calling an external API.
+    """
+    symbol = models.CharField(max_length=10, unique=True)
+    price_usd = models.DecimalField(max_digits=24, decimal_places=10)
+    price_usd_24h = models.DecimalField(max_digits=24, decimal_places=10, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.symbol} - {self.price_usd} USD"
+
+
+class PriceTick(models.Model):
+    """A single observed USD price of a cryptocurrency, as delivered by the price feed."""
+    symbol = models.CharField(max_length=10)
+    timestamp = models.DateTimeField()
+    price_usd = models.DecimalField(max_digits=24, decimal_places=10)
+
+    class Meta:
+        constraints = [
+            # the unique index also serves symbol + time range lookups
+            models.UniqueConstraint(fields=['symbol', 'timestamp'], name='price_tick_symbol_timestamp'),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} - {self.timestamp} - {self.price_usd} USD"
+
+
+# candle interval name - length in seconds
+CANDLE_INTERVALS = {
+    '1m': 60,
+    '5m': 5 * 60,
+    '1h': 60 * 60,
+    '1d': 24 * 60 * 60,
+}
+
+
+class PriceCandle(models.Model):
+    """
+    OHLC candle of a cryptocurrency aggregated from price ticks. The feed carries no traded volume,
+    so the number of ticks in the candle is stored instead. opened_at and closed_at are the times of
+    the first and last tick, they let late ticks be merged into a stored candle.
+    """
+    symbol = models.CharField(max_length=10)
+    interval = models.CharField(max_length=3, choices=[(name, name) for name in CANDLE_INTERVALS])
+    start = models.DateTimeField()
+    open = models.DecimalField(max_digits=24, decimal_places=10)
+    high = models.DecimalField(max_digits=24, decimal_places=10)
+    low = models.DecimalField(max_digits=24, decimal_places=10)
+    close = models.DecimalField(max_digits=24, decimal_places=10)
+    tick_count = models.IntegerField()
+    opened_at = models.DateTimeField()
+    closed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # the unique index also serves symbol + interval + time range lookups
+            models.UniqueConstraint(fields=['symbol', 'interval', 'start'], name='price_candle_symbol_interval_start'),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} - {self.interval} - {self.start}"
+
+
+class CandleWatermark(models.Model):
+    """Primary key of the last price tick aggregated into candles of an interval."""
+    interval = models.CharField(max_length=3, unique=True)
+    last_tick_pk = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.interval} - {self.last_tick_pk}"
+
+@receiver(post_save, sender=CryptoPrice)
+@receiver(post_delete, sender=CryptoPrice)
+def invalidate_cached_price(sender, instance, **kwargs):
+    """Drop the cached price when a price is changed by hand, e.g. in the admin."""
+    from .cache import invalidate_prices
+    invalidate_prices([instance.symbol])
@@ -0,0 +1,7 @@
+from rest_framework import serializers
+from .models import PriceCandle
+
+class PriceCandleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PriceCandle
+        fields = ['start', 'open', 'high', 'low', 'close', 'tick_count']
@@ -0,0 +1,76 @@
+"""
+Sources of price ticks.
+
+A source yields (symbol, timestamp, price_usd) tuples newer than the newest
+stored tick of their symbol, given as a {symbol: time} mapping. Symbols move
+at their own pace, a single watermark for all of them would drop the ticks of
+a symbol that lags behind the others.
+The source used by the ingestion task is configured in settings.PRICE_SOURCE,
+so an exchange client can replace the file based source without other changes.
+"""
+import csv
+import threading
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+
+def is_new_tick(symbol, timestamp, since):
+    """Return whether the tick is newer than the newest stored tick of its symbol in since."""
+    latest = since.get(symbol) if since else None
+    return latest is None or timestamp > latest
+
+
+class StaticPriceSource:
+    """Price ticks kept in memory, for tests and fixtures."""
+
+    def __init__(self, ticks=()):
+        self.ticks = list(ticks)
+
+    def fetch(self, since=None):
+        for symbol, timestamp, price in self.ticks:
+            if is_new_tick(symbol, timestamp, since):
+                yield symbol, timestamp, Decimal(price)
+
+
+class FilePriceSource:
+    """
+    Price ticks read from a CSV file with a symbol,timestamp,price_usd header,
+    timestamps in ISO 8601 (UTC when no offset is given). A missing file yields no ticks.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self, since=None):
+        try:
+            feed = open(self.path, newline='')
+        except FileNotFoundError:
+            return
+        with feed:
+            for row in csv.DictReader(feed):
+                timestamp = parse_datetime(row['timestamp'])
+                if timezone.is_naive(timestamp):
+                    timestamp = timezone.make_aware(timestamp, dt_timezone.utc)
+                symbol = row['symbol'].upper()
+                if is_new_tick(symbol, timestamp, since):
+                    yield symbol, timestamp, Decimal(row['price_usd'])
+
+
+_source = None
+_source_lock = threading.Lock()
+
+
+def get_price_source():
+    """Return the price source configured in settings.PRICE_SOURCE."""
+    global _source
+    if _source is None:
+        with _source_lock:
+            if _source is None:
+                config = settings.PRICE_SOURCE
+                _source = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _source
@@ -0,0 +1,40 @@
+from celery import shared_task
+from django.db.utils import ProgrammingError as django_db_ProgrammingError
+
+from .candles import aggregate_new_ticks
+from .feed import ingest_ticks, latest_tick_times
+from .sources import get_price_source
+
+
+@shared_task
+def ingest_price_ticks():
+    """
+    Reads ticks newer than the newest stored tick of their symbol from the configured price source, stores them in bulk
+    and refreshes the latest prices. This task is executed every minute.
+    """
+    try:
+        ingested = ingest_ticks(get_price_source().fetch(since=latest_tick_times()), wait=False)
+        if ingested is None:
+            print("Price tick ingest already running. Skipping ingest_price_ticks task.")
+            return None
+        count, symbols = ingested
+        if count:
+            print(f"Price ticks ingested - {count} ticks for {len(symbols)} symbols")
+        return count
+    except django_db_ProgrammingError:
+        print("Database not ready yet. Skipping ingest_price_ticks task.")
+
+
+@shared_task
+def aggregate_price_candles():
+    """
+    Aggregates price ticks stored since the previous run into candles of every interval. This task is executed
+    every minute.
+    """
+    try:
+        processed = aggregate_new_ticks()
+        if processed:
+            print(f"Price candles updated from {processed} ticks")
+        return processed
+    except django_db_ProgrammingError:
+        print("Database not ready yet. Skipping aggregate_price_candles task.")
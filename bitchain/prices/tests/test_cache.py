@@ -0,0 +1,61 @@
+"""
+Tests for the latest price cache.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from prices.cache import LocalPriceCache, get_latest_price, get_latest_prices, local_prices
+from prices.models import CryptoPrice
+
+
+class LatestPriceCacheTests(TestCase):
+    """Test the local, shared and database price lookups"""
+
+    def setUp(self):
+        cache.clear()
+        local_prices.clear()
+        CryptoPrice.objects.create(symbol='BTC', price_usd=100, price_usd_24h=90)
+
+    def test_lookup_layers(self):
+        """Test that prices are loaded once, then served locally and from the shared cache"""
+        with self.assertNumQueries(1):
+            self.assertEqual(get_latest_prices(['BTC', 'XYZ']), {
+                'BTC': (Decimal('100'), Decimal('90')),
+                'XYZ': (None, None),
+            })
+            self.assertEqual(get_latest_price('BTC'), Decimal('100'))
+            self.assertIsNone(get_latest_price('XYZ'))
+
+        local_prices.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_latest_price('BTC'), Decimal('100'))
+
+    @override_settings(PRICE_LOCAL_CACHE_TTL=0)
+    def test_local_entries_expire(self):
+        """Test that expired local entries fall back to the shared cache"""
+        get_latest_price('BTC')
+        self.assertEqual(local_prices.get_many(['BTC']), {})
+
+    def test_local_cache_drops_expired_and_oldest(self):
+        """Test that the local cache removes expired entries and keeps at most max_entries"""
+        prices = LocalPriceCache(max_entries=2)
+        prices.set_many({'OLD': (1, 1)}, ttl=0)
+        prices.set_many({'A': (1, 1), 'B': (2, 2)}, ttl=60)
+        self.assertEqual(list(prices._entries), ['A', 'B'])
+
+        prices.set_many({'A': (3, 3), 'C': (4, 4)}, ttl=60)
+
+        self.assertEqual(list(prices._entries), ['A', 'C'])
+        self.assertEqual(prices.get_many(['A', 'B', 'C']), {'A': (3, 3), 'C': (4, 4)})
+
+    def test_saving_price_invalidates(self):
+        """Test that changing a price by hand drops the cached one"""
+        get_latest_price('BTC')
+
+        price = CryptoPrice.objects.get(symbol='BTC')
+        price.price_usd = 120
+        price.save()
+
+        self.assertEqual(get_latest_price('BTC'), Decimal('120'))
@@ -0,0 +1,136 @@
+"""
+Tests for price candle aggregation and the candle API.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from prices.candles import aggregate_new_ticks
+from prices.models import CandleWatermark, PriceCandle, PriceTick
+
+
+CANDLES_URL = reverse('prices:price-candles')
+START = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def create_ticks(*ticks):
+    """Helper function to store (symbol, seconds after START, price) ticks"""
+    PriceTick.objects.bulk_create([
+        PriceTick(symbol=symbol, timestamp=START + timedelta(seconds=seconds), price_usd=price)
+        for symbol, seconds, price in ticks
+    ])
+
+
+class CandleAggregationTests(TestCase):
+    """Test rolling ticks up into candles"""
+
+    def setUp(self):
+        cache.clear()
+
+    def candle(self, symbol, interval, seconds=0):
+        return PriceCandle.objects.get(symbol=symbol, interval=interval, start=START + timedelta(seconds=seconds))
+
+    def test_ohlc_per_period(self):
+        """Test that open, high, low, close and tick count are taken per symbol and period"""
+        create_ticks(
+            ('BTC', 50, '103'), ('BTC', 10, '100'), ('BTC', 20, '110.5'), ('BTC', 30, '95'),
+            ('BTC', 70, '120'), ('ETH', 15, '10'),
+        )
+
+        self.assertEqual(aggregate_new_ticks(batch_size=4), 6)
+
+        candle = self.candle('BTC', '1m')
+        self.assertEqual(
+            (candle.open, candle.high, candle.low, candle.close, candle.tick_count),
+            (Decimal('100'), Decimal('110.5'), Decimal('95'), Decimal('103'), 4),
+        )
+        self.assertEqual(self.candle('BTC', '1m', 60).open, Decimal('120'))
+        self.assertEqual(self.candle('ETH', '1m').tick_count, 1)
+
+        hour = self.candle('BTC', '1h')
+        self.assertEqual((hour.open, hour.high, hour.close, hour.tick_count),
+                         (Decimal('100'), Decimal('120'), Decimal('120'), 5))
+        self.assertEqual(PriceCandle.objects.filter(interval='1d').count(), 2)
+
+    def test_only_new_ticks_processed(self):
+        """Test that later runs merge new and late ticks into the stored candles"""
+        create_ticks(('BTC', 20, '100'), ('BTC', 30, '105'))
+        aggregate_new_ticks()
+
+        self.assertEqual(aggregate_new_ticks(), 0)
+
+        # a late tick before the stored open and a new one after the close
+        create_ticks(('BTC', 5, '90'), ('BTC', 40, '104'))
+        self.assertEqual(aggregate_new_ticks(), 2)
+
+        candle = self.candle('BTC', '1m')
+        self.assertEqual(
+            (candle.open, candle.high, candle.low, candle.close, candle.tick_count),
+            (Decimal('90'), Decimal('105'), Decimal('90'), Decimal('104'), 4),
+        )
+        self.assertEqual(set(CandleWatermark.objects.values_list('last_tick_pk', flat=True)),
+                         {PriceTick.objects.latest('pk').pk})
+
+    def test_backfill_rebuilds_candles(self):
+        """Test that the backfill command rebuilds candles from all ticks"""
+        create_ticks(('BTC', 10, '100'), ('BTC', 20, '110'))
+        aggregate_new_ticks()
+        PriceCandle.objects.update(high=1)
+
+        out = StringIO()
+        call_command('backfill_candles', '--interval', '1m', stdout=out)
+
+        self.assertIn('from 2 ticks', out.getvalue())
+        self.assertEqual(self.candle('BTC', '1m').high, Decimal('110'))
+        self.assertEqual(self.candle('BTC', '1m').tick_count, 2)
+
+
+class PriceCandleApiTests(TestCase):
+    """Test the candle range API"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_ticks(('BTC', 10, '100'), ('BTC', 3600 + 10, '110'), ('BTC', 7200 + 10, '120'))
+        aggregate_new_ticks()
+
+    def get_candles(self, **params):
+        params = {'symbol': 'BTC', 'interval': '1h', 'start': '2024-01-01', 'end': '2024-01-01T23:00:00Z', **params}
+        return self.client.get(CANDLES_URL, params)
+
+    def test_range(self):
+        """Test that candles in the range are returned oldest first"""
+        res = self.get_candles(start='2024-01-01T01:00:00Z')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([candle['open'] for candle in res.data], ['110.0000000000', '120.0000000000'])
+        self.assertEqual(parse_datetime(res.data[0]['start']), START + timedelta(hours=1))
+
+    def test_closed_candles_cached_until_late_tick(self):
+        """Test that ended periods are served from cache and late ticks invalidate them"""
+        self.get_candles()
+        with self.assertNumQueries(0):
+            res = self.get_candles()
+        self.assertEqual(len(res.data), 3)
+
+        create_ticks(('BTC', 20, '130'))
+        aggregate_new_ticks()
+
+        res = self.get_candles()
+        self.assertEqual(res.data[0]['high'], '130.0000000000')
+
+    def test_invalid_requests(self):
+        """Test that missing symbol, unknown interval and too long ranges are rejected"""
+        for params in ({'symbol': ''}, {'interval': '2h'}, {'start': 'yesterday'},
+                       {'interval': '1m', 'end': '2024-01-02'}, {'start': '2024-01-02'}):
+            res = self.get_candles(**params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, params)
@@ -0,0 +1,110 @@
+"""
+Tests for price tick ingestion.
+"""
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from prices.cache import get_latest_price, local_prices
+from prices.feed import INGEST_LOCK_KEY, ingest_ticks, latest_tick_times
+from prices.models import CryptoPrice, PriceTick
+from prices.sources import FilePriceSource, StaticPriceSource
+
+
+class IngestTicksTests(TestCase):
+    """Test storing ticks and refreshing the latest prices"""
+
+    def setUp(self):
+        cache.clear()
+        local_prices.clear()
+        self.now = timezone.now().replace(microsecond=0)
+
+    def test_ingest_sets_latest_and_24h_prices(self):
+        """Test that ticks are stored and the newest and day old prices are taken"""
+        source = StaticPriceSource([
+            ('BTC', self.now - timedelta(hours=30), '80'),
+            ('BTC', self.now - timedelta(hours=25), '90'),
+            ('BTC', self.now - timedelta(minutes=1), '100'),
+            ('ETH', self.now, '10'),
+        ])
+
+        count, symbols = ingest_ticks(source.fetch(), batch_size=2)
+
+        self.assertEqual((count, symbols), (4, {'BTC', 'ETH'}))
+        self.assertEqual(PriceTick.objects.count(), 4)
+        btc = CryptoPrice.objects.get(symbol='BTC')
+        self.assertEqual((btc.price_usd, btc.price_usd_24h), (Decimal('100'), Decimal('90')))
+        eth = CryptoPrice.objects.get(symbol='ETH')
+        self.assertEqual((eth.price_usd, eth.price_usd_24h), (Decimal('10'), None))
+
+    def test_ingest_skips_stored_ticks(self):
+        """Test that ingesting the same ticks twice stores them once"""
+        source = StaticPriceSource([('BTC', self.now, '100')])
+        ingest_ticks(source.fetch())
+        ingest_ticks(source.fetch())
+
+        self.assertEqual(PriceTick.objects.count(), 1)
+        self.assertEqual(list(source.fetch(since=latest_tick_times())), [])
+
+    def test_lagging_symbol_ticks_read(self):
+        """Test that a tick of a symbol arriving after another symbol moved ahead is still read"""
+        ingest_ticks(StaticPriceSource([('BTC', self.now - timedelta(minutes=5), '100'),
+                                        ('ETH', self.now - timedelta(minutes=5), '10')]).fetch())
+        ingest_ticks(StaticPriceSource([('BTC', self.now, '110')]).fetch())
+        # the ETH feed was late, its tick is older than the newest BTC tick
+        source = StaticPriceSource([('BTC', self.now, '110'), ('ETH', self.now - timedelta(minutes=1), '11')])
+
+        ticks = list(source.fetch(since=latest_tick_times()))
+
+        self.assertEqual(ticks, [('ETH', self.now - timedelta(minutes=1), Decimal('11'))])
+        ingest_ticks(ticks)
+        self.assertEqual(CryptoPrice.objects.get(symbol='ETH').price_usd, Decimal('11'))
+
+    def test_overlapping_ingest_skipped(self):
+        """Test that an ingest does not run while another one holds the lock"""
+        source = StaticPriceSource([('BTC', self.now, '100')])
+        cache.add(INGEST_LOCK_KEY, 'other', 60)
+
+        self.assertIsNone(ingest_ticks(source.fetch(), wait=False))
+        self.assertFalse(PriceTick.objects.exists())
+
+        cache.delete(INGEST_LOCK_KEY)
+        self.assertEqual(ingest_ticks(source.fetch(), wait=False), (1, {'BTC'}))
+        self.assertIsNone(cache.get(INGEST_LOCK_KEY))
+
+    def test_ingest_invalidates_cached_price(self):
+        """Test that a new tick replaces a cached price"""
+        CryptoPrice.objects.create(symbol='BTC', price_usd=50)
+        self.assertEqual(get_latest_price('BTC'), Decimal('50'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_ticks(StaticPriceSource([('BTC', self.now, '100')]).fetch())
+
+        self.assertEqual(get_latest_price('BTC'), Decimal('100'))
+
+
+class FilePriceSourceTests(TestCase):
+    """Test reading ticks from a CSV file"""
+
+    def test_reads_ticks_newer_than_since(self):
+        """Test that rows are parsed and older ones skipped"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as feed:
+            feed.write('symbol,timestamp,price_usd\n'
+                       'btc,2024-01-01T00:00:00,100.5\n'
+                       'ETH,2024-01-01T00:01:00+00:00,10\n')
+        self.addCleanup(os.remove, feed.name)
+
+        ticks = list(FilePriceSource(feed.name).fetch())
+        self.assertEqual([(symbol, price) for symbol, _, price in ticks], [('BTC', Decimal('100.5')), ('ETH', Decimal('10'))])
+        self.assertTrue(timezone.is_aware(ticks[0][1]))
+
+        self.assertEqual(len(list(FilePriceSource(feed.name).fetch(since={symbol: timestamp for symbol, timestamp, _ in ticks[:1]}))), 1)
+
+    def test_missing_file_yields_nothing(self):
+        """Test that a missing feed file is not an error"""
+        self.assertEqual(list(FilePriceSource('/nonexistent/prices.csv').fetch()), [])
@@ -0,0 +1,11 @@
+"""
+URL mapping for prices app.
+"""
+from django.urls import path
+from .views import PriceCandleView
+
+app_name = 'prices'
+
+urlpatterns = [
+    path('candles/', PriceCandleView.as_view(), name='price-candles'),
+]
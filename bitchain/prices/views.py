@@ -0,0 +1,72 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .candles import get_candles, period_number
+from .models import CANDLE_INTERVALS
+from .serializers import PriceCandleSerializer
+
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+
+
+def parse_moment(value):
+    """Parse an ISO date or datetime, dates mean midnight and naive datetimes UTC. Returns None if invalid."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            date = parse_date(value)
+            moment = date and datetime.combine(date, time.min)
+    except ValueError:
+        return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
+
+
+class PriceCandleView(APIView):
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('symbol', str, description="Symbol of the cryptocurrency, e.g. BTC"),
+            OpenApiParameter('interval', str, enum=list(CANDLE_INTERVALS), description="Candle interval, 1h by default"),
+            OpenApiParameter('start', str, description="ISO date or datetime of the first period, "
+                                                       "by default the longest allowed range before end"),
+            OpenApiParameter('end', str, description="ISO date or datetime of the last period, now by default"),
+        ],
+        responses={
+            200: PriceCandleSerializer(many=True),
+            400: {"example": {"error": "Symbol not provided"}},
+        },
+        description="Get price candles of a symbol, oldest first. Periods without ticks are omitted. "
+                    f"At most {settings.CANDLE_MAX_RANGE} periods are returned by one request."
+    )
+    def get(self, request):
+        symbol = request.query_params.get('symbol', '').strip()
+        if not symbol:
+            return Response({"error": "Symbol not provided"}, status=status.HTTP_400_BAD_REQUEST)
+        interval = request.query_params.get('interval', '1h')
+        if interval not in CANDLE_INTERVALS:
+            return Response(
+                {"error": f"Interval must be one of {', '.join(CANDLE_INTERVALS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        end = parse_moment(request.query_params['end']) if 'end' in request.query_params else timezone.now()
+        if 'start' in request.query_params:
+            start = parse_moment(request.query_params['start'])
+        else:
+            start = end and end - timedelta(seconds=CANDLE_INTERVALS[interval] * (settings.CANDLE_MAX_RANGE - 1))
+        if start is None or end is None or start > end:
+            return Response({"error": "Invalid start or end."}, status=status.HTTP_400_BAD_REQUEST)
+        if period_number(end, interval) - period_number(start, interval) >= settings.CANDLE_MAX_RANGE:
+            return Response(
+                {"error": f"Too many periods. Maximum is {settings.CANDLE_MAX_RANGE}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        candles = get_candles(symbol, interval, start, end)
+        return Response(PriceCandleSerializer(candles, many=True).data, status=status.HTTP_200_OK)
@@ -0,0 +1,28 @@
+"""
+Authentication backends of the user app.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password
+
+from user.hashing import check_user_password, get_password_executor
+
+
+class PooledModelBackend(ModelBackend):
+    """ModelBackend that checks passwords in the bounded password hashing executor."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user_model = get_user_model()
+        if username is None:
+            username = kwargs.get(user_model.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = user_model._default_manager.get_by_natural_key(username)
+        except user_model.DoesNotExist:
+            # hash anyway, so the response time does not tell whether the user exists
+            get_password_executor().run(make_password, password)
+            return None
+        if check_user_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,75 @@
+"""
+Favorite cryptocurrencies of users.
+
+The favorite symbols of each user are cached under a versioned key. Updates
+bump the user's version instead of deleting entries, so a reader holding an
+old version can never store stale favorites under the current key. Versions
+start from the current time in nanoseconds, so a version key that was evicted
+is never recreated with a version whose favorites may still be cached.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import FavoriteUserCryptocurrency
+
+
+def _version_key(user):
+    return f'user:favorites-version:{user.pk}'
+
+
+def _favorites_key(user, version):
+    return f'user:favorites:{user.pk}:{version}'
+
+
+def get_favorite_symbols(user):
+    """Return the user's favorite symbols, from cache when possible."""
+    version = cache.get_or_set(_version_key(user), time.time_ns, None)
+    key = _favorites_key(user, version)
+    symbols = cache.get(key)
+    if symbols is None:
+        symbols = list(
+            FavoriteUserCryptocurrency.objects.filter(user=user)
+            .order_by('pk').values_list('favorite_crypto_symbol', flat=True)
+        )
+        cache.set(key, symbols, settings.USER_FAVORITES_CACHE_TIMEOUT)
+    return symbols
+
+
+def invalidate_favorite_symbols(user):
+    """Make cached favorites of the user stale."""
+    try:
+        cache.incr(_version_key(user))
+    except ValueError:
+        # the version was evicted, its favorites may still be cached
+        cache.set(_version_key(user), time.time_ns(), None)
+
+
+def set_favorite_symbols(user, symbols):
+    """
+    Replace the user's favorite symbols with the given ones. Only the difference
+    against the stored favorites is written: one DELETE for removed symbols and
+    one bulk INSERT for added ones. Returns the favorites in stored order, like
+    get_favorite_symbols: the kept ones, then the added ones.
+    """
+    symbols = list(dict.fromkeys(symbols))
+
+    with transaction.atomic():
+        favorites = FavoriteUserCryptocurrency.objects.filter(user=user)
+        existing = list(favorites.order_by('pk').values_list('favorite_crypto_symbol', flat=True))
+
+        removed = set(existing).difference(symbols)
+        if removed:
+            favorites.filter(favorite_crypto_symbol__in=removed).delete()
+
+        added = [symbol for symbol in symbols if symbol not in existing]
+        if added:
+            FavoriteUserCryptocurrency.objects.bulk_create(
+                [FavoriteUserCryptocurrency(user=user, favorite_crypto_symbol=symbol) for symbol in added],
+                ignore_conflicts=True,
+            )
+
+    invalidate_favorite_symbols(user)
+    return [symbol for symbol in existing if symbol not in removed] + added
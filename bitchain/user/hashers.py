@@ -0,0 +1,17 @@
+"""
+Password hashers of the user app.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher with the iteration count taken from settings.PASSWORD_PBKDF2_ITERATIONS.
+    It keeps the pbkdf2_sha256 algorithm name, so existing hashes stay valid and are
+    rehashed with the configured count on the next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
@@ -0,0 +1,153 @@
+"""
+Password hashing off the calling thread.
+
+Hashing is CPU bound: it dominates user provisioning, where batches of
+passwords are hashed in a pool of worker processes, and logins, where each
+check runs in a bounded executor that rejects work it could not start soon
+instead of letting requests pile up. This module must not import models:
+spawned workers import it with only the settings module configured.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, identify_hasher, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+
+
+def hash_password_batch(passwords):
+    """Hash the passwords in the current process."""
+    return [make_password(password) for password in passwords]
+
+
+class PasswordHashingPool:
+    """
+    Process pool hashing lists of passwords. Passwords are sent to the workers in
+    chunks to keep the inter-process overhead small; with one worker, or too few
+    passwords to fill a chunk, they are hashed in the calling process.
+    """
+
+    def __init__(self, workers=None, chunk_size=64):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._executor = None
+
+    def hash(self, passwords):
+        passwords = list(passwords)
+        if self.workers == 1 or len(passwords) <= self.chunk_size:
+            return hash_password_batch(passwords)
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        chunks = [passwords[i:i + self.chunk_size] for i in range(0, len(passwords), self.chunk_size)]
+        return [encoded for batch in self._executor.map(hash_password_batch, chunks) for encoded in batch]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PasswordHashingBusy(Throttled):
+    """Raised when the password hashing queue is full."""
+    default_detail = 'Too many password checks in progress.'
+
+    def __init__(self):
+        super().__init__(wait=1)
+
+
+class PasswordHashingUnavailable(APIException):
+    """Raised when a password check did not finish in time."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Password check timed out, try again later.'
+    default_code = 'password_hashing_unavailable'
+
+
+def verify_password(password, encoded):
+    """
+    Check the password against the encoded hash. Returns (matches, new hash), the
+    new hash is set when the password matches but the hash uses another hasher or
+    other parameters than the preferred hasher, i.e. the password should be rehashed.
+    """
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False, None
+    if not hasher.verify(password, encoded):
+        return False, None
+
+    preferred = get_hasher('default')
+    if hasher.algorithm != preferred.algorithm or preferred.must_update(encoded):
+        return True, make_password(password, hasher=preferred)
+    return True, None
+
+
+class BoundedHashingExecutor:
+    """
+    Thread or process pool running password hashing with back-pressure. At most
+    workers + max_queue calls are accepted at a time, further calls raise
+    PasswordHashingBusy at once; a call not finished within timeout seconds raises
+    PasswordHashingUnavailable. Threads are enough for PBKDF2, which hashes without
+    holding the GIL; processes also parallelize pure Python hashers.
+    """
+
+    def __init__(self, kind='thread', workers=None, max_queue=64, timeout=5.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        executor_class = ProcessPoolExecutor if kind == 'process' else ThreadPoolExecutor
+        self._executor = executor_class(max_workers=self.workers)
+        self._slots = threading.BoundedSemaphore(self.workers + max_queue)
+
+    def run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # the slot is freed when the work ends, also when the caller stopped waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            future.cancel()
+            raise PasswordHashingUnavailable()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_password_executor():
+    """Return the executor configured in settings.PASSWORD_HASHING_EXECUTOR."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = BoundedHashingExecutor(**settings.PASSWORD_HASHING_EXECUTOR)
+    return _executor
+
+
+def check_user_password(user, password):
+    """
+    Check the password of the user in the password hashing executor. A matching
+    password stored with outdated parameters is rehashed and saved, like
+    User.check_password does.
+    """
+    matches, new_encoded = get_password_executor().run(verify_password, password, user.password)
+    if new_encoded:
+        user.password = new_encoded
+        user.save(update_fields=['password'])
+    return matches
@@ -0,0 +1,155 @@
+"""
+Profile image files and their thumbnails.
+
+An uploaded image is decoded with Pillow once, in a Celery worker, and resized
+into square WebP and JPEG variants of USER_IMAGE_VARIANT_SIZES pixels without
+EXIF data. Variant files are named after a hash of their content, so a name
+always refers to the same bytes and can be cached by clients forever. Variants
+are always written: a name still in use, e.g. by files of an earlier image that
+a pending deletion is about to remove, gets a suffix from the storage, so such a
+deletion never removes a file of the current image.
+
+All files of a user are stored through the storage API in the user's hash
+prefix directory, with names starting with the user id. Replaced files are
+deleted by a worker after the change commits, and only if no user refers to
+them anymore, which the id in the name lets us check with a primary key lookup.
+"""
+import hashlib
+import os
+import uuid
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from core.models import user_upload_dir
+
+from user.authentication import invalidate_user_token
+
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_name(user_id, data, size, extension):
+    """Return the storage name of a variant, in the user's directory and named after its content hash."""
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    return os.path.join(user_upload_dir(user_id), f'{user_id}-{digest}-{size}.{extension}')
+
+
+def open_image(file, largest_size):
+    """Decode the image once, rotated upright and in RGB, at no more than twice the largest variant size."""
+    image = Image.open(file)
+    # JPEGs are scaled down by the decoder, which is much faster than decoding them fully
+    image.draft('RGB', (largest_size * 2, largest_size * 2))
+    image = ImageOps.exif_transpose(image)
+    return image.convert('RGB')
+
+
+def make_variants(user_id, file, sizes):
+    """Return {format: {size: (name, data)}} of square thumbnails of the image file."""
+    sizes = sorted(sizes, reverse=True)
+    image = open_image(file, sizes[0])
+    variants = {extension: {} for extension in VARIANT_FORMATS}
+    for size in sizes:
+        thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        for extension, (image_format, options) in VARIANT_FORMATS.items():
+            buffer = BytesIO()
+            # saved without the exif argument, so no metadata of the upload is kept
+            thumbnail.save(buffer, image_format, **options)
+            data = buffer.getvalue()
+            variants[extension][str(size)] = (variant_name(user_id, data, size, extension), data)
+    return variants
+
+
+def generate_image_variants(user_id):
+    """
+    Store the thumbnails of the user's current image and record their names in
+    image_variants, unless the image was replaced in the meantime. Returns the
+    variant names, or None when there is nothing to process.
+    """
+    user = get_user_model().objects.filter(pk=user_id).only('image').first()
+    if user is None or not user.image or user.image.name == settings.DEFAULT_AVATAR_PATH:
+        return None
+
+    with user.image.open('rb') as file:
+        variants = make_variants(user_id, file, settings.USER_IMAGE_VARIANT_SIZES)
+
+    names = {}
+    for extension, sizes in variants.items():
+        names[extension] = {}
+        for size, (name, data) in sizes.items():
+            names[extension][size] = default_storage.save(name, ContentFile(data))
+
+    updated = get_user_model().objects.filter(pk=user_id, image=user.image.name).update(image_variants=names)
+    if not updated:
+        delete_unreferenced_files(name for sizes in names.values() for name in sizes.values())
+        return None
+    invalidate_user_token(user_id)
+    return names
+
+
+def image_variant_urls(user):
+    """Return {format: {size: url}} of the user's thumbnails."""
+    return {
+        extension: {size: default_storage.url(name) for size, name in sizes.items()}
+        for extension, sizes in user.image_variants.items()
+    }
+
+
+def user_files(user):
+    """Return the names of the stored image and thumbnails of the user, the shared default avatar excluded."""
+    names = [name for sizes in user.image_variants.values() for name in sizes.values()]
+    if user.image and user.image.name != settings.DEFAULT_AVATAR_PATH:
+        names.append(user.image.name)
+    return names
+
+
+def file_owner(name):
+    """Return the id of the user a stored file belongs to, or None for files not named after a user."""
+    try:
+        return uuid.UUID(os.path.basename(name)[:36])
+    except ValueError:
+        return None
+
+
+def unreferenced_files(names):
+    """
+    Return the names of user files that are neither the image nor a thumbnail of
+    their owner, with one query. Files not named after a user are never returned.
+    """
+    owned = {}
+    for name in names:
+        owner = file_owner(name)
+        if owner is not None and name != settings.DEFAULT_AVATAR_PATH:
+            owned.setdefault(owner, []).append(name)
+    if not owned:
+        return []
+
+    referenced = set()
+    for image, variants in get_user_model().objects.filter(pk__in=owned).values_list('image', 'image_variants'):
+        referenced.add(image)
+        referenced.update(name for sizes in variants.values() for name in sizes.values())
+    return [name for files in owned.values() for name in files if name not in referenced]
+
+
+def delete_unreferenced_files(names):
+    """Delete the files no user refers to, returns the number of deleted files."""
+    names = unreferenced_files(names)
+    for name in names:
+        default_storage.delete(name)
+    return len(names)
+
+
+def schedule_file_deletion(names):
+    """Have the files deleted by a worker once the current transaction commits."""
+    from user.tasks import delete_user_files
+
+    names = list(names)
+    if names:
+        transaction.on_commit(lambda: delete_user_files.delay(names))
@@ -0,0 +1,49 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.management.base import BaseCommand
+
+from user.hashing import BoundedHashingExecutor, verify_password
+
+
+class Command(BaseCommand):
+    help = 'Measure password checks per second of the hashing executor, i.e. login throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=200, help='Password checks per run.')
+        parser.add_argument('--workers', default=None,
+                            help='Comma separated worker counts to compare, by default 1 and one per CPU.')
+        parser.add_argument('--kind', choices=('thread', 'process'), default='thread', help='Executor kind.')
+
+    def handle(self, *args, **options):
+        cpus = os.cpu_count() or 1
+        worker_counts = [int(count) for count in options['workers'].split(',')] if options['workers'] \
+            else sorted({1, cpus})
+        checks = options['checks']
+        encoded = make_password('benchmark-password')
+        self.stdout.write(f'Hasher {get_hasher("default").algorithm}, {checks} checks per run, {cpus} CPUs')
+
+        for workers in worker_counts:
+            executor = BoundedHashingExecutor(kind=options['kind'], workers=workers, max_queue=checks, timeout=None)
+            try:
+                # warm up the workers, process pools start lazily
+                executor.run(verify_password, 'benchmark-password', encoded)
+                started = time.monotonic()
+                # as many clients as workers and queue slots, like concurrent login requests
+                with ThreadPoolExecutor(max_workers=workers * 2) as clients:
+                    results = list(clients.map(
+                        lambda _: executor.run(verify_password, 'benchmark-password', encoded)[0], range(checks),
+                    ))
+                seconds = time.monotonic() - started
+            finally:
+                executor.shutdown()
+
+            rate = checks / seconds
+            self.stdout.write(self.style.SUCCESS(
+                f'{options["kind"]} x{workers}: {rate:.1f} checks/s, '
+                f'{rate / min(workers, cpus):.1f} checks/s per core, {seconds * 1000 / checks:.1f} ms per check'
+            ))
+            if not all(results):
+                self.stdout.write(self.style.ERROR('Some checks failed'))
@@ -0,0 +1,42 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+
+from user.provisioning import FILE_FORMATS, bulk_create_users, read_user_rows
+
+
+class Command(BaseCommand):
+    help = 'Create users with their wallets from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to read, - reads standard input.')
+        parser.add_argument('--format', choices=FILE_FORMATS, default=None,
+                            help='File format, by default taken from the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Users inserted at a time, USER_BULK_CREATE_CHUNK_SIZE by default.')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Password hashing processes, USER_BULK_HASH_WORKERS by default.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format == 'jsonl':
+            file_format = 'ndjson'
+        if file_format not in FILE_FORMATS:
+            raise CommandError('Unknown file format, use --format csv or --format ndjson.')
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Error opening {path}: {e}')
+        with stream:
+            report = bulk_create_users(
+                read_user_rows(stream, file_format), chunk_size=options['chunk_size'], workers=options['workers'],
+            )
+
+        for failure in report['failed']:
+            errors = '; '.join(f'{field}: {" ".join(messages)}' for field, messages in failure['errors'].items())
+            self.stdout.write(self.style.WARNING(f'Line {failure["line"]} skipped - {errors}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{report["created"]} users created, {len(report["failed"])} rows skipped '
+            f'in {report["seconds"]}s ({report["users_per_second"]} users/s)'
+        ))
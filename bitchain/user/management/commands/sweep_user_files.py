@@ -0,0 +1,53 @@
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from user.images import unreferenced_files
+
+USER_FILES_DIR = os.path.join('uploads', 'user')
+
+
+def walk_storage(storage, directory):
+    """Yield (directory, file names) of the directory and its subdirectories, one directory listed at a time."""
+    directories, files = storage.listdir(directory)
+    yield directory, files
+    for name in directories:
+        yield from walk_storage(storage, os.path.join(directory, name))
+
+
+class Command(BaseCommand):
+    help = 'Delete stored user images and thumbnails that no user refers to, e.g. left by failed deletions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=float, default=24,
+                            help='Hours since a file was written before it may be deleted, keeps in-flight uploads.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report the files that would be deleted.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['min_age'])
+        directories = files = deleted = 0
+
+        if not default_storage.exists(USER_FILES_DIR):
+            self.stdout.write('No user files stored')
+            return
+
+        # the sharded layout keeps every listing and its reference query small
+        for directory, names in walk_storage(default_storage, USER_FILES_DIR):
+            directories += 1
+            files += len(names)
+            for name in unreferenced_files(os.path.join(directory, name) for name in names):
+                if default_storage.get_modified_time(name) >= cutoff:
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(f'Orphan {name}')
+                else:
+                    default_storage.delete(name)
+                deleted += 1
+
+        action = 'would be deleted' if options['dry_run'] else 'deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{files} files in {directories} directories checked, {deleted} orphans {action}'
+        ))
@@ -0,0 +1,17 @@
+"""
+Pagination classes for the user API.
+"""
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class FundTransactionCursorPagination(CursorPagination):
+    """
+    Keyset pagination of fund transactions, newest first. Every page is read by
+    seeking the (fund_wallet, transaction_date) index from the cursor position,
+    so fetching a page costs the same regardless of how deep in the history it is.
+    """
+    ordering = ('-transaction_date', '-transaction_id')
+    page_size = settings.FUND_TRANSACTION_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.FUND_TRANSACTION_MAX_PAGE_SIZE
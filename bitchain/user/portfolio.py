@@ -0,0 +1,145 @@
+"""
+Portfolio valuation of users.
+
+The summary of each user's fund wallet is materialized in UserWalletOverview.
+A balance change updates the entry of its symbol in the same transaction, and
+recompute_portfolios revalues every wallet in bulk from the price table, so
+reading the summary is a single row (or cache) lookup.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import UserFundWalletCryptocurrency, UserWalletOverview
+from prices.cache import get_latest_prices
+from prices.models import CryptoPrice
+
+CENT = Decimal('0.01')
+PORTFOLIO_FIELDS = ('total_value_usd', 'change_24h_usd', 'breakdown', 'valued_at')
+
+
+def _portfolio_key(user_id):
+    return f'user:portfolio:{user_id}'
+
+
+def get_prices():
+    """Return {symbol: (price_usd, price_usd_24h)} of all symbols, read from the price table at once."""
+    return {symbol: (price, price_24h) for symbol, price, price_24h
+            in CryptoPrice.objects.values_list('symbol', 'price_usd', 'price_usd_24h')}
+
+
+def _plain(number):
+    """Format a decimal without trailing zeros or exponent, so equal values compare equal in JSON."""
+    return format(number.normalize(), 'f')
+
+
+def value_holding(amount, price, price_24h):
+    """Return the breakdown entry of a holding, values are strings to keep them exact in JSON."""
+    value = change = Decimal('0.00')
+    if price is not None:
+        value = (amount * price).quantize(CENT)
+        if price_24h is not None:
+            change = value - (amount * price_24h).quantize(CENT)
+    return {
+        'amount': _plain(amount),
+        'price_usd': None if price is None else _plain(price),
+        'value_usd': str(value),
+        'change_24h_usd': str(change),
+    }
+
+
+def compute_portfolio(holdings, prices):
+    """Return (total value, 24h change, breakdown) of (symbol, amount) holdings."""
+    breakdown = {}
+    for symbol, amount in holdings:
+        if amount:
+            breakdown[symbol] = value_holding(amount, *prices.get(symbol, (None, None)))
+    total = sum((Decimal(entry['value_usd']) for entry in breakdown.values()), Decimal(0))
+    change = sum((Decimal(entry['change_24h_usd']) for entry in breakdown.values()), Decimal(0))
+    return total, change, breakdown
+
+
+def update_portfolio_holding(wallet_id, symbol, amount):
+    """
+    Set the balance of one symbol in the portfolio of the wallet's owner and adjust
+    the totals by the difference, without touching the other symbols. Must run in
+    the transaction that changed the balance; the overview row is locked until it commits.
+    """
+    overview = UserWalletOverview.objects.select_for_update().get(userfundwallet=wallet_id)
+    previous = overview.breakdown.pop(symbol, None)
+    if previous:
+        overview.total_value_usd -= Decimal(previous['value_usd'])
+        overview.change_24h_usd -= Decimal(previous['change_24h_usd'])
+
+    if amount:
+        price, price_24h = get_latest_prices([symbol])[symbol]
+        entry = overview.breakdown[symbol] = value_holding(amount, price, price_24h)
+        overview.total_value_usd += Decimal(entry['value_usd'])
+        overview.change_24h_usd += Decimal(entry['change_24h_usd'])
+
+    overview.valued_at = timezone.now()
+    overview.save(update_fields=PORTFOLIO_FIELDS)
+
+    key = _portfolio_key(overview.user_id)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def recompute_portfolios(batch_size=None):
+    """
+    Revalue every portfolio with the current prices. Overviews are processed in
+    primary key batches of PORTFOLIO_RECOMPUTE_BATCH_SIZE rows, each with one query
+    for the balances and one bulk UPDATE of the rows whose valuation changed.
+    Returns a metrics dict.
+    """
+    batch_size = batch_size or settings.PORTFOLIO_RECOMPUTE_BATCH_SIZE
+    prices = get_prices()
+    last_pk = 0
+    processed = updated = 0
+
+    while True:
+        with transaction.atomic():
+            overviews = list(
+                UserWalletOverview.objects.select_for_update()
+                .filter(pk__gt=last_pk).order_by('pk')[:batch_size]
+            )
+            if not overviews:
+                break
+
+            holdings = defaultdict(list)
+            for overview_id, symbol, amount in (
+                UserFundWalletCryptocurrency.objects.filter(wallet_fund_id__fund_wallet__in=overviews)
+                .values_list('wallet_fund_id__fund_wallet', 'cryptocurrency_symbol', 'cryptocurrency_amount')
+            ):
+                holdings[overview_id].append((symbol, amount))
+
+            now = timezone.now()
+            changed = []
+            for overview in overviews:
+                valuation = compute_portfolio(holdings[overview.pk], prices)
+                if valuation != (overview.total_value_usd, overview.change_24h_usd, overview.breakdown):
+                    overview.total_value_usd, overview.change_24h_usd, overview.breakdown = valuation
+                    overview.valued_at = now
+                    changed.append(overview)
+            if changed:
+                UserWalletOverview.objects.bulk_update(changed, PORTFOLIO_FIELDS)
+
+        cache.delete_many([_portfolio_key(overview.user_id) for overview in changed])
+        last_pk = overviews[-1].pk
+        processed += len(overviews)
+        updated += len(changed)
+
+    return {'processed': processed, 'updated': updated, 'prices': len(prices)}
+
+
+def get_portfolio(user):
+    """Return the portfolio summary of the user as a dict, from cache when possible."""
+    key = _portfolio_key(user.pk)
+    portfolio = cache.get(key)
+    if portfolio is None:
+        portfolio = UserWalletOverview.objects.filter(user=user).values(*PORTFOLIO_FIELDS).get()
+        cache.set(key, portfolio, settings.USER_PORTFOLIO_CACHE_TIMEOUT)
+    return portfolio
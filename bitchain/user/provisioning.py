@@ -0,0 +1,226 @@
+"""
+Bulk provisioning of users from CSV or NDJSON files.
+
+Rows are validated without per-row queries, passwords are hashed in a pool of
+worker processes and users are inserted in chunks together with their wallet
+overview and fund wallet, one INSERT per table per chunk.
+
+Uploads through the API are imported as jobs by a Celery worker; the status and
+report of a job are kept in the cache for USER_BULK_CREATE_JOB_TIMEOUT seconds.
+"""
+import csv
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, connection, transaction
+from django.utils.dateparse import parse_date
+
+from core.models import UserBaseWallet, UserFundWallet, UserWalletOverview
+from user.hashing import PasswordHashingPool
+
+USER_FIELDS = ('email', 'password', 'full_name', 'nick_name', 'date_of_birth', 'pesel')
+FILE_FORMATS = ('csv', 'ndjson')
+PASSWORD_MIN_LENGTH = 8
+FUND_WALLET_INSERT_ROWS = 300  # keeps the number of query parameters within SQLite limits
+
+
+def read_user_rows(stream, file_format):
+    """Yield (line number, row) from a text stream of CSV with a header row or of NDJSON."""
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'ndjson':
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError:
+                    yield number, None
+    else:
+        raise ValueError(f"Unknown file format: {file_format}")
+
+
+def validate_user_row(row):
+    """
+    Return (user data, errors) of a row, the same rules as UserSerializer apart from
+    uniqueness: required fields, the maximum lengths of the model fields, the email
+    format, password length, date of birth and PESEL.
+    """
+    if not isinstance(row, dict):
+        return None, {'row': ['Row is not a valid object.']}
+
+    data, errors = {}, {}
+    for field in USER_FIELDS:
+        value = row.get(field)
+        if not isinstance(value, str) or not value.strip():
+            errors[field] = ['This field is required.']
+        else:
+            data[field] = value if field == 'password' else value.strip()
+    if errors:
+        return None, errors
+
+    user_model = get_user_model()
+    for field in ('email', 'full_name', 'nick_name'):
+        max_length = user_model._meta.get_field(field).max_length
+        if len(data[field]) > max_length:
+            errors[field] = [f'Ensure this field has no more than {max_length} characters.']
+    if 'email' not in errors:
+        try:
+            validate_email(data['email'])
+        except ValidationError:
+            errors['email'] = ['Enter a valid email address.']
+    data['email'] = user_model.objects.normalize_email(data['email'])
+    if len(data['password']) < PASSWORD_MIN_LENGTH:
+        errors['password'] = [f'Ensure this field has at least {PASSWORD_MIN_LENGTH} characters.']
+    try:
+        data['date_of_birth'] = parse_date(data['date_of_birth'])
+    except ValueError:
+        data['date_of_birth'] = None
+    if data['date_of_birth'] is None:
+        errors['date_of_birth'] = ['Date has wrong format. Use one of these formats instead: YYYY-MM-DD.']
+    if not data['pesel'].isdigit() or len(data['pesel']) != 11:
+        errors['pesel'] = ['PESEL must be 11 digits and contain only numbers']
+    return data, errors
+
+
+def insert_fund_wallets(base_wallets, overviews):
+    """
+    Insert the UserFundWallet rows of already inserted base wallets. bulk_create does
+    not support multi-table inherited models, so the rows are inserted with multi-row
+    INSERT statements of up to FUND_WALLET_INSERT_ROWS rows.
+    """
+    meta = UserFundWallet._meta
+    ptr_field, overview_field, type_field = meta.pk, meta.get_field('fund_wallet'), meta.get_field('wallet_type')
+    sql = 'INSERT INTO {} ({}) VALUES '.format(
+        connection.ops.quote_name(meta.db_table),
+        ', '.join(connection.ops.quote_name(field.column) for field in (ptr_field, overview_field, type_field)),
+    )
+    rows = [
+        (ptr_field.get_db_prep_value(wallet.pk, connection), overview.pk, type_field.get_default())
+        for wallet, overview in zip(base_wallets, overviews)
+    ]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), FUND_WALLET_INSERT_ROWS):
+            batch = rows[start:start + FUND_WALLET_INSERT_ROWS]
+            cursor.execute(sql + ', '.join(['(%s, %s, %s)'] * len(batch)), [value for row in batch for value in row])
+
+
+def create_user_chunk(chunk, pool, report):
+    """Create the users of a chunk of (line, data) rows that do not exist yet, with their wallets."""
+    user_model = get_user_model()
+    taken_emails = set(user_model.objects.filter(email__in=[data['email'] for _, data in chunk])
+                       .values_list('email', flat=True))
+    taken_nick_names = set(user_model.objects.filter(nick_name__in=[data['nick_name'] for _, data in chunk])
+                           .values_list('nick_name', flat=True))
+
+    accepted = []
+    for line, data in chunk:
+        errors = {}
+        if data['email'] in taken_emails:
+            errors['email'] = ['user with this email already exists.']
+        if data['nick_name'] in taken_nick_names:
+            errors['nick_name'] = ['user with this nick name already exists.']
+        if errors:
+            report['failed'].append({'line': line, 'errors': errors})
+        else:
+            accepted.append((line, data))
+    if not accepted:
+        return
+
+    passwords = pool.hash(data['password'] for _, data in accepted)
+    users = [
+        user_model(password=password, **{field: value for field, value in data.items() if field != 'password'})
+        for (_, data), password in zip(accepted, passwords)
+    ]
+    try:
+        with transaction.atomic():
+            user_model.objects.bulk_create(users)
+            overviews = UserWalletOverview.objects.bulk_create([UserWalletOverview(user=user) for user in users])
+            base_wallets = UserBaseWallet.objects.bulk_create([UserBaseWallet() for _ in users])
+            insert_fund_wallets(base_wallets, overviews)
+    except IntegrityError:
+        # a user of the chunk was created by someone else in the meantime
+        report['failed'].extend(
+            {'line': line, 'errors': {'row': ['User was created concurrently, retry the row.']}}
+            for line, _ in accepted
+        )
+        return
+    report['created'] += len(users)
+
+
+def bulk_create_users(rows, chunk_size=None, workers=None):
+    """
+    Create users from (line number, row) pairs, see read_user_rows. Invalid rows and
+    rows of existing users are skipped and reported. Returns a report dict with the
+    number of created users, the failed lines with their errors and the throughput.
+    """
+    chunk_size = chunk_size or settings.USER_BULK_CREATE_CHUNK_SIZE
+    report = {'created': 0, 'failed': []}
+    seen_emails, seen_nick_names = set(), set()
+    started = time.monotonic()
+
+    with PasswordHashingPool(workers or settings.USER_BULK_HASH_WORKERS) as pool:
+        chunk = []
+        for line, row in rows:
+            data, errors = validate_user_row(row)
+            if not errors:
+                if data['email'] in seen_emails:
+                    errors['email'] = ['Duplicate email in the file.']
+                if data['nick_name'] in seen_nick_names:
+                    errors['nick_name'] = ['Duplicate nick name in the file.']
+            if errors:
+                report['failed'].append({'line': line, 'errors': errors})
+                continue
+
+            seen_emails.add(data['email'])
+            seen_nick_names.add(data['nick_name'])
+            chunk.append((line, data))
+            if len(chunk) >= chunk_size:
+                create_user_chunk(chunk, pool, report)
+                chunk = []
+        if chunk:
+            create_user_chunk(chunk, pool, report)
+
+    seconds = time.monotonic() - started
+    report['seconds'] = round(seconds, 3)
+    report['users_per_second'] = round(report['created'] / seconds, 1) if seconds else None
+    return report
+
+
+def _job_key(job_id):
+    return f'user:bulk-create-job:{job_id}'
+
+
+def start_import_job(rows):
+    """Queue the creation of users from (line number, row) pairs. Returns the job id."""
+    from user.tasks import import_users
+
+    job_id = uuid.uuid4().hex
+    cache.set(_job_key(job_id), {'status': 'pending'}, settings.USER_BULK_CREATE_JOB_TIMEOUT)
+    import_users.delay(job_id, list(rows))
+    return job_id
+
+
+def run_import_job(job_id, rows):
+    """Create the users of a queued job and store its report."""
+    key, timeout = _job_key(job_id), settings.USER_BULK_CREATE_JOB_TIMEOUT
+    try:
+        # Celery worker processes can not start a process pool, passwords are hashed in the worker itself
+        report = bulk_create_users(rows, workers=1)
+    except Exception as error:
+        cache.set(key, {'status': 'failed', 'error': f'{type(error).__name__}: {error}'}, timeout)
+        raise
+    cache.set(key, {'status': 'done', **report}, timeout)
+    return report
+
+
+def get_import_job(job_id):
+    """Return the status of the job, with its report once done. None for unknown or expired jobs."""
+    return cache.get(_job_key(job_id))
@@ -5,15 +5,23 @@ from django.contrib.auth import (
     get_user_model,
     authenticate,
 )
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
 from core.models import (
     FavoriteUserCryptocurrency,
     UserFundTransaction,
-    UserWalletOverview,
-    UserFundWallet,
     UserFundWalletCryptocurrency,
+    UserWalletOverview,
 )
+from prices.cache import get_latest_price, get_latest_prices
+from user.images import image_variant_urls, schedule_file_deletion, user_files
+from user.tasks import process_user_image
+from user.wallets import InsufficientFundsError, change_crypto_balance, get_fund_wallet_id
 
 
 from django.utils.translation import gettext as _
@@ -78,19 +86,34 @@ class AuthTokenSerializer(serializers.Serializer):
 
 class UserImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to users"""
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = get_user_model()
-        fields = ('image',)
+        fields = ('image', 'image_variants')
+
+    @extend_schema_field({
+        'type': 'object',
+        'description': 'Square thumbnail URLs per format and size in pixels, empty until the upload is processed.',
+        'example': {'webp': {'32': '/static/media/uploads/user/variants/ab/ab12...-32.webp'}},
+    })
+    def get_image_variants(self, user):
+        return image_variant_urls(user)
 
     def update(self, instance, validated_data):
         """Update a user, setting the image correctly and return it."""
         image = validated_data.pop('image', None)
+        replaced_files = user_files(instance)
 
         user = super().update(instance, validated_data)
 
         if image:
             user.image = image
+            # thumbnails of the previous image are not served for the new one
+            user.image_variants = {}
             user.save()
+            schedule_file_deletion(replaced_files)
+            transaction.on_commit(lambda: process_user_image.delay(user.pk))
         return user
 
 
@@ -101,11 +124,45 @@ class FavoriteUserCryptocurrencySerializer(serializers.ModelSerializer):
         fields = ('favorite_crypto_symbol',)
       
         
+class UserFundTransactionListSerializer(serializers.ListSerializer):
+    """Serializer for many user fund transactions at once."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            # load the latest prices of all currencies at once, items then validate against the local cache
+            get_latest_prices(self.valid_currencies(data))
+        return super().to_internal_value(data)
+
+    def valid_currencies(self, data):
+        """Return the currencies of the items that pass the field validation, others are rejected anyway."""
+        field = self.child.fields['transaction_currency']
+        currencies = set()
+        for item in data:
+            if isinstance(item, dict) and isinstance(item.get('transaction_currency'), str):
+                try:
+                    currencies.add(field.run_validation(item['transaction_currency']))
+                except serializers.ValidationError:
+                    pass
+        return currencies
+
+    def save(self, user):
+        """Save all transactions with one bulk insert."""
+        fund_wallet_id = get_fund_wallet_id(user)
+        transactions = [
+            UserFundTransaction(fund_wallet_id=fund_wallet_id, **item) for item in self.validated_data
+        ]
+        with transaction.atomic():
+            UserFundTransaction.objects.bulk_create(transactions, batch_size=500)
+        self.instance = transactions
+        return transactions
+
+
 class UserFundTransactionSerializer(serializers.ModelSerializer):
     """Serializer for user fund transaction objects. """
     
     class Meta:
         model = UserFundTransaction
+        list_serializer_class = UserFundTransactionListSerializer
         fields = ('transaction_id',
                   'transaction_type',
                   'transaction_amount',
@@ -114,11 +171,22 @@ class UserFundTransactionSerializer(serializers.ModelSerializer):
                   'transaction_date')
 
         read_only_fields = ('transaction_id', 'transaction_date')
+
+    def validate(self, attrs):
+        """Check the price against the latest known price of the currency, when there is one."""
+        latest_price = get_latest_price(attrs['transaction_currency'])
+        if latest_price:
+            tolerance = Decimal(settings.TRANSACTION_PRICE_TOLERANCE)
+            if abs(attrs['transaction_price_usd'] - latest_price) > latest_price * tolerance:
+                raise serializers.ValidationError(
+                    {"transaction_price_usd": f"Price differs from the current price of {latest_price:.2f} USD."}
+                )
+        return attrs
         
     def save(self, user):
         """Save the user fund transaction."""
         transaction = UserFundTransaction.objects.create(
-            fund_wallet=UserFundWallet.objects.get(fund_wallet=UserWalletOverview.objects.get(user=user)),
+            fund_wallet_id=get_fund_wallet_id(user),
             transaction_type=self.validated_data['transaction_type'],
             transaction_amount=self.validated_data['transaction_amount'],
             transaction_price_usd=self.validated_data['transaction_price_usd'],
@@ -132,14 +200,31 @@ class UserFundWalletCryptoSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserFundWalletCryptocurrency
         fields = ('cryptocurrency_symbol', 'cryptocurrency_amount')
-        
-    def update(self, instance, validated_data):
-        symbol = validated_data['cryptocurrency_symbol']
-        amount_change = validated_data['cryptocurrency_amount']
 
-        if amount_change < 0 and instance.cryptocurrency_amount < abs(amount_change):
+    def save(self, user):
+        """
+        Apply cryptocurrency_amount as a change of the user's balance.
+        Returns the balance, self.created tells whether it was created.
+        """
+        wallet_id = get_fund_wallet_id(user)
+        symbol = self.validated_data['cryptocurrency_symbol']
+
+        try:
+            amount, self.created = change_crypto_balance(
+                wallet_id, symbol, self.validated_data['cryptocurrency_amount'],
+            )
+        except InsufficientFundsError:
             raise serializers.ValidationError({"error": "Not enough cryptocurrency to make the transaction."})
 
-        instance.cryptocurrency_amount += amount_change
-        instance.save()
-        return instance
\ No newline at end of file
+        self.instance = UserFundWalletCryptocurrency(
+            wallet_fund_id_id=wallet_id, cryptocurrency_symbol=symbol, cryptocurrency_amount=amount,
+        )
+        return self.instance
+
+
+class UserPortfolioSerializer(serializers.ModelSerializer):
+    """Serializer for the portfolio summary of the user's wallet overview."""
+    class Meta:
+        model = UserWalletOverview
+        fields = ('total_value_usd', 'change_24h_usd', 'breakdown', 'valued_at')
+        read_only_fields = fields
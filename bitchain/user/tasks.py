@@ -0,0 +1,55 @@
+from celery import shared_task
+from django.db.utils import ProgrammingError as django_db_ProgrammingError
+
+from .images import delete_unreferenced_files, generate_image_variants
+from .portfolio import recompute_portfolios
+from .provisioning import run_import_job
+
+
+@shared_task
+def recompute_portfolio_valuations():
+    """
+    Revalues the portfolio summary of every user with the current prices. This task is executed every 5 minutes.
+    Balance changes keep the summaries up to date between runs.
+    """
+    try:
+        metrics = recompute_portfolios()
+        print(f"Portfolio valuations recomputed - {metrics}")
+        return metrics
+    except django_db_ProgrammingError:
+        print("Database not ready yet. Skipping recompute_portfolio_valuations task.")
+
+
+@shared_task
+def process_user_image(user_id):
+    """
+    Generates the WebP and JPEG thumbnails of a newly uploaded profile image. This task is queued by every upload,
+    a run for an image that was replaced in the meantime leaves the user unchanged.
+    """
+    variants = generate_image_variants(user_id)
+    if variants is not None:
+        print(f"Profile image thumbnails generated for user {user_id}")
+    return variants
+
+
+@shared_task
+def delete_user_files(names):
+    """
+    Deletes replaced profile images and thumbnails off the request path. This task is queued after every change
+    that replaces them; files a user refers to again by the time it runs are kept.
+    """
+    deleted = delete_unreferenced_files(names)
+    if deleted:
+        print(f"User files deleted - {deleted} of {len(names)}")
+    return deleted
+
+
+@shared_task
+def import_users(job_id, rows):
+    """
+    Creates the users of a file uploaded to the bulk create endpoint. This task is queued by every upload,
+    the report is kept for USER_BULK_CREATE_JOB_TIMEOUT seconds.
+    """
+    report = run_import_job(job_id, rows)
+    print(f"Users imported - job {job_id}, {report['created']} created, {len(report['failed'])} rows skipped")
+    return report['created']
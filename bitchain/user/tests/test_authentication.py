@@ -0,0 +1,127 @@
+"""
+Tests for the cached token authentication.
+"""
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import _token_key
+
+
+ME_URL = reverse('user:me')
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating requests with cached tokens"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass123',
+            full_name='Test User',
+            nick_name='Test',
+            date_of_birth='1990-01-01',
+            pesel='90010100000',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_cached_after_first_request(self):
+        """Test that only the first request with a token queries for it"""
+        # token joined with its user
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_password_not_cached(self):
+        """Test that the cached entry holds no password hash and saving the cached user keeps the password"""
+        self.client.get(ME_URL)
+        cached = cache.get(_token_key(self.token.key))
+        self.assertEqual(cached['user']['email'], self.user.email)
+        self.assertNotIn('password', cached['user'])
+
+        res = self.client.patch(ME_URL, {'full_name': 'New Name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.full_name, 'New Name')
+        self.assertTrue(self.user.check_password('testpass123'))
+
+    def test_invalid_token_rejected(self):
+        """Test that an unknown token is rejected and not cached"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res.data['detail'], 'Invalid token.')
+
+    def test_deleted_token_rejected(self):
+        """Test that a cached token stops working once it is deleted (logout)"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user_rejected(self):
+        """Test that a cached token stops working once its user is deactivated"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res.data['detail'], 'User inactive or deleted.')
+
+    def test_user_changes_visible(self):
+        """Test that saving the user, e.g. a password change, refreshes the cached user"""
+        self.client.get(ME_URL)
+        self.user.set_password('newpass123')
+        self.user.full_name = 'New Name'
+        self.user.save()
+
+        # token joined with its user, read again
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['full_name'], 'New Name')
+
+    def test_deleted_user_rejected(self):
+        """Test that the token of a deleted user stops working"""
+        self.client.get(ME_URL)
+
+        res = self.client.delete(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_session_authentication_kept(self):
+        """Test that the default session authentication still works next to tokens"""
+        client = APIClient()
+        self.assertEqual(client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        client.force_login(self.user)
+        res = client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -0,0 +1,115 @@
+"""
+Tests for the favorite cryptocurrency API.
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import FavoriteUserCryptocurrency
+from user.favorites import _version_key
+
+
+FAVORITES_URL = reverse('user:me-favorite-cryptocurrency')
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+class FavoriteUserCryptocurrencyApiTests(TestCase):
+    """Test updating favorite cryptocurrencies of the authenticated user"""
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@example.com',
+            password='testing123',
+            full_name='Test User',
+            nick_name='Test',
+            date_of_birth='1990-01-01',
+            pesel='90010100000',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+
+    def favorite_symbols(self):
+        return set(FavoriteUserCryptocurrency.objects.filter(user=self.user)
+                   .values_list('favorite_crypto_symbol', flat=True))
+
+    def test_put_applies_difference(self):
+        """Test that only removed and added symbols are written"""
+        for symbol in ('BTC', 'ETH', 'DOGE'):
+            FavoriteUserCryptocurrency.objects.create(user=self.user, favorite_crypto_symbol=symbol)
+        kept = FavoriteUserCryptocurrency.objects.get(user=self.user, favorite_crypto_symbol='BTC')
+
+        # savepoint, select existing, delete removed, insert added, release
+        with self.assertNumQueries(5):
+            res = self.client.put(FAVORITES_URL, {'favorite_crypto_symbol': ['BTC', 'SOL', 'ADA']}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['data'], [
+            {'favorite_crypto_symbol': 'BTC'},
+            {'favorite_crypto_symbol': 'SOL'},
+            {'favorite_crypto_symbol': 'ADA'},
+        ])
+        self.assertEqual(self.favorite_symbols(), {'BTC', 'SOL', 'ADA'})
+        self.assertTrue(FavoriteUserCryptocurrency.objects.filter(pk=kept.pk).exists())
+
+    def test_get_served_from_cache_until_put(self):
+        """Test that favorites are cached and a put makes the cache stale"""
+        FavoriteUserCryptocurrency.objects.create(user=self.user, favorite_crypto_symbol='BTC')
+        self.client.get(FAVORITES_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(FAVORITES_URL)
+        self.assertEqual(res.data, {'favorite_crypto_symbol': ['BTC']})
+
+        self.client.put(FAVORITES_URL, {'favorite_crypto_symbol': ['ETH']}, format='json')
+
+        res = self.client.get(FAVORITES_URL)
+        self.assertEqual(res.data, {'favorite_crypto_symbol': ['ETH']})
+
+    def test_evicted_version_not_reused(self):
+        """Test that favorites cached under a version whose key was evicted are not served again"""
+        FavoriteUserCryptocurrency.objects.create(user=self.user, favorite_crypto_symbol='BTC')
+        self.client.get(FAVORITES_URL)
+        cache.delete(_version_key(self.user))
+
+        self.client.put(FAVORITES_URL, {'favorite_crypto_symbol': ['ETH']}, format='json')
+        res = self.client.get(FAVORITES_URL)
+
+        self.assertEqual(res.data, {'favorite_crypto_symbol': ['ETH']})
+
+    def test_put_response_in_stored_order(self):
+        """Test that the put response lists the favorites in the order the next get returns them"""
+        for symbol in ('BTC', 'ETH'):
+            FavoriteUserCryptocurrency.objects.create(user=self.user, favorite_crypto_symbol=symbol)
+
+        res = self.client.put(FAVORITES_URL, {'favorite_crypto_symbol': ['ETH', 'SOL', 'BTC']}, format='json')
+
+        symbols = [item['favorite_crypto_symbol'] for item in res.data['data']]
+        self.assertEqual(symbols, ['BTC', 'ETH', 'SOL'])
+        self.assertEqual(self.client.get(FAVORITES_URL).data, {'favorite_crypto_symbol': symbols})
+
+    def test_put_empty_list_removes_all(self):
+        """Test that an empty list clears the favorites"""
+        FavoriteUserCryptocurrency.objects.create(user=self.user, favorite_crypto_symbol='BTC')
+
+        res = self.client.put(FAVORITES_URL, {'favorite_crypto_symbol': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.favorite_symbols(), set())
+
+    def test_put_invalid_symbol_keeps_favorites(self):
+        """Test that an invalid symbol is rejected without changing favorites"""
+        FavoriteUserCryptocurrency.objects.create(user=self.user, favorite_crypto_symbol='BTC')
+
+        res = self.client.put(FAVORITES_URL, {'favorite_crypto_symbol': ['ETH', 'VERYLONGSYMBOL']}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.favorite_symbols(), {'BTC'})
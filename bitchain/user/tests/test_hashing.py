@@ -0,0 +1,152 @@
+"""
+Tests for password hashing in the bounded executor.
+"""
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.hashing import (
+    BoundedHashingExecutor,
+    PasswordHashingBusy,
+    PasswordHashingUnavailable,
+    verify_password,
+)
+
+
+TOKEN_URL = reverse('user:token')
+CHECK_PASSWORD_URL = reverse('user:me-check-password')
+
+HASHERS = [
+    'user.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+class BoundedHashingExecutorTests(TestCase):
+    """Test back-pressure of the hashing executor"""
+
+    def test_full_queue_rejected(self):
+        """Test that calls beyond workers and queue are rejected at once"""
+        executor = BoundedHashingExecutor(workers=1, max_queue=0, timeout=5)
+        self.addCleanup(executor.shutdown)
+        release = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+            return 'done'
+
+        caller = threading.Thread(target=executor.run, args=(block,))
+        caller.start()
+        started.wait(5)
+
+        with self.assertRaises(PasswordHashingBusy):
+            executor.run(len, 'abc')
+
+        release.set()
+        caller.join()
+        self.assertEqual(executor.run(len, 'abc'), 3)
+
+    def test_timeout(self):
+        """Test that a call not finished in time raises PasswordHashingUnavailable"""
+        executor = BoundedHashingExecutor(workers=1, max_queue=0, timeout=0.01)
+        self.addCleanup(executor.shutdown)
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        with self.assertRaises(PasswordHashingUnavailable):
+            executor.run(release.wait, 5)
+
+
+@override_settings(PASSWORD_HASHERS=HASHERS, PASSWORD_PBKDF2_ITERATIONS=1000)
+class PasswordRehashTests(TestCase):
+    """Test checking and upgrading password hashes"""
+
+    def test_verify_password(self):
+        """Test that outdated hashes are reported for rehashing"""
+        current = make_password('testing123')
+        self.assertEqual(verify_password('testing123', current), (True, None))
+        self.assertEqual(verify_password('wrong', current), (False, None))
+
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            matches, new_encoded = verify_password('testing123', current)
+        self.assertTrue(matches)
+        self.assertTrue(new_encoded.startswith('pbkdf2_sha256$2000$'))
+
+    def test_login_rehashes_password(self):
+        """Test that logging in upgrades a hash of another hasher"""
+        user = create_user(email='test@example.com', password='testing123', full_name='Test User',
+                           nick_name='Test', date_of_birth='1990-01-01', pesel='90010100000')
+        user.password = make_password('testing123', hasher='md5')
+        user.save()
+
+        res = APIClient().post(TOKEN_URL, {'email': 'test@example.com', 'password': 'testing123'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_check_password_endpoint(self):
+        """Test that the password check runs in the executor"""
+        user = create_user(email='test@example.com', password='testing123', full_name='Test User',
+                           nick_name='Test', date_of_birth='1990-01-01', pesel='90010100000')
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        res = client.post(CHECK_PASSWORD_URL, {'password': 'testing123'})
+        self.assertEqual(res.data, {'password_maches': True})
+
+        res = client.post(CHECK_PASSWORD_URL, {'password': 'wrong'})
+        self.assertEqual(res.data, {'password_maches': False})
+
+
+class PasswordHashingOverloadTests(TestCase):
+    """Test responses when the executor is saturated"""
+
+    def setUp(self):
+        create_user(email='test@example.com', password='testing123', full_name='Test User',
+                    nick_name='Test', date_of_birth='1990-01-01', pesel='90010100000')
+        self.client = APIClient()
+
+    @patch('user.hashing.BoundedHashingExecutor.run', side_effect=PasswordHashingBusy)
+    def test_login_busy(self, patched_run):
+        """Test that a full queue responds with 429 and Retry-After"""
+        res = self.client.post(TOKEN_URL, {'email': 'test@example.com', 'password': 'testing123'})
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '1')
+
+    @patch('user.hashing.BoundedHashingExecutor.run', side_effect=PasswordHashingUnavailable)
+    def test_login_timeout(self, patched_run):
+        """Test that a check timing out responds with 503"""
+        res = self.client.post(TOKEN_URL, {'email': 'test@example.com', 'password': 'testing123'})
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class BenchmarkCommandTests(TestCase):
+    """Test the password hashing benchmark command"""
+
+    def test_benchmark_reports_throughput(self):
+        """Test that a throughput line is printed per worker count"""
+        out = StringIO()
+        call_command('benchmark_password_hashing', '--checks', '10', '--workers', '1,2', stdout=out)
+
+        self.assertIn('thread x1:', out.getvalue())
+        self.assertIn('thread x2:', out.getvalue())
+        self.assertIn('checks/s per core', out.getvalue())
@@ -0,0 +1,289 @@
+"""
+Tests for the profile image API and its thumbnails.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import get_upload_path, user_upload_dir
+from user.images import (
+    delete_unreferenced_files, generate_image_variants, make_variants, unreferenced_files, user_files,
+)
+
+
+IMAGE_URL = reverse('user:me-image')
+ME_URL = reverse('user:me')
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+def make_photo(width=1200, height=900, orientation=None, left=(255, 0, 0)):
+    """Return the bytes of a JPEG photo, red on the left and blue on the right, optionally with an EXIF orientation"""
+    image = Image.new('RGB', (width, height), left)
+    image.paste((0, 0, 255), (width // 2, 0, width, height))
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'  # camera make
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+class UserImageApiTests(TestCase):
+    """Test uploading profile images"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root, USER_IMAGE_VARIANT_SIZES=(32, 64, 256))
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass123',
+            full_name='Test User',
+            nick_name='Test',
+            date_of_birth='1990-01-01',
+            pesel='90010100000',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(
+                IMAGE_URL, {'image': SimpleUploadedFile('photo.jpg', data, content_type='image/jpeg')},
+                format='multipart',
+            )
+
+    def test_upload_generates_variants(self):
+        """Test that an upload is resized into WebP and JPEG thumbnails of every size"""
+        res = self.upload(make_photo())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(set(self.user.image_variants), {'webp', 'jpeg'})
+        for extension, image_format in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+            self.assertEqual(set(self.user.image_variants[extension]), {'32', '64', '256'})
+            for size, name in self.user.image_variants[extension].items():
+                with Image.open(os.path.join(self.media_root, name)) as variant:
+                    self.assertEqual(variant.format, image_format)
+                    self.assertEqual(variant.size, (int(size), int(size)))
+
+    def test_variants_have_no_exif_and_are_upright(self):
+        """Test that thumbnails are rotated by the EXIF orientation and keep no EXIF data"""
+        # orientation 6: the camera was rotated, the photo is shown rotated by 90 degrees
+        self.upload(make_photo(width=1200, height=600, orientation=6))
+
+        self.user.refresh_from_db()
+        with Image.open(os.path.join(self.media_root, self.user.image_variants['jpeg']['256'])) as variant:
+            self.assertEqual(len(variant.getexif()), 0)
+            self.assertNotIn('exif', variant.info)
+            # rotated clockwise, the left (red) half of the photo is on top
+            red, _, blue = variant.convert('RGB').getpixel((128, 10))
+            self.assertGreater(red, blue)
+            red, _, blue = variant.convert('RGB').getpixel((128, 245))
+            self.assertLess(red, blue)
+
+    def test_variant_names_are_content_hashes(self):
+        """Test that a variant is named after the hash of its content"""
+        self.upload(make_photo())
+
+        self.user.refresh_from_db()
+        name = self.user.image_variants['webp']['64']
+        with open(os.path.join(self.media_root, name), 'rb') as file:
+            digest = hashlib.sha256(file.read()).hexdigest()[:32]
+        self.assertEqual(os.path.basename(name), f'{self.user.pk}-{digest}-64.webp')
+        self.assertEqual(os.path.dirname(name), user_upload_dir(self.user.pk))
+
+    def test_variant_urls_in_response(self):
+        """Test that the image endpoint returns the URLs of the thumbnails"""
+        self.upload(make_photo())
+        self.user.refresh_from_db()
+        self.client.force_authenticate(user=self.user)
+
+        res = self.client.get(IMAGE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data['image_variants']['webp']['32'].endswith('-32.webp'))
+        self.assertIn(f'/{user_upload_dir(self.user.pk)}/', res.data['image_variants']['jpeg']['256'])
+
+    def test_replaced_image_not_overwritten(self):
+        """Test that thumbnails of an image replaced while they were generated are not recorded"""
+        self.upload(make_photo())
+        self.user.refresh_from_db()
+        get_user_model().objects.filter(pk=self.user.pk).update(image_variants={})
+        stored = self.stored_files()
+
+        def replace_image(user_id, file, sizes):
+            get_user_model().objects.filter(pk=self.user.pk).update(image='uploads/user/newer.jpg')
+            return make_variants(user_id, file, sizes)
+
+        with patch('user.images.make_variants', side_effect=replace_image):
+            self.assertIsNone(generate_image_variants(self.user.pk))
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.image_variants, {})
+        # the thumbnails written for the replaced image are not left behind
+        self.assertEqual(self.stored_files(), stored)
+
+    def test_reupload_survives_pending_deletion(self):
+        """Test that thumbnails of a re-uploaded image are not removed by the deletion of the earlier files"""
+        self.upload(make_photo())
+        self.user.refresh_from_db()
+        previous = user_files(self.user)
+        # the same photo uploaded again, the earlier files are found unreferenced before the new ones are recorded
+        get_user_model().objects.filter(pk=self.user.pk).update(image_variants={})
+        pending_deletion = unreferenced_files(previous)
+
+        generate_image_variants(self.user.pk)
+        for name in pending_deletion:
+            default_storage.delete(name)
+
+        self.user.refresh_from_db()
+        self.assertEqual(len(self.user.image_variants['webp']), 3)
+        for name in user_files(self.user):
+            self.assertTrue(default_storage.exists(name))
+
+    def stored_files(self, user_id=None):
+        directory = user_upload_dir(user_id or self.user.pk)
+        return sorted(os.path.join(directory, name) for name in os.listdir(os.path.join(self.media_root, directory)))
+
+    def test_upload_stored_in_user_directory(self):
+        """Test that the upload is stored in the hash prefix directory of the user"""
+        self.upload(make_photo())
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.image.name, os.path.join(user_upload_dir(self.user.pk), f'{self.user.pk}.jpg'))
+        self.assertEqual(len(self.stored_files()), 7)
+
+    def test_replaced_files_deleted_after_commit(self):
+        """Test that a new upload has the files of the previous image deleted once it commits"""
+        self.upload(make_photo())
+        self.user.refresh_from_db()
+        previous = user_files(self.user)
+
+        self.upload(make_photo(left=(0, 255, 0)))
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.stored_files(), sorted(user_files(self.user)))
+        self.assertFalse(set(previous) & set(self.stored_files()))
+
+    def test_delete_image_removes_files(self):
+        """Test that deleting the image resets the avatar and has its files deleted"""
+        self.upload(make_photo())
+        self.user.refresh_from_db()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            res = self.client.delete(IMAGE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.image.name, settings.DEFAULT_AVATAR_PATH)
+        self.assertEqual(self.user.image_variants, {})
+        self.assertEqual(len(self.stored_files()), 7)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.stored_files(), [])
+
+    def test_delete_user_removes_files(self):
+        """Test that deleting the user has its image files deleted"""
+        self.upload(make_photo())
+        self.user.refresh_from_db()
+        self.client.force_authenticate(user=self.user)
+        user_id = self.user.pk
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.stored_files(user_id), [])
+
+    def test_referenced_files_not_deleted(self):
+        """Test that files referred to again by the time the deletion runs are kept"""
+        self.upload(make_photo())
+        self.user.refresh_from_db()
+
+        self.assertEqual(delete_unreferenced_files(user_files(self.user) + ['uploads/user/unknown.jpg']), 0)
+        self.assertEqual(len(self.stored_files()), 7)
+
+
+class SweepUserFilesCommandTests(TestCase):
+    """Test the orphan user file sweeper"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass123',
+            full_name='Test User',
+            nick_name='Test',
+            date_of_birth='1990-01-01',
+            pesel='90010100000',
+        )
+        self.image = default_storage.save(get_upload_path(self.user, 'photo.jpg'), ContentFile(make_photo()))
+        get_user_model().objects.filter(pk=self.user.pk).update(image=self.image)
+
+    def store(self, name, age_hours=48):
+        name = default_storage.save(name, ContentFile(b'data'))
+        modified = time.time() - age_hours * 60 * 60
+        os.utime(os.path.join(self.media_root, name), (modified, modified))
+        return name
+
+    def test_sweep_deletes_old_orphans_only(self):
+        """Test that only old files of users not referring to them are deleted"""
+        orphan = self.store(os.path.join(user_upload_dir(self.user.pk), f'{self.user.pk}-old-32.webp'))
+        recent = self.store(os.path.join(user_upload_dir(self.user.pk), f'{self.user.pk}-new-32.webp'), age_hours=1)
+        deleted_user = uuid.uuid4()
+        removed = self.store(os.path.join(user_upload_dir(deleted_user), f'{deleted_user}.jpg'))
+        default_avatar = self.store(settings.DEFAULT_AVATAR_PATH)
+        os.utime(os.path.join(self.media_root, self.image), (0, 0))
+        out = StringIO()
+
+        call_command('sweep_user_files', stdout=out)
+
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(default_storage.exists(removed))
+        self.assertTrue(default_storage.exists(recent))
+        self.assertTrue(default_storage.exists(self.image))
+        self.assertTrue(default_storage.exists(default_avatar))
+        self.assertIn('2 orphans deleted', out.getvalue())
+
+    def test_sweep_dry_run(self):
+        """Test that a dry run lists the orphans without deleting them"""
+        orphan = self.store(os.path.join(user_upload_dir(self.user.pk), f'{self.user.pk}-old-32.webp'))
+        out = StringIO()
+
+        call_command('sweep_user_files', dry_run=True, stdout=out)
+
+        self.assertTrue(default_storage.exists(orphan))
+        self.assertIn(f'Orphan {orphan}', out.getvalue())
@@ -0,0 +1,114 @@
+"""
+Tests for the portfolio valuation of users.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import UserFundWallet, UserFundWalletCryptocurrency, UserWalletOverview
+from prices.cache import local_prices
+from prices.models import CryptoPrice
+from user.portfolio import recompute_portfolios
+from user.wallets import change_crypto_balance
+
+
+PORTFOLIO_URL = reverse('user:me-portfolio')
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+class PortfolioTests(TestCase):
+    """Test keeping and serving the portfolio summary"""
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@example.com',
+            password='testing123',
+            full_name='Test User',
+            nick_name='Test',
+            date_of_birth='1990-01-01',
+            pesel='90010100000',
+        )
+        self.wallet = UserFundWallet.objects.get(fund_wallet__user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        local_prices.clear()
+
+        CryptoPrice.objects.create(symbol='BTC', price_usd=100, price_usd_24h=80)
+        CryptoPrice.objects.create(symbol='ETH', price_usd=10)
+
+    def overview(self):
+        return UserWalletOverview.objects.get(user=self.user)
+
+    def test_balance_change_updates_portfolio(self):
+        """Test that each balance change updates its symbol and the totals"""
+        change_crypto_balance(self.wallet.pk, 'BTC', Decimal('2'))
+        change_crypto_balance(self.wallet.pk, 'ETH', Decimal('3'))
+        change_crypto_balance(self.wallet.pk, 'BTC', Decimal('-0.5'))
+
+        overview = self.overview()
+        self.assertEqual(overview.total_value_usd, Decimal('180.00'))
+        self.assertEqual(overview.change_24h_usd, Decimal('30.00'))
+        self.assertEqual(overview.breakdown['BTC']['value_usd'], '150.00')
+        self.assertEqual(overview.breakdown['ETH']['change_24h_usd'], '0.00')
+        self.assertIsNotNone(overview.valued_at)
+
+        change_crypto_balance(self.wallet.pk, 'ETH', Decimal('-3'))
+
+        overview = self.overview()
+        self.assertEqual(overview.total_value_usd, Decimal('150.00'))
+        self.assertNotIn('ETH', overview.breakdown)
+
+    def test_recompute_revalues_with_current_prices(self):
+        """Test that the bulk recompute applies new prices and skips unchanged rows"""
+        change_crypto_balance(self.wallet.pk, 'BTC', Decimal('2'))
+        other = create_user(
+            email='other@example.com',
+            password='testing123',
+            full_name='Other User',
+            nick_name='Other',
+            date_of_birth='1990-01-01',
+            pesel='90010100001',
+        )
+        UserFundWalletCryptocurrency.objects.create(
+            wallet_fund_id=UserFundWallet.objects.get(fund_wallet__user=other),
+            cryptocurrency_symbol='ETH', cryptocurrency_amount=5,
+        )
+        CryptoPrice.objects.filter(symbol='BTC').update(price_usd=120)
+
+        metrics = recompute_portfolios(batch_size=1)
+
+        self.assertEqual(metrics, {'processed': 2, 'updated': 2, 'prices': 2})
+        self.assertEqual(self.overview().total_value_usd, Decimal('240.00'))
+        self.assertEqual(self.overview().change_24h_usd, Decimal('80.00'))
+        self.assertEqual(UserWalletOverview.objects.get(user=other).total_value_usd, Decimal('50.00'))
+
+        self.assertEqual(recompute_portfolios()['updated'], 0)
+
+    def test_portfolio_endpoint_cached(self):
+        """Test that the summary is served from cache until the balance changes"""
+        change_crypto_balance(self.wallet.pk, 'BTC', Decimal('1'))
+
+        res = self.client.get(PORTFOLIO_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['total_value_usd'], '100.00')
+        self.assertEqual(res.data['breakdown']['BTC']['amount'], '1')
+
+        with self.assertNumQueries(0):
+            self.client.get(PORTFOLIO_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            change_crypto_balance(self.wallet.pk, 'BTC', Decimal('1'))
+
+        res = self.client.get(PORTFOLIO_URL)
+        self.assertEqual(res.data['total_value_usd'], '200.00')
@@ -0,0 +1,205 @@
+"""
+Tests for bulk user provisioning.
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import UserFundWallet, UserWalletOverview
+from user.provisioning import bulk_create_users, read_user_rows
+from user.tasks import import_users
+
+
+BULK_CREATE_URL = reverse('user:bulk-create')
+
+CSV_HEADER = 'email,password,full_name,nick_name,date_of_birth,pesel\n'
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+def user_row(number):
+    """Helper function returning a valid row of the numbered user"""
+    return {
+        'email': f'user{number}@example.com',
+        'password': 'testing123',
+        'full_name': f'User {number}',
+        'nick_name': f'user{number}',
+        'date_of_birth': '1990-01-01',
+        'pesel': f'{90010100000 + number}',
+    }
+
+
+def csv_content(rows):
+    return CSV_HEADER + ''.join(','.join(row.values()) + '\n' for row in rows)
+
+
+class BulkCreateUsersTests(TestCase):
+    """Test creating users in chunks"""
+
+    def test_users_created_with_wallets(self):
+        """Test that users, overviews and fund wallets are created and passwords hashed"""
+        rows = [user_row(number) for number in range(5)]
+
+        report = bulk_create_users(read_user_rows(StringIO(csv_content(rows)), 'csv'), chunk_size=2, workers=1)
+
+        self.assertEqual(report['created'], 5)
+        self.assertEqual(report['failed'], [])
+        user = get_user_model().objects.get(email='user3@example.com')
+        self.assertTrue(user.check_password('testing123'))
+        self.assertEqual(UserWalletOverview.objects.count(), 5)
+        wallet = UserFundWallet.objects.get(fund_wallet__user=user)
+        self.assertEqual(wallet.wallet_type, 'fund')
+
+    def test_chunk_queries(self):
+        """Test that a chunk costs a fixed number of queries"""
+        rows = [(line, user_row(line)) for line in range(50)]
+
+        # email check, nick name check, savepoint, users, overviews, base wallets, fund wallets, release
+        with self.assertNumQueries(8):
+            report = bulk_create_users(rows, workers=1)
+        self.assertEqual(report['created'], 50)
+
+    def test_passwords_hashed_in_processes(self):
+        """Test that passwords hashed by worker processes are valid"""
+        rows = [(line, user_row(line)) for line in range(100)]
+
+        report = bulk_create_users(rows, workers=2)
+
+        self.assertEqual(report['created'], 100)
+        self.assertTrue(get_user_model().objects.get(email='user99@example.com').check_password('testing123'))
+
+    def test_invalid_and_existing_rows_reported(self):
+        """Test that invalid, duplicate and existing users are skipped with their line numbers"""
+        create_user(**user_row(0))
+        invalid = dict(user_row(2), pesel='123')
+        lines = [json.dumps(row) for row in (user_row(0), user_row(1), invalid, user_row(1))] + ['{not json']
+
+        report = bulk_create_users(read_user_rows(StringIO('\n'.join(lines)), 'ndjson'), workers=1)
+
+        self.assertEqual(report['created'], 1)
+        self.assertEqual({failure['line']: list(failure['errors']) for failure in report['failed']}, {
+            1: ['email', 'nick_name'],
+            3: ['pesel'],
+            4: ['email', 'nick_name'],
+            5: ['row'],
+        })
+
+    def test_email_format_and_lengths_checked(self):
+        """Test that invalid emails and values longer than the model fields are reported per line"""
+        rows = [
+            (1, dict(user_row(1), email='not-an-email')),
+            (2, dict(user_row(2), email=f"{'a' * 250}@example.com")),
+            (3, dict(user_row(3), full_name='x' * 256, nick_name='y' * 256)),
+            (4, user_row(4)),
+        ]
+
+        report = bulk_create_users(rows, workers=1)
+
+        self.assertEqual(report['created'], 1)
+        self.assertEqual({failure['line']: failure['errors'] for failure in report['failed']}, {
+            1: {'email': ['Enter a valid email address.']},
+            2: {'email': ['Ensure this field has no more than 255 characters.']},
+            3: {'full_name': ['Ensure this field has no more than 255 characters.'],
+                'nick_name': ['Ensure this field has no more than 255 characters.']},
+        })
+
+
+class BulkCreateUsersCommandTests(TestCase):
+    """Test the bulk_create_users command"""
+
+    def test_command_reads_file(self):
+        """Test that the command creates users from a file and reports throughput"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as source:
+            source.write(csv_content([user_row(1), user_row(2)]))
+        self.addCleanup(os.remove, source.name)
+
+        out = StringIO()
+        call_command('bulk_create_users', source.name, '--workers', '1', stdout=out)
+
+        self.assertIn('2 users created, 0 rows skipped', out.getvalue())
+        self.assertEqual(get_user_model().objects.count(), 2)
+
+
+class BulkCreateUsersApiTests(TestCase):
+    """Test the admin bulk create endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(**user_row(100))
+
+    def upload(self, name, content):
+        return self.client.post(
+            BULK_CREATE_URL, {'file': SimpleUploadedFile(name, content.encode())}, format='multipart',
+        )
+
+    def test_admin_uploads_csv(self):
+        """Test that an upload is imported by a worker and its report served by the job url"""
+        self.client.force_authenticate(user=self.admin)
+
+        with patch('user.tasks.import_users.delay') as delay:
+            res = self.upload('users.csv', csv_content([user_row(1), user_row(2)]))
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['url'], reverse('user:bulk-create-job', args=[res.data['job_id']]))
+        self.assertEqual(self.client.get(res.data['url']).data, {'status': 'pending'})
+        self.assertFalse(get_user_model().objects.filter(email='user2@example.com').exists())
+
+        # the rows as the worker receives them from the broker
+        job_id, rows = json.loads(json.dumps(delay.call_args.args))
+        import_users(job_id, rows)
+
+        job = self.client.get(res.data['url']).data
+        self.assertEqual((job['status'], job['created'], job['failed']), ('done', 2, []))
+        self.assertTrue(get_user_model().objects.filter(email='user2@example.com').exists())
+
+    def test_unknown_job(self):
+        """Test that unknown jobs are not found"""
+        self.client.force_authenticate(user=self.admin)
+
+        res = self.client.get(reverse('user:bulk-create-job', args=['unknown']))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(USER_BULK_CREATE_API_LIMIT=2)
+    def test_row_limit(self):
+        """Test that files over the row limit are rejected without creating users"""
+        self.client.force_authenticate(user=self.admin)
+
+        res = self.upload('users.csv', csv_content([user_row(1), user_row(2), user_row(3)]))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('bulk_create_users', res.data['error'])
+        self.assertEqual(get_user_model().objects.count(), 1)
+
+    def test_unknown_format_rejected(self):
+        """Test that files of other formats are rejected"""
+        self.client.force_authenticate(user=self.admin)
+
+        res = self.upload('users.xml', '<users/>')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_regular_user_forbidden(self):
+        """Test that users who are not admins can not create users"""
+        self.client.force_authenticate(user=create_user(**user_row(1)))
+
+        res = self.upload('users.csv', csv_content([user_row(2)]))
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(get_user_model().objects.filter(email='user2@example.com').exists())
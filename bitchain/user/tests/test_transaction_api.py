@@ -0,0 +1,261 @@
+"""
+Tests for the user fund transaction API.
+"""
+import csv
+import json
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import UserFundTransaction, UserFundWallet
+from prices.cache import local_prices
+from prices.models import CryptoPrice
+
+
+TRANSACTION_LIST_URL = reverse('user:me-fund-transactions-list')
+TRANSACTION_BULK_URL = reverse('user:me-fund-transactions-bulk')
+
+
+def export_url(file_format):
+    """Return the transaction export URL for the format"""
+    return reverse('user:me-fund-transactions-export', args=[file_format])
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+class FundTransactionListApiTests(TestCase):
+    """Test paging and filtering the transaction history"""
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@example.com',
+            password='testing123',
+            full_name='Test User',
+            nick_name='Test',
+            date_of_birth='1990-01-01',
+            pesel='90010100000',
+        )
+        self.wallet = UserFundWallet.objects.get(fund_wallet__user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        local_prices.clear()
+
+        self.start = timezone.make_aware(datetime(2024, 1, 1, 12, 0))
+        for day in range(5):
+            transaction = UserFundTransaction.objects.create(
+                fund_wallet=self.wallet,
+                transaction_type='buy' if day % 2 else 'sell',
+                transaction_amount=day,
+                transaction_currency='BTC' if day < 3 else 'ETH',
+                transaction_price_usd='10.00',
+            )
+            UserFundTransaction.objects.filter(pk=transaction.pk).update(
+                transaction_date=self.start + timedelta(days=day),
+            )
+
+    def amounts(self, res):
+        return [item['transaction_amount'] for item in res.data['results']]
+
+    def test_pages_follow_cursor_newest_first(self):
+        """Test that pages are linked by cursors and do not overlap"""
+        res = self.client.get(TRANSACTION_LIST_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.amounts(res), [4, 3])
+
+        res = self.client.get(res.data['next'])
+        self.assertEqual(self.amounts(res), [2, 1])
+
+        res = self.client.get(res.data['next'])
+        self.assertEqual(self.amounts(res), [0])
+        self.assertIsNone(res.data['next'])
+
+    def test_filters(self):
+        """Test filtering by date range, type and currency"""
+        res = self.client.get(TRANSACTION_LIST_URL, {'date_from': '2024-01-02', 'date_to': '2024-01-04'})
+        self.assertEqual(self.amounts(res), [3, 2, 1])
+
+        res = self.client.get(TRANSACTION_LIST_URL, {'transaction_type': 'buy'})
+        self.assertEqual(self.amounts(res), [3, 1])
+
+        res = self.client.get(TRANSACTION_LIST_URL, {'transaction_currency': 'ETH'})
+        self.assertEqual(self.amounts(res), [4, 3])
+
+    def test_invalid_date_rejected(self):
+        """Test that an invalid date filter returns 400"""
+        res = self.client.get(TRANSACTION_LIST_URL, {'date_from': '2024-13-01'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FundTransactionBulkApiTests(TestCase):
+    """Test creating many transactions in one request"""
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@example.com',
+            password='testing123',
+            full_name='Test User',
+            nick_name='Test',
+            date_of_birth='1990-01-01',
+            pesel='90010100000',
+        )
+        self.wallet = UserFundWallet.objects.get(fund_wallet__user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        local_prices.clear()
+
+    def payload(self, count):
+        return [
+            {
+                'transaction_type': 'buy',
+                'transaction_amount': i,
+                'transaction_price_usd': '10.50',
+                'transaction_currency': 'BTC',
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create_in_one_insert(self):
+        """Test that all transactions are saved with one insert"""
+        # price lookup, wallet lookup, savepoint, insert, release
+        with self.assertNumQueries(5):
+            res = self.client.post(TRANSACTION_BULK_URL, self.payload(20), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 20)
+        self.assertEqual([item['transaction_amount'] for item in res.data['results']], list(range(20)))
+        self.assertTrue(all(item['transaction_id'] for item in res.data['results']))
+        self.assertEqual(UserFundTransaction.objects.filter(fund_wallet=self.wallet).count(), 20)
+
+    def test_invalid_item_saves_nothing(self):
+        """Test that errors are reported per item and no transaction is saved"""
+        payload = self.payload(3)
+        payload[1]['transaction_amount'] = 'abc'
+
+        res = self.client.post(TRANSACTION_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['results'][0], {})
+        self.assertIn('transaction_amount', res.data['results'][1])
+        self.assertFalse(UserFundTransaction.objects.exists())
+
+    def test_price_checked_against_latest_price(self):
+        """Test that prices far from the latest known price are rejected"""
+        CryptoPrice.objects.create(symbol='BTC', price_usd=10)
+        payload = self.payload(3)
+        payload[2]['transaction_price_usd'] = '12.00'
+
+        res = self.client.post(TRANSACTION_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['results'][:2], [{}, {}])
+        self.assertIn('transaction_price_usd', res.data['results'][2])
+        self.assertFalse(UserFundTransaction.objects.exists())
+
+    def test_invalid_currencies_not_looked_up(self):
+        """Test that only currencies passing validation have their price loaded and cached"""
+        payload = self.payload(3)
+        payload[1]['transaction_currency'] = 'X' * 500
+        payload[2]['transaction_currency'] = ''
+
+        res = self.client.post(TRANSACTION_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(local_prices.get_many(['BTC', 'X' * 500, '']), {'BTC': (None, None)})
+        self.assertIsNone(cache.get(f"prices:latest:{'X' * 500}"))
+
+    @override_settings(FUND_TRANSACTION_BULK_LIMIT=2)
+    def test_bulk_limit(self):
+        """Test that requests over the limit are rejected"""
+        res = self.client.post(TRANSACTION_BULK_URL, self.payload(3), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(UserFundTransaction.objects.exists())
+
+
+class FundTransactionExportApiTests(TestCase):
+    """Test streaming the transaction history as a file"""
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@example.com',
+            password='testing123',
+            full_name='Test User',
+            nick_name='Test',
+            date_of_birth='1990-01-01',
+            pesel='90010100000',
+        )
+        self.wallet = UserFundWallet.objects.get(fund_wallet__user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        local_prices.clear()
+
+        self.start = timezone.make_aware(datetime(2024, 1, 1, 12, 0))
+        for day in range(3):
+            transaction = UserFundTransaction.objects.create(
+                fund_wallet=self.wallet,
+                transaction_type='buy',
+                transaction_amount=day,
+                transaction_currency='BTC' if day < 2 else 'ETH',
+                transaction_price_usd='10.50',
+            )
+            UserFundTransaction.objects.filter(pk=transaction.pk).update(
+                transaction_date=self.start + timedelta(days=day),
+            )
+
+    def content(self, res):
+        return b''.join(res.streaming_content).decode()
+
+    @override_settings(FUND_TRANSACTION_EXPORT_CHUNK_SIZE=2)
+    def test_export_csv(self):
+        """Test that the history is streamed as CSV, oldest first"""
+        res = self.client.get(export_url('csv'), HTTP_ACCEPT='text/csv')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        self.assertIn('transactions.csv', res['Content-Disposition'])
+
+        rows = list(csv.reader(self.content(res).splitlines()))
+        self.assertEqual(rows[0][:3], ['transaction_id', 'transaction_type', 'transaction_amount'])
+        self.assertEqual([row[2] for row in rows[1:]], ['0', '1', '2'])
+        self.assertEqual(rows[1][3], '10.50')
+
+    def test_export_ndjson(self):
+        """Test that the history is streamed as one JSON object per line"""
+        res = self.client.get(export_url('ndjson'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+
+        items = [json.loads(line) for line in self.content(res).splitlines()]
+        self.assertEqual([item['transaction_amount'] for item in items], [0, 1, 2])
+        self.assertEqual(items[0]['transaction_price_usd'], '10.50')
+        self.assertEqual(items[0]['transaction_currency'], 'BTC')
+
+    def test_export_applies_filters(self):
+        """Test that the export accepts the list filters"""
+        res = self.client.get(export_url('ndjson'), {'transaction_currency': 'ETH'})
+
+        items = [json.loads(line) for line in self.content(res).splitlines()]
+        self.assertEqual([item['transaction_amount'] for item in items], [2])
+
+    def test_export_unknown_format(self):
+        """Test that an unsupported format returns 404"""
+        res = self.client.get(export_url('xml'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
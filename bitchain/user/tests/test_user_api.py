@@ -171,6 +171,19 @@ class PublicUserApiTests(TestCase):
         self.assertIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    def test_create_token_queries(self):
+        """Test that logging in does not write the user or its wallets"""
+        create_user(email='test@example.com', password='testing123', full_name='Test User', nick_name='Test',
+                    date_of_birth='1990-01-01', pesel='90010100000')
+        payload = {'email': 'test@example.com', 'password': 'testing123'}
+        self.client.post(TOKEN_URL, payload)
+
+        # user select, token select
+        with self.assertNumQueries(2):
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_bad_credentials(self):
         """Test that token is not created if invalid credentials are given"""
         create_user(email='test@example.com', password='testing123', full_name='Test User', nick_name='Test',
@@ -247,3 +260,11 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.date_of_birth.strftime('%Y-%m-%d'), payload['date_of_birth'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_user_profile_queries(self):
+        """Test that updating the profile only writes the user"""
+        # nick name uniqueness check, user update
+        with self.assertNumQueries(2):
+            res = self.client.patch(ME_URL, {'nick_name': 'New Nick', 'full_name': 'New Name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
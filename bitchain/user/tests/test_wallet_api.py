@@ -0,0 +1,189 @@
+"""
+Tests for the user fund wallet API.
+"""
+import threading
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import UserFundTransaction, UserFundWallet, UserFundWalletCryptocurrency
+from prices.cache import local_prices
+from user.wallets import InsufficientFundsError, change_crypto_balance, get_fund_wallet_id
+
+
+TRANSACTION_CREATE_URL = reverse('user:me-fund-transactions-create')
+TRANSACTION_LIST_URL = reverse('user:me-fund-transactions-list')
+CRYPTO_CHANGE_URL = reverse('user:me-fund-cryptocurrency-change')
+CRYPTO_LIST_URL = reverse('user:me-fund-cryptocurrency')
+
+TRANSACTION_PAYLOAD = {
+    'transaction_type': 'buy',
+    'transaction_amount': 2,
+    'transaction_price_usd': '100.00',
+    'transaction_currency': 'BTC',
+}
+
+
+def create_user(**params):
+    """Helper function to create a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+class FundWalletApiTests(TestCase):
+    """Test wallet and transaction endpoints of the authenticated user"""
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@example.com',
+            password='testing123',
+            full_name='Test User',
+            nick_name='Test',
+            date_of_birth='1990-01-01',
+            pesel='90010100000',
+        )
+        self.wallet = UserFundWallet.objects.get(fund_wallet__user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        local_prices.clear()
+
+    def test_wallet_id_resolved_with_one_query_then_cached(self):
+        """Test that the wallet is resolved by one join query and cached per user"""
+        with self.assertNumQueries(1):
+            self.assertEqual(get_fund_wallet_id(self.user), self.wallet.pk)
+            self.assertEqual(get_fund_wallet_id(self.user), self.wallet.pk)
+
+        other_instance = get_user_model().objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_fund_wallet_id(other_instance), self.wallet.pk)
+
+    def test_create_transaction_queries(self):
+        """Test that creating a transaction costs the price lookup, the wallet lookup and the insert"""
+        with self.assertNumQueries(3):
+            res = self.client.post(TRANSACTION_CREATE_URL, TRANSACTION_PAYLOAD)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(UserFundTransaction.objects.get().fund_wallet, self.wallet)
+
+    def test_list_transactions_queries(self):
+        """Test that listing transactions costs the wallet lookup and the select"""
+        UserFundTransaction.objects.create(fund_wallet=self.wallet, **TRANSACTION_PAYLOAD)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(TRANSACTION_LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_list_cryptocurrencies_queries(self):
+        """Test that listing wallet cryptocurrencies costs the wallet lookup and the select"""
+        UserFundWalletCryptocurrency.objects.create(
+            wallet_fund_id=self.wallet, cryptocurrency_symbol='BTC', cryptocurrency_amount=1,
+        )
+
+        with self.assertNumQueries(2):
+            res = self.client.get(CRYPTO_LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['cryptocurrency_symbol'], 'BTC')
+
+    def test_change_cryptocurrency_queries(self):
+        """Test that changing a balance does not look the wallet up twice"""
+        UserFundWalletCryptocurrency.objects.create(
+            wallet_fund_id=self.wallet, cryptocurrency_symbol='BTC', cryptocurrency_amount=1,
+        )
+
+        # wallet lookup, savepoint, conditional update, balance select,
+        # overview lock, price select, overview update, release
+        with self.assertNumQueries(8):
+            res = self.client.patch(CRYPTO_CHANGE_URL, {'cryptocurrency_symbol': 'BTC', 'cryptocurrency_amount': '0.5'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(res.data['cryptocurrency_amount']), Decimal('1.5'))
+        balance = UserFundWalletCryptocurrency.objects.get(wallet_fund_id=self.wallet)
+        self.assertEqual(balance.cryptocurrency_amount, Decimal('1.5'))
+
+    def test_change_creates_balance(self):
+        """Test that a deposit to a new symbol creates the balance"""
+        res = self.client.patch(CRYPTO_CHANGE_URL, {'cryptocurrency_symbol': 'ETH', 'cryptocurrency_amount': '2'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Decimal(res.data['cryptocurrency_amount']), Decimal('2'))
+
+    def test_withdraw_more_than_balance_fails(self):
+        """Test that a balance can not go below zero"""
+        UserFundWalletCryptocurrency.objects.create(
+            wallet_fund_id=self.wallet, cryptocurrency_symbol='BTC', cryptocurrency_amount=1,
+        )
+
+        for symbol in ('BTC', 'ETH'):
+            res = self.client.patch(CRYPTO_CHANGE_URL, {'cryptocurrency_symbol': symbol, 'cryptocurrency_amount': '-2'})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        balance = UserFundWalletCryptocurrency.objects.get(wallet_fund_id=self.wallet)
+        self.assertEqual(balance.cryptocurrency_amount, Decimal('1'))
+        self.assertFalse(UserFundWalletCryptocurrency.objects.filter(cryptocurrency_symbol='ETH').exists())
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentBalanceChangeTests(TransactionTestCase):
+    """Test balance changes from many threads against the test database"""
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@example.com',
+            password='testing123',
+            full_name='Test User',
+            nick_name='Test',
+            date_of_birth='1990-01-01',
+            pesel='90010100000',
+        )
+        self.wallet_id = UserFundWallet.objects.get(fund_wallet__user=self.user).pk
+        UserFundWalletCryptocurrency.objects.create(
+            wallet_fund_id_id=self.wallet_id, cryptocurrency_symbol='BTC', cryptocurrency_amount=10,
+        )
+
+    def run_concurrently(self, amount_change, count):
+        """Run count balance changes in parallel threads, return the number of successful ones"""
+        barrier = threading.Barrier(count)
+        results = []
+
+        def change():
+            try:
+                barrier.wait()
+                change_crypto_balance(self.wallet_id, 'BTC', Decimal(amount_change))
+                results.append(True)
+            except InsufficientFundsError:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=change) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results.count(True)
+
+    def test_concurrent_withdrawals_never_overdraw(self):
+        """Test that parallel withdrawals succeed only while there are funds"""
+        succeeded = self.run_concurrently('-1', 25)
+
+        balance = UserFundWalletCryptocurrency.objects.get(wallet_fund_id=self.wallet_id)
+        self.assertEqual(succeeded, 10)
+        self.assertEqual(balance.cryptocurrency_amount, Decimal('0'))
+
+    def test_concurrent_deposits_are_not_lost(self):
+        """Test that parallel deposits are all applied"""
+        succeeded = self.run_concurrently('0.5', 20)
+
+        balance = UserFundWalletCryptocurrency.objects.get(wallet_fund_id=self.wallet_id)
+        self.assertEqual(succeeded, 20)
+        self.assertEqual(balance.cryptocurrency_amount, Decimal('20'))
@@ -10,6 +10,8 @@ app_name = 'user'
 
 urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
+    path('bulk-create/', views.BulkCreateUserView.as_view(), name='bulk-create'),
+    path('bulk-create/<str:job_id>/', views.BulkCreateUserJobView.as_view(), name='bulk-create-job'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
     path('me/', views.ManageUserView.as_view(), name='me'),
     path('me/image/', views.UpdateUserImageView.as_view(), name='me-image'),
@@ -17,8 +19,11 @@ urlpatterns = [
     path('me/check-password/', views.CheckUserPasswordView.as_view(), name='me-check-password'),
     path('me/password_reset/', include('django_rest_passwordreset.urls', namespace='password_reset')),
     path('me/fund-tranasction/create', views.UserFundTransactionView.as_view(), name='me-fund-transactions-create'),
+    path('me/fund-transaction/bulk', views.UserFundTransactionBulkView.as_view(), name='me-fund-transactions-bulk'),
     path('me/fund-transaction/all', views.UserFundTranasctionsListView.as_view(), name='me-fund-transactions-list'),
-    path('me/fund/cryptocurrency/change', views.UserFundWalletCryptoChangeView.as_view(), name='me-fund-cryptocurrency'),
+    path('me/fund-transaction/export/<str:file_format>', views.UserFundTransactionExportView.as_view(), name='me-fund-transactions-export'),
+    path('me/fund/cryptocurrency/change', views.UserFundWalletCryptoChangeView.as_view(), name='me-fund-cryptocurrency-change'),
     path('me/fund/cryptocurrency/all', views.UserFundWalletCryptoListView.as_view(), name='me-fund-cryptocurrency'),
+    path('me/portfolio/', views.UserPortfolioView.as_view(), name='me-portfolio'),
     
 ]
@@ -1,32 +1,43 @@
 """
 Views for the user API.
 """
-import os.path
+import csv
+import io
+from itertools import islice
+from datetime import datetime, time
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import BaseContentNegotiation
 
 from rest_framework.authtoken.models import Token
 
-from django.contrib.auth.hashers import check_password
-
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from core.models import (
-    FavoriteUserCryptocurrency,
-    UserFundWallet,
     UserFundTransaction,
-    UserWalletOverview,
     UserFundWalletCryptocurrency,
-    
 )
 
+from user.pagination import FundTransactionCursorPagination
+from user.favorites import get_favorite_symbols, set_favorite_symbols
+from user.hashing import check_user_password
+from user.images import schedule_file_deletion, user_files
+from user.portfolio import get_portfolio
+from user.provisioning import FILE_FORMATS, get_import_job, read_user_rows, start_import_job
+from user.wallets import get_fund_wallet_id
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
@@ -34,9 +45,44 @@ from user.serializers import (
     FavoriteUserCryptocurrencySerializer,
     UserFundTransactionSerializer,
     UserFundWalletCryptoSerializer,
+    UserPortfolioSerializer,
 )
 
 
+def parse_date_param(params, name, end_of_day=False):
+    """Read an ISO date or datetime query parameter, a plain date covers the whole day."""
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+        parsed = None if day else parse_datetime(value)
+    except ValueError:
+        day = parsed = None
+    if day is not None:
+        parsed = datetime.combine(day, time.max if end_of_day else time.min)
+    elif parsed is None:
+        raise ValidationError({name: 'Enter a valid ISO date or datetime.'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def filter_fund_transactions(queryset, params):
+    """Apply the date range, type and currency filters of the transaction list to the queryset."""
+    date_from = parse_date_param(params, 'date_from')
+    date_to = parse_date_param(params, 'date_to', end_of_day=True)
+    if date_from:
+        queryset = queryset.filter(transaction_date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(transaction_date__lte=date_to)
+    if params.get('transaction_type'):
+        queryset = queryset.filter(transaction_type=params['transaction_type'])
+    if params.get('transaction_currency'):
+        queryset = queryset.filter(transaction_currency=params['transaction_currency'])
+    return queryset
+
+
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system."""
     serializer_class = UserSerializer
@@ -58,6 +104,14 @@ class CreateTokenView(ObtainAuthToken):
                 "non_field_errors": ["Unable to authenticate with provided credentials."]
             },
             "description": "Authentication failed. Returns an error message."
+        },
+        429: {
+            "example": {"detail": "Too many password checks in progress."},
+            "description": "Too many logins in progress, retry after the Retry-After header."
+        },
+        503: {
+            "example": {"detail": "Password check timed out, try again later."},
+            "description": "The password could not be checked in time."
         }
     },
     )
@@ -70,19 +124,100 @@ class CreateTokenView(ObtainAuthToken):
     
 
 
+class BulkCreateUserView(APIView):
+    """Queue the creation of many users with their wallets from an uploaded CSV or NDJSON file. Admins only."""
+    permission_classes = (permissions.IsAdminUser,)
+    parser_classes = (MultiPartParser,)
+
+    @extend_schema(
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {
+                    "file": {"type": "string", "format": "binary"},
+                    "file_format": {"type": "string", "enum": list(FILE_FORMATS)},
+                },
+            }
+        },
+        responses={
+            202: {"example": {"job_id": "3f2b8c1d9e0a4b6c8d7e5f4a3b2c1d0e", "status": "pending",
+                              "url": "/api/user/bulk-create/3f2b8c1d9e0a4b6c8d7e5f4a3b2c1d0e/"}},
+            400: {"example": {"error": "File not provided."}},
+        },
+        description="CSV files need a header row, NDJSON files hold one user object per line. Both use the fields "
+                    "email, password, full_name, nick_name, date_of_birth and pesel. The format is taken from "
+                    "file_format or the file extension. The users are created by a worker, the report is served by "
+                    "the url of the job. Invalid rows and existing users are skipped and reported. Files of more "
+                    "than USER_BULK_CREATE_API_LIMIT rows are rejected, they are imported with the "
+                    "bulk_create_users management command."
+    )
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'File not provided.'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('file_format') or upload.name.rsplit('.', 1)[-1].lower()
+        if file_format == 'jsonl':
+            file_format = 'ndjson'
+        if file_format not in FILE_FORMATS:
+            return Response({'error': 'File format must be csv or ndjson.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+        limit = settings.USER_BULK_CREATE_API_LIMIT
+        try:
+            # the rows are sent to the worker with the task, larger files go through the command
+            rows = list(islice(read_user_rows(stream, file_format), limit + 1))
+        except UnicodeDecodeError:
+            return Response({'error': 'File must be UTF-8 encoded.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > limit:
+            return Response(
+                {'error': f'Too many rows. Maximum is {limit}, use the bulk_create_users command for larger files.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        # hashing the passwords takes far longer than a request may, a worker creates the users
+        job_id = start_import_job(rows)
+        return Response(
+            {'job_id': job_id, 'status': 'pending', 'url': reverse('user:bulk-create-job', args=[job_id])},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class BulkCreateUserJobView(APIView):
+    """Status of a bulk user creation, with its report once done. Admins only."""
+    permission_classes = (permissions.IsAdminUser,)
+
+    @extend_schema(
+        responses={
+            200: {"example": {"status": "done", "created": 2,
+                              "failed": [{"line": 3, "errors": {"pesel": ["This field is required."]}}],
+                              "seconds": 0.41, "users_per_second": 4.9}},
+            404: {"example": {"error": "Job not found."}},
+        },
+        description="The status is pending, done or failed. Jobs are kept for USER_BULK_CREATE_JOB_TIMEOUT seconds."
+    )
+    def get(self, request, job_id):
+        job = get_import_job(job_id)
+        if job is None:
+            return Response({'error': 'Job not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(job, status=status.HTTP_200_OK)
+
+
 class ManageUserView(generics.RetrieveUpdateAPIView, generics.DestroyAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         """Retrieve and return authenticated user."""
         return self.request.user
+
+    def perform_destroy(self, instance):
+        """Delete the user, the image files of the user are removed by a worker."""
+        files = user_files(instance)
+        instance.delete()
+        schedule_file_deletion(files)
     
 
 class CheckUserPasswordView(APIView):
-    authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
     
     @extend_schema(
@@ -94,6 +229,8 @@ class CheckUserPasswordView(APIView):
         responses={
             200: {"example": {'password_matches': True}},
             400: {"example": {'error': 'Please provide the correct input data.'}},
+            429: {"example": {'detail': 'Too many password checks in progress.'}},
+            503: {"example": {'detail': 'Password check timed out, try again later.'}},
         },
         description="Check if the provided password matches the authenticated user's password."
     )
@@ -103,8 +240,7 @@ class CheckUserPasswordView(APIView):
         if not current_password:
             return Response({'error': 'Please provide the correct input data.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        user_password = request.user.password
-        password_matches = check_password(current_password, user_password)
+        password_matches = check_user_password(request.user, current_password)
         
         return Response({'password_maches': password_matches}, status=status.HTTP_200_OK)
         
@@ -112,7 +248,6 @@ class CheckUserPasswordView(APIView):
 class UpdateUserImageView(APIView):
     """Manage the authenticated user."""
     serializer_class = UserImageSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
     parser_classes = (FormParser, MultiPartParser,)
     @extend_schema(
@@ -134,14 +269,13 @@ class UpdateUserImageView(APIView):
     )
     def delete(self, request, *args, **kwargs):
         user = self.request.user
-        absolute_path = os.path.abspath(os.path.join('..', settings.MEDIA_ROOT, user.image.name))
-
-        file_exists = os.path.isfile(absolute_path)
-        if file_exists and user.image.name != settings.DEFAULT_AVATAR_PATH:
-            os.remove(absolute_path)  # Remove the custom image file
+        replaced_files = user_files(user)
+        if replaced_files:
             user.image.name = settings.DEFAULT_AVATAR_PATH
-            
+            user.image_variants = {}
+
         user.save()
+        schedule_file_deletion(replaced_files)  # the custom image files are removed by a worker
 
         return Response(status=status.HTTP_204_NO_CONTENT)
     @extend_schema(
@@ -159,7 +293,6 @@ class FavoriteUserCryptocurrencyView(APIView):
     """View for managing user's favorite cryptocurrencies."""
 
     serializer_class = FavoriteUserCryptocurrencySerializer
-    authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     @extend_schema(
@@ -168,9 +301,7 @@ class FavoriteUserCryptocurrencyView(APIView):
     )
     def get(self, request, *args, **kwargs):
         user = self.request.user
-        favorites = FavoriteUserCryptocurrency.objects.filter(user=user)
-        symbols = [favorite.favorite_crypto_symbol for favorite in favorites]
-        favorites = {"favorite_crypto_symbol": symbols}
+        favorites = {"favorite_crypto_symbol": get_favorite_symbols(user)}
         return Response(favorites, status=status.HTTP_200_OK)
     
     @extend_schema(
@@ -198,21 +329,25 @@ class FavoriteUserCryptocurrencyView(APIView):
         description="If action is 'good' or 'bad', increment the count for the specified symbol."
     )
     def put(self, request, *args, **kwargs):
-        try:
-            # Delete all FavoriteUserCryptocurrency objects for the current user
-            FavoriteUserCryptocurrency.objects.filter(user=request.user).delete()
-
-            # Retrieve the list of favorite cryptocurrencies from the request
-            favorite_crypto_list = request.data.get('favorite_crypto_symbol', [])
+        favorite_crypto_list = request.data.get('favorite_crypto_symbol', [])
+        if not isinstance(favorite_crypto_list, list):
+            favorite_crypto_list = [favorite_crypto_list]
 
-            # Add new favorite cryptocurrencies
-            for crypto_symbol in favorite_crypto_list:
-                FavoriteUserCryptocurrency.objects.create(user=request.user, favorite_crypto_symbol=crypto_symbol)
+        serializer = self.serializer_class(
+            data=[{'favorite_crypto_symbol': crypto_symbol} for crypto_symbol in favorite_crypto_list],
+            many=True,
+        )
+        if not serializer.is_valid():
+            return Response({'success': False, 'message': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
-            updated_favorites = list(FavoriteUserCryptocurrency.objects.filter(user=request.user))
-            serializer = self.serializer_class(updated_favorites, many=True)
+        try:
+            symbols = set_favorite_symbols(
+                request.user,
+                [item['favorite_crypto_symbol'] for item in serializer.validated_data],
+            )
+            data = [{'favorite_crypto_symbol': symbol} for symbol in symbols]
 
-            return Response({'success': True, 'message': 'Favorites updated successfully', 'data': serializer.data}, status=status.HTTP_200_OK)
+            return Response({'success': True, 'message': 'Favorites updated successfully', 'data': data}, status=status.HTTP_200_OK)
         
         except Exception as e:
             return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -223,7 +358,6 @@ class UserFundTransactionView(APIView):
     """Create a new user fund transaction in the system."""
     
     serializer_class = UserFundTransactionSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
 
@@ -238,42 +372,164 @@ class UserFundTransactionView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class UserFundTransactionBulkView(APIView):
+    """Create many user fund transactions in one request, e.g. for trade imports."""
+
+    serializer_class = UserFundTransactionSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @extend_schema(
+        request=UserFundTransactionSerializer(many=True),
+        responses={
+            201: {"example": {"created": 1, "results": [{
+                "transaction_id": "uuid", "transaction_type": "buy", "transaction_amount": 1,
+                "transaction_price_usd": "100.00", "transaction_currency": "BTC", "transaction_date": "datetime",
+            }]}},
+            400: {"example": {"created": 0, "results": [{}, {"transaction_amount": ["A valid integer is required."]}]}},
+        },
+        description="Validate a list of transactions and save all of them, or none when any item is invalid. "
+                    "Results are returned per item, in the order of the request."
+    )
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return Response({'error': 'Expected a list of transactions.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > settings.FUND_TRANSACTION_BULK_LIMIT:
+            return Response(
+                {'error': f'Too many transactions. Maximum is {settings.FUND_TRANSACTION_BULK_LIMIT}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = self.serializer_class(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response({'created': 0, 'results': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        transactions = serializer.save(user=request.user)
+        return Response({'created': len(transactions), 'results': serializer.data}, status=status.HTTP_201_CREATED)
+
+
+class Echo:
+    """File-like object that returns written values, lets csv.writer produce rows for streaming."""
+
+    def write(self, value):
+        return value
+
+
+class StreamingContentNegotiation(BaseContentNegotiation):
+    """Use the first renderer regardless of the Accept header, the view streams its own content type."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class UserFundTransactionExportView(APIView):
+    """Export the user's fund transactions as CSV or NDJSON.
+    Rows are streamed from a server-side cursor as tuples, so memory use does not depend on the history size.
+    Accepts the same filters as the transaction list.
+    """
+
+    permission_classes = (permissions.IsAuthenticated,)
+    content_negotiation_class = StreamingContentNegotiation
+
+    fields = (
+        'transaction_id',
+        'transaction_type',
+        'transaction_amount',
+        'transaction_price_usd',
+        'transaction_currency',
+        'transaction_date',
+    )
+    content_types = {
+        'csv': 'text/csv',
+        'ndjson': 'application/x-ndjson',
+    }
+
+    def get_rows(self, request):
+        queryset = UserFundTransaction.objects.filter(fund_wallet_id=get_fund_wallet_id(request.user))
+        queryset = filter_fund_transactions(queryset, request.query_params)
+        return (
+            queryset.order_by('transaction_date', 'transaction_id')
+            .values_list(*self.fields)
+            .iterator(chunk_size=settings.FUND_TRANSACTION_EXPORT_CHUNK_SIZE)
+        )
+
+    def stream_csv(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.fields)
+        for row in rows:
+            yield writer.writerow(row)
+
+    def stream_ndjson(self, rows):
+        encoder = DjangoJSONEncoder()
+        for row in rows:
+            yield encoder.encode(dict(zip(self.fields, row))) + '\n'
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('file_format', str, OpenApiParameter.PATH, enum=['csv', 'ndjson']),
+            OpenApiParameter('date_from', str, description="Only transactions made at or after this ISO date/datetime"),
+            OpenApiParameter('date_to', str, description="Only transactions made at or before this ISO date/datetime"),
+            OpenApiParameter('transaction_type', str),
+            OpenApiParameter('transaction_currency', str),
+        ],
+        responses={(200, 'text/csv'): str, (200, 'application/x-ndjson'): str},
+        description="Download the transaction history, oldest first, as a CSV or NDJSON file."
+    )
+    def get(self, request, file_format):
+        if file_format not in self.content_types:
+            return Response({'error': 'Format must be csv or ndjson.'}, status=status.HTTP_404_NOT_FOUND)
+
+        rows = self.get_rows(request)
+        stream = self.stream_csv(rows) if file_format == 'csv' else self.stream_ndjson(rows)
+        response = StreamingHttpResponse(stream, content_type=self.content_types[file_format])
+        response['Content-Disposition'] = f'attachment; filename="transactions.{file_format}"'
+        return response
+
+
 class UserFundTranasctionsListView(generics.ListAPIView):
-    "Retrieve a list of user fund transactions in the system."
+    """Retrieve a page of user fund transactions in the system, newest first.
+    Optional filters: date_from, date_to (ISO date or datetime), transaction_type, transaction_currency.
+    """
     
     queryset = UserFundTransaction.objects.all()
     serializer_class = UserFundTransactionSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
-    
+    pagination_class = FundTransactionCursorPagination
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('date_from', str, description="Only transactions made at or after this ISO date/datetime"),
+            OpenApiParameter('date_to', str, description="Only transactions made at or before this ISO date/datetime"),
+            OpenApiParameter('transaction_type', str),
+            OpenApiParameter('transaction_currency', str),
+        ],
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self):
         user = self.request.user
-        return self.queryset.filter(fund_wallet=UserFundWallet.objects.get(fund_wallet=UserWalletOverview.objects.get(user=user)))
+        queryset = self.queryset.filter(fund_wallet_id=get_fund_wallet_id(user))
+        return filter_fund_transactions(queryset, self.request.query_params)
     
     
 class UserFundWalletCryptoChangeView(APIView):
     """Change the cryptocurrency in the user's fund wallet.
     if amount is positive, it will add the amount to the wallet.
     if amount is negative, it will subtract the amount from the wallet.
+    Responds with the new balance.
     """
     serializer_class = UserFundWalletCryptoSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def patch(self, request):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
-            symbol = serializer.validated_data['cryptocurrency_symbol']
-
-            user_wallet_crypto, created = UserFundWalletCryptocurrency.objects.get_or_create(
-                wallet_fund_id=UserFundWallet.objects.get(fund_wallet=UserWalletOverview.objects.get(user=request.user)),
-                cryptocurrency_symbol=symbol,
-                defaults={'cryptocurrency_amount': 0}            
-                )
-
-            serializer.update(user_wallet_crypto, serializer.validated_data)
+            serializer.save(user=request.user)
 
-            return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+            return Response(serializer.data, status=status.HTTP_201_CREATED if serializer.created else status.HTTP_200_OK)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -281,9 +537,21 @@ class UserFundWalletCryptoListView(generics.ListAPIView):
     """Retrieve a list of cryptocurrencies in the user's fund wallet."""
     queryset = UserFundWalletCryptocurrency.objects.all()
     serializer_class = UserFundWalletCryptoSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_queryset(self):
         user = self.request.user
-        return self.queryset.filter(wallet_fund_id=UserFundWallet.objects.get(fund_wallet=UserWalletOverview.objects.get(user=user)))
\ No newline at end of file
+        return self.queryset.filter(wallet_fund_id=get_fund_wallet_id(user))
+
+
+class UserPortfolioView(APIView):
+    """Retrieve the portfolio summary of the user's fund wallet.
+    The summary is kept up to date on balance changes and revalued periodically with current prices,
+    so it is read from a single cached row.
+    """
+    serializer_class = UserPortfolioSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        serializer = self.serializer_class(get_portfolio(request.user))
+        return Response(serializer.data, status=status.HTTP_200_OK)
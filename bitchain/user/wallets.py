@@ -0,0 +1,70 @@
+"""
+Wallets of users.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from core.models import UserFundWallet, UserFundWalletCryptocurrency
+from user.portfolio import update_portfolio_holding
+
+
+class InsufficientFundsError(Exception):
+    """Raised when a balance change would make the balance negative."""
+
+
+def _fund_wallet_key(user):
+    return f'user:fund-wallet:{user.pk}'
+
+
+def get_fund_wallet_id(user):
+    """
+    Return the primary key of the user's fund wallet. The id never changes, so it
+    is memoized on the user instance (i.e. per request for request.user) and
+    cached per user; on a miss it is read with a single join query.
+    """
+    wallet_id = getattr(user, '_fund_wallet_id', None)
+    if wallet_id is None:
+        wallet_id = cache.get(_fund_wallet_key(user))
+        if wallet_id is None:
+            wallet_id = UserFundWallet.objects.filter(fund_wallet__user=user).values_list('pk', flat=True).get()
+            cache.set(_fund_wallet_key(user), wallet_id, settings.USER_FUND_WALLET_CACHE_TIMEOUT)
+        user._fund_wallet_id = wallet_id
+    return wallet_id
+
+
+def change_crypto_balance(wallet_id, symbol, amount_change):
+    """
+    Add amount_change (negative to withdraw) to a cryptocurrency balance of the
+    wallet and return (new balance, created). The change is a single conditional
+    UPDATE ... SET amount = amount + change WHERE amount + change >= 0, so
+    concurrent changes of one balance are serialized by its row lock only and
+    can never overdraw it. Raises InsufficientFundsError otherwise.
+    The user's portfolio summary is updated in the same transaction.
+    """
+    balances = UserFundWalletCryptocurrency.objects.filter(wallet_fund_id=wallet_id, cryptocurrency_symbol=symbol)
+
+    with transaction.atomic():
+        updated = balances.filter(cryptocurrency_amount__gte=-amount_change).update(
+            cryptocurrency_amount=F('cryptocurrency_amount') + amount_change,
+        )
+        if updated:
+            # the updated row stays locked until commit, so this reads our own result
+            balance = balances.values_list('cryptocurrency_amount', flat=True).get()
+            update_portfolio_holding(wallet_id, symbol, balance)
+            return balance, False
+        if amount_change < 0:
+            raise InsufficientFundsError(symbol)
+
+        balance, created = UserFundWalletCryptocurrency.objects.get_or_create(
+            wallet_fund_id_id=wallet_id,
+            cryptocurrency_symbol=symbol,
+            defaults={'cryptocurrency_amount': amount_change},
+        )
+        if created:
+            update_portfolio_holding(wallet_id, symbol, balance.cryptocurrency_amount)
+            return balance.cryptocurrency_amount, True
+
+    # the balance was created concurrently, apply the change to it
+    return change_crypto_balance(wallet_id, symbol, amount_change)